@@ -0,0 +1,131 @@
+"""
+Script de migración para la versión del catálogo en la base
+Crea la tabla catalog_state (una sola fila) y los triggers que incrementan
+su versión en cada INSERT/UPDATE/DELETE de vehicle y en cada borrado de
+vehicle_view (p.ej. reset_plus_vehicle_views.py, que cambia el carrusel).
+Así las escrituras de cualquier dyno, de `heroku run` o de scripts con SQL
+directo invalidan los caches de todos los workers (ver utils.catalog_events).
+Es idempotente: se puede ejecutar varias veces.
+"""
+
+import os
+import time
+from sqlalchemy import create_engine, inspect, text
+from models import CatalogState
+
+# Load DATABASE_URL
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///vehicle_marketplace.db")
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+engine = create_engine(DATABASE_URL)
+inspector = inspect(engine)
+
+# Un trigger por sentencia (no por fila): un UPDATE masivo incrementa una sola vez
+POSTGRES_STATEMENTS = [
+    """
+    CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+    BEGIN
+        UPDATE catalog_state SET version = version + 1 WHERE id = 1;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS vehicle_catalog_version_trigger ON vehicle",
+    """
+    CREATE TRIGGER vehicle_catalog_version_trigger
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON vehicle
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+    """,
+    "DROP TRIGGER IF EXISTS vehicle_view_catalog_version_trigger ON vehicle_view",
+    """
+    CREATE TRIGGER vehicle_view_catalog_version_trigger
+    AFTER DELETE OR TRUNCATE ON vehicle_view
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+    """,
+]
+
+# SQLite sólo tiene triggers por fila
+SQLITE_STATEMENTS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS vehicle_catalog_version_{op.lower()} AFTER {op} ON vehicle BEGIN
+        UPDATE catalog_state SET version = version + 1 WHERE id = 1;
+    END
+    """
+    for op in ('INSERT', 'UPDATE', 'DELETE')
+] + [
+    """
+    CREATE TRIGGER IF NOT EXISTS vehicle_view_catalog_version_delete AFTER DELETE ON vehicle_view BEGIN
+        UPDATE catalog_state SET version = version + 1 WHERE id = 1;
+    END
+    """,
+]
+
+
+def table_exists(table_name):
+    """Check if table exists"""
+    try:
+        return table_name in inspector.get_table_names()
+    except Exception:
+        return False
+
+
+def create_catalog_state_table():
+    if table_exists('catalog_state'):
+        print("[INFO] Table catalog_state already exists")
+        return
+    CatalogState.__table__.create(bind=engine)
+    print("[OK] Created table catalog_state")
+
+
+def install_triggers(statements):
+    """
+    Triggers y fila de la versión en una sola transacción: la app usa
+    catalog_state sólo si tiene la fila (db.create_all() la crea vacía)
+    """
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+        if conn.execute(text("SELECT version FROM catalog_state WHERE id = 1")).scalar() is None:
+            # Basada en el reloj: nunca repite una versión que los caches ya vieron
+            conn.execute(
+                text("INSERT INTO catalog_state (id, version) VALUES (1, :version)"),
+                {'version': time.time_ns() // 1000}
+            )
+            print("[OK] Inserted catalog_state row")
+
+
+def main():
+    print("="*60)
+    print("MIGRACIÓN: Versión del catálogo en la base (catalog_state)")
+    print("="*60)
+
+    if not table_exists('vehicle') or not table_exists('vehicle_view'):
+        print("[ERROR] Las tablas vehicle y vehicle_view no existen. Inicializa la base primero.")
+        return
+
+    dialect = engine.dialect.name
+    try:
+        print("\n1. Tabla de versión...")
+        create_catalog_state_table()
+        print("\n2. Triggers...")
+        if dialect == 'postgresql':
+            install_triggers(POSTGRES_STATEMENTS)
+        elif dialect == 'sqlite':
+            install_triggers(SQLITE_STATEMENTS)
+        else:
+            print(f"[ERROR] Motor {dialect} no soportado")
+            return
+        print("[OK] Triggers de vehicle y vehicle_view instalados")
+    except Exception as e:
+        print(f"[ERROR] Migration failed: {e}")
+        return
+
+    print("\n" + "="*60)
+    print("MIGRACIÓN COMPLETADA")
+    print("="*60)
+    print("\nReiniciar la aplicación para que use la versión de la base.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Script de migración para la búsqueda de texto completo de vehículos
+PostgreSQL: columna vehicle.search_vector (tsvector, 'spanish' + unaccent),
+            trigger que la mantiene e índice GIN
+SQLite: tabla virtual FTS5 vehicle_fts sincronizada con triggers
+Es idempotente: se puede ejecutar varias veces.
+"""
+
+import os
+from sqlalchemy import create_engine, inspect, text
+
+# Load DATABASE_URL
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///vehicle_marketplace.db")
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+engine = create_engine(DATABASE_URL)
+inspector = inspect(engine)
+
+SEARCH_COLUMNS = ['title', 'brand', 'model', 'description', 'seller_keyword']
+
+POSTGRES_STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "ALTER TABLE vehicle ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    """
+    CREATE OR REPLACE FUNCTION vehicle_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('spanish', unaccent(coalesce(NEW.title, ''))), 'A') ||
+            setweight(to_tsvector('spanish', unaccent(coalesce(NEW.brand, '') || ' ' || coalesce(NEW.model, ''))), 'A') ||
+            setweight(to_tsvector('spanish', unaccent(coalesce(NEW.seller_keyword, ''))), 'B') ||
+            setweight(to_tsvector('spanish', unaccent(coalesce(NEW.description, ''))), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS vehicle_search_vector_trigger ON vehicle",
+    """
+    CREATE TRIGGER vehicle_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, brand, model, description, seller_keyword ON vehicle
+    FOR EACH ROW EXECUTE FUNCTION vehicle_search_vector_update()
+    """,
+    # Backfill: el trigger recalcula search_vector en cada fila
+    "UPDATE vehicle SET title = title",
+    "CREATE INDEX IF NOT EXISTS ix_vehicle_search_vector ON vehicle USING GIN (search_vector)",
+]
+
+_cols = ', '.join(SEARCH_COLUMNS)
+_new_values = ', '.join(f'new.{col}' for col in SEARCH_COLUMNS)
+_old_values = ', '.join(f'old.{col}' for col in SEARCH_COLUMNS)
+
+SQLITE_STATEMENTS = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS vehicle_fts USING fts5(
+        {_cols},
+        content='vehicle', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS vehicle_fts_insert AFTER INSERT ON vehicle BEGIN
+        INSERT INTO vehicle_fts(rowid, {_cols}) VALUES (new.id, {_new_values});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS vehicle_fts_delete AFTER DELETE ON vehicle BEGIN
+        INSERT INTO vehicle_fts(vehicle_fts, rowid, {_cols}) VALUES ('delete', old.id, {_old_values});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS vehicle_fts_update AFTER UPDATE ON vehicle BEGIN
+        INSERT INTO vehicle_fts(vehicle_fts, rowid, {_cols}) VALUES ('delete', old.id, {_old_values});
+        INSERT INTO vehicle_fts(rowid, {_cols}) VALUES (new.id, {_new_values});
+    END
+    """,
+    # Reconstruye el índice desde la tabla vehicle
+    "INSERT INTO vehicle_fts(vehicle_fts) VALUES ('rebuild')",
+]
+
+
+def table_exists(table_name):
+    """Check if table exists"""
+    try:
+        return table_name in inspector.get_table_names()
+    except Exception:
+        return False
+
+
+def run_statements(statements):
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+
+
+def main():
+    print("="*60)
+    print("MIGRACIÓN: Búsqueda de texto completo de vehículos")
+    print("="*60)
+
+    if not table_exists('vehicle'):
+        print("[ERROR] La tabla vehicle no existe. Inicializa la base primero.")
+        return
+
+    dialect = engine.dialect.name
+    try:
+        if dialect == 'postgresql':
+            print("\nInstalando tsvector + índice GIN (PostgreSQL)...")
+            run_statements(POSTGRES_STATEMENTS)
+        elif dialect == 'sqlite':
+            print("\nInstalando tabla FTS5 vehicle_fts (SQLite)...")
+            run_statements(SQLITE_STATEMENTS)
+        else:
+            print(f"[INFO] Motor {dialect} no soportado, la búsqueda seguirá usando ILIKE")
+            return
+        print("[OK] Índice de búsqueda instalado y poblado")
+    except Exception as e:
+        print(f"[ERROR] Falló la instalación del índice de búsqueda: {e}")
+        return
+
+    print("\n" + "="*60)
+    print("MIGRACIÓN COMPLETADA")
+    print("="*60)
+    print("\nReiniciar la aplicación para que detecte el nuevo índice.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Script de migración para los índices de las tablas más consultadas
+Crea los índices compuestos declarados en models.py (__table_args__):
+  vehicle        (is_active, is_plus, created_at) y uno por cada orden del
+                 catálogo: (is_active, price_ars|year|kilometers|created_at, id),
+                 más (is_active, price_ars|year|kilometers DESC NULLS LAST, id DESC)
+                 sólo en PostgreSQL,
+                 (is_active, location_id) para el filtro por departamento
+                 y (client_request_id, is_active) para los vehículos de un vendedor
+  vehicle_view   (vehicle_id, ip_address, timestamp) y (timestamp, is_counted)
+  click          (vehicle_id)
+  client_request (dni, status) y (status, created_at) para las pendientes
+  page_visit     (page, created_at)
+  page_visit_minute (page, minute, referrer_host) único (clave del upsert)
+Es idempotente: sólo crea los que faltan (y borra los reemplazados).
+"""
+
+import os
+from sqlalchemy import create_engine, inspect, text
+from models import Vehicle, VehicleView, Click, ClientRequest, PageVisit, PageVisitMinute
+
+# Load DATABASE_URL
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///vehicle_marketplace.db")
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+engine = create_engine(DATABASE_URL)
+inspector = inspect(engine)
+
+INDEXED_MODELS = [Vehicle, VehicleView, Click, ClientRequest, PageVisit, PageVisitMinute]
+
+# Índices reemplazados por otros (tabla, índice)
+OBSOLETE_INDEXES = [
+    ('vehicle', 'ix_vehicle_active_price_ars'),  # -> ix_vehicle_sort_price
+]
+
+
+def table_exists(table_name):
+    """Check if table exists"""
+    try:
+        return table_name in inspector.get_table_names()
+    except Exception:
+        return False
+
+
+def index_exists(table_name, index_name):
+    """Check if index exists on table"""
+    try:
+        return any(ix.get('name') == index_name for ix in inspect(engine).get_indexes(table_name))
+    except Exception:
+        return False
+
+
+def create_model_indexes(model):
+    table = model.__table__
+    if not table_exists(table.name):
+        print(f"[WARN] Table {table.name} does not exist, skipping")
+        return
+    for index in sorted(table.indexes, key=lambda ix: ix.name):
+        if index_exists(table.name, index.name):
+            print(f"[INFO] Index {index.name} already exists")
+            continue
+        try:
+            index.create(bind=engine)
+            if not index_exists(table.name, index.name):
+                # Índice sólo para otro motor (ddl_if en models.py)
+                print(f"[INFO] Index {index.name} does not apply to {engine.dialect.name}")
+                continue
+            columns = ', '.join(str(expression) for expression in index.expressions)
+            print(f"[OK] Created index {index.name} ON {table.name} ({columns})")
+        except Exception as e:
+            print(f"[ERROR] Failed to create {index.name}: {e}")
+
+
+def drop_obsolete_indexes():
+    for table_name, index_name in OBSOLETE_INDEXES:
+        if not index_exists(table_name, index_name):
+            continue
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP INDEX {index_name}"))
+            print(f"[OK] Dropped obsolete index {index_name}")
+        except Exception as e:
+            print(f"[ERROR] Failed to drop {index_name}: {e}")
+
+
+def main():
+    print("="*60)
+    print("MIGRACIÓN: Índices de tablas principales")
+    print("="*60)
+
+    for model in INDEXED_MODELS:
+        create_model_indexes(model)
+    drop_obsolete_indexes()
+
+    print("\n" + "="*60)
+    print("MIGRACIÓN COMPLETADA")
+    print("="*60)
+    print("\nEjecutar audit_query_plans.py para verificar los planes de consulta.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Script de migración para el precio normalizado en pesos
+Crea la tabla exchange_rate, agrega vehicle.price_ars con su índice y la
+completa con la cotización configurada. La cotización inicial del dólar se
+toma de USD_ARS_RATE (si no está, los vehículos en USD quedan sin precio
+normalizado hasta cargarla desde /admin/api/exchange-rates).
+Es idempotente: se puede ejecutar varias veces.
+"""
+
+import os
+from decimal import Decimal
+from sqlalchemy import create_engine, inspect, text
+from models import Vehicle, ExchangeRate
+
+# Load DATABASE_URL
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///vehicle_marketplace.db")
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+engine = create_engine(DATABASE_URL)
+inspector = inspect(engine)
+
+
+def column_exists(table_name, column_name):
+    """Check if column exists in table"""
+    try:
+        cols = inspector.get_columns(table_name)
+        return any(col.get('name') == column_name for col in cols)
+    except Exception:
+        return False
+
+
+def table_exists(table_name):
+    """Check if table exists"""
+    try:
+        return table_name in inspector.get_table_names()
+    except Exception:
+        return False
+
+
+def index_exists(table_name, index_name):
+    """Check if index exists on table"""
+    try:
+        return any(ix.get('name') == index_name for ix in inspector.get_indexes(table_name))
+    except Exception:
+        return False
+
+
+def create_exchange_rate_table():
+    if table_exists('exchange_rate'):
+        print("[INFO] Table exchange_rate already exists")
+        return
+    ExchangeRate.__table__.create(bind=engine)
+    print("[OK] Created table exchange_rate")
+
+
+def add_price_ars_column():
+    if column_exists('vehicle', 'price_ars'):
+        print("[INFO] Column vehicle.price_ars already exists")
+    else:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE vehicle ADD COLUMN price_ars BIGINT"))
+        print("[OK] Added column vehicle.price_ars")
+
+    for index in Vehicle.__table__.indexes:
+        if 'price_ars' in index.columns and not index_exists('vehicle', index.name):
+            index.create(bind=engine)
+            print(f"[OK] Created index {index.name}")
+
+
+def seed_usd_rate():
+    rate = os.environ.get('USD_ARS_RATE')
+    with engine.begin() as conn:
+        existing = conn.execute(text("SELECT rate FROM exchange_rate WHERE currency = 'USD'")).scalar()
+        if existing is not None:
+            print(f"[INFO] USD rate already configured: {existing}")
+            return
+        if not rate:
+            print("[WARN] USD_ARS_RATE not set: USD vehicles will have no price_ars until a rate is configured")
+            return
+        conn.execute(
+            text("INSERT INTO exchange_rate (currency, rate, updated_at) VALUES ('USD', :rate, CURRENT_TIMESTAMP)"),
+            {'rate': float(Decimal(rate))}
+        )
+    print(f"[OK] USD rate set to {rate}")
+
+
+def backfill_price_ars():
+    """Recalcula price_ars con un UPDATE por moneda"""
+    with engine.begin() as conn:
+        rates = dict(conn.execute(text("SELECT currency, rate FROM exchange_rate")).fetchall())
+        conn.execute(text(
+            "UPDATE vehicle SET price_ars = price WHERE currency = 'ARS' OR currency IS NULL"
+        ))
+        for currency, rate in rates.items():
+            conn.execute(
+                text("UPDATE vehicle SET price_ars = CAST(ROUND(price * :rate) AS BIGINT) WHERE currency = :currency"),
+                {'rate': float(rate), 'currency': currency}
+            )
+        missing = conn.execute(text(
+            "SELECT COUNT(*) FROM vehicle WHERE price_ars IS NULL"
+        )).scalar()
+    print(f"[OK] price_ars recalculated ({len(rates)} rate(s) configured, {missing} vehicle(s) without rate)")
+
+
+def main():
+    print("="*60)
+    print("MIGRACIÓN: Precio normalizado en pesos (price_ars)")
+    print("="*60)
+
+    try:
+        print("\n1. Tabla de cotizaciones...")
+        create_exchange_rate_table()
+        print("\n2. Columna vehicle.price_ars...")
+        add_price_ars_column()
+        print("\n3. Cotización inicial del dólar...")
+        seed_usd_rate()
+        print("\n4. Recalculando precios...")
+        backfill_price_ars()
+    except Exception as e:
+        print(f"[ERROR] Migration failed: {e}")
+        return
+
+    print("\n" + "="*60)
+    print("MIGRACIÓN COMPLETADA")
+    print("="*60)
+
+
+if __name__ == '__main__':
+    main()
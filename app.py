@@ -35,12 +35,64 @@ app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
+# "Most viewed" carousel: view window (days) and ranking refresh interval (seconds)
+app.config['CAROUSEL_VIEW_WINDOW_DAYS'] = int(os.environ.get('CAROUSEL_VIEW_WINDOW_DAYS', 30))
+app.config['CAROUSEL_REFRESH_SECONDS'] = int(os.environ.get('CAROUSEL_REFRESH_SECONDS', 300))
+
+# Vehicle views are inserted in batches: rows per INSERT and max seconds in the queue
+app.config['VIEW_WRITE_BEHIND'] = os.environ.get('VIEW_WRITE_BEHIND', '1') != '0'
+app.config['VIEW_BATCH_SIZE'] = int(os.environ.get('VIEW_BATCH_SIZE', 100))
+app.config['VIEW_FLUSH_SECONDS'] = float(os.environ.get('VIEW_FLUSH_SECONDS', 2))
+
+# WhatsApp/offer clicks are batched the same way; CLICK_SPOOL_DIR also keeps
+# queued clicks in a local append-only file until they are inserted
+app.config['CLICK_WRITE_BEHIND'] = os.environ.get('CLICK_WRITE_BEHIND', '1') != '0'
+app.config['CLICK_BATCH_SIZE'] = int(os.environ.get('CLICK_BATCH_SIZE', 50))
+app.config['CLICK_FLUSH_SECONDS'] = float(os.environ.get('CLICK_FLUSH_SECONDS', 2))
+app.config['CLICK_MAX_PENDING'] = int(os.environ.get('CLICK_MAX_PENDING', 5000))
+app.config['CLICK_SPOOL_DIR'] = os.environ.get('CLICK_SPOOL_DIR')
+
+# Page visits: share of visits sampled, seconds between flushes of the per-minute
+# counters, and whether full PageVisit rows (IP, user agent, referrer) are kept
+app.config['PAGE_VISIT_SAMPLE_RATE'] = float(os.environ.get('PAGE_VISIT_SAMPLE_RATE', 1.0))
+app.config['PAGE_VISIT_FLUSH_SECONDS'] = float(os.environ.get('PAGE_VISIT_FLUSH_SECONDS', 60))
+app.config['PAGE_VISIT_DETAILED_LOG'] = os.environ.get('PAGE_VISIT_DETAILED_LOG', '0') == '1'
+
 # Import and initialize db
 from models import db
 db.init_app(app)
 
-# Apply proxy fix
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+# Track Vehicle writes (catalog version for in-memory indexes and caches)
+import utils.catalog_events
+
+# Keep vehicle_image rows in sync with the images JSON column
+import utils.images
+
+# Keep Vehicle.price_ars (price converted to ARS) up to date
+import utils.pricing
+
+# Resolve location_id/sub_location_id from the location text columns
+import utils.locations
+
+# Incremental refresh of the similar vehicles lists on catalog writes (background thread)
+from utils.recommendations import similarity_engine
+similarity_engine.init_app(app)
+
+# "Most viewed" carousel ranking, recomputed in a background thread
+from utils.carousel import view_ranking
+view_ranking.init_app(app)
+
+# Buffered (write-behind) inserts of vehicle views and clicks, drained at shutdown
+from utils.write_behind import vehicle_view_buffer, click_buffer
+vehicle_view_buffer.init_app(app)
+click_buffer.init_app(app)
+
+# Sampled page visits, aggregated per minute in memory and flushed periodically
+from utils.page_visits import page_visit_pipeline
+page_visit_pipeline.init_app(app)
+
+# Apply proxy fix (x_for: remote_addr es la IP del cliente, no la del router de Heroku)
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
 
 def generate_password_hash_sha256(password):
     """Genera un hash SHA-256 de la contraseña con salt"""
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Auditoría de planes de consulta
+Ejecuta EXPLAIN sobre las consultas más frecuentes de la aplicación y marca
+las que recorren una tabla completa (Seq Scan en PostgreSQL, SCAN sin índice
+en SQLite). En PostgreSQL se desactiva enable_seqscan durante el EXPLAIN, así
+un Seq Scan que sigue apareciendo significa que no hay índice utilizable (con
+tablas chicas el planificador lo elegiría igual aunque el índice exista).
+
+Uso: python audit_query_plans.py   (sale con código 1 si hay recorridos completos)
+"""
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+os.environ.setdefault("SKIP_ROUTES", "1")
+
+from sqlalchemy import text
+from app import app, db
+from models import Vehicle, VehicleView, Click, ClientRequest, PageVisitMinute
+from utils.catalog import CATALOG_SORTS, order_catalog
+
+
+def hot_queries():
+    """(nombre, consulta) de los accesos más frecuentes"""
+    now = datetime.utcnow()
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return [
+        ('catálogo: primera página',
+         Vehicle.query.filter(Vehicle.is_active == True).order_by(
+             Vehicle.is_plus.desc(), Vehicle.created_at.desc(), Vehicle.id.desc()
+         ).limit(10)),
+        *[(f'catálogo: orden {sort}', order_catalog(
+            Vehicle.query.filter(Vehicle.is_active == True), order
+        ).limit(10)) for sort, order in CATALOG_SORTS.items()],
+        ('catálogo: total por departamento',
+         db.session.query(db.func.count(Vehicle.id)).filter(
+             Vehicle.is_active == True, Vehicle.location_id == 1)),
+        ('catálogo: total',
+         db.session.query(db.func.count(Vehicle.id)).filter(Vehicle.is_active == True)),
+        ('carrusel: vistas contadas en la ventana',
+         db.session.query(VehicleView.vehicle_id, db.func.count(VehicleView.id)).filter(
+             VehicleView.timestamp >= now - timedelta(days=30),
+             VehicleView.is_counted == True
+         ).group_by(VehicleView.vehicle_id)),
+        ('anti-fraude: última vista de la IP',
+         VehicleView.query.filter_by(vehicle_id=1, ip_address='127.0.0.1').order_by(
+             VehicleView.timestamp.desc()).limit(1)),
+        ('anti-fraude: vistas de hoy de la IP',
+         db.session.query(db.func.count(VehicleView.id)).filter(
+             VehicleView.vehicle_id == 1,
+             VehicleView.ip_address == '127.0.0.1',
+             VehicleView.timestamp >= day_start,
+             VehicleView.timestamp < day_start + timedelta(days=1)
+         )),
+        ('anti-fraude: vistas recientes de la IP',
+         db.session.query(db.func.count(VehicleView.id)).filter(
+             VehicleView.ip_address == '127.0.0.1',
+             VehicleView.timestamp >= now - timedelta(minutes=5)
+         )),
+        ('detalle: clicks del vehículo',
+         db.session.query(db.func.count(Click.id)).filter(Click.vehicle_id == 1)),
+        ('detalle: vehículos activos del vendedor',
+         db.session.query(db.func.count(db.distinct(Vehicle.client_request_id))).join(
+             ClientRequest, ClientRequest.id == Vehicle.client_request_id
+         ).filter(
+             ClientRequest.dni == '30000000',
+             ClientRequest.status == 'approved',
+             Vehicle.is_active == True
+         )),
+        ('solicitudes: por DNI',
+         ClientRequest.query.filter_by(dni='30000000')),
+        ('solicitudes: por DNI y estado',
+         ClientRequest.query.filter_by(dni='30000000', status='approved')),
+        ('solicitudes: pendientes',
+         ClientRequest.query.filter_by(status='pending').order_by(ClientRequest.created_at.desc())),
+        ('visitas: index de hoy',
+         db.session.query(db.func.sum(PageVisitMinute.visits)).filter(
+             PageVisitMinute.page == 'index',
+             PageVisitMinute.minute >= day_start
+         )),
+    ]
+
+
+def compile_query(query):
+    statement = query.statement if hasattr(query, 'statement') else query
+    return str(statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+
+
+def explain(sql):
+    """
+    Plan de ejecución y recorridos completos detectados
+
+    Returns:
+        tuple: (líneas del plan, tablas recorridas completas)
+    """
+    dialect = db.engine.dialect.name
+    with db.engine.connect() as conn:
+        if dialect == 'postgresql':
+            with conn.begin():
+                conn.execute(text("SET LOCAL enable_seqscan = off"))
+                lines = [row[0] for row in conn.execute(text(f"EXPLAIN {sql}"))]
+            full_scans = re.findall(r'Seq Scan on (\w+)', '\n'.join(lines))
+        else:
+            rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+            lines = [row[-1] for row in rows]
+            full_scans = [
+                match.group(1) for line in lines
+                for match in [re.match(r'SCAN (?:TABLE )?(\w+)', line)]
+                if match and 'USING' not in line
+            ]
+    return lines, full_scans
+
+
+def main():
+    with app.app_context():
+        print("="*60)
+        print(f"AUDITORÍA DE PLANES DE CONSULTA ({db.engine.dialect.name})")
+        print("="*60)
+
+        flagged = []
+        for name, query in hot_queries():
+            try:
+                lines, full_scans = explain(compile_query(query))
+            except Exception as e:
+                print(f"\n[ERROR] {name}: {e}")
+                continue
+            status = f"[WARN] recorrido completo de {', '.join(full_scans)}" if full_scans else "[OK]"
+            print(f"\n{status} {name}")
+            for line in lines:
+                print(f"    {line}")
+            if full_scans:
+                flagged.append(name)
+
+        print("\n" + "="*60)
+        if flagged:
+            print(f"{len(flagged)} consulta(s) sin índice utilizable:")
+            for name in flagged:
+                print(f"  - {name}")
+            sys.exit(1)
+        print("Todas las consultas usan índices")
+
+
+if __name__ == '__main__':
+    main()
@@ -175,7 +175,7 @@ class BackupManager:
             
             # Exportar datos de todas las tablas importantes
             from app import app
-            from models import Vehicle, ClientRequest, Admin, Click, VehicleView, PageVisit, Gestor
+            from models import Vehicle, ClientRequest, Admin, Click, VehicleView, PageVisit, PageVisitMinute, Gestor
             
             with app.app_context():
                 # Backup de vehículos (con URLs de imágenes)
@@ -294,6 +294,19 @@ class BackupManager:
                         'updated_at': gestor.updated_at.isoformat()
                     }
                     gestores_data.append(gestor_data)
+                
+                # Backup de visitas de páginas por minuto (utils.page_visits)
+                page_visits_data = []
+                page_visit_minutes = PageVisitMinute.query.all()
+                for page_visit_minute in page_visit_minutes:
+                    page_visit_data = {
+                        'id': page_visit_minute.id,
+                        'page': page_visit_minute.page,
+                        'referrer_host': page_visit_minute.referrer_host,
+                        'minute': page_visit_minute.minute.isoformat(),
+                        'visits': page_visit_minute.visits
+                    }
+                    page_visits_data.append(page_visit_data)
             
             # Guardar todos los datos en archivos JSON
             with open(data_backup_path / "vehicles.json", 'w', encoding='utf-8') as f:
@@ -308,6 +321,9 @@ class BackupManager:
             with open(data_backup_path / "gestores.json", 'w', encoding='utf-8') as f:
                 json.dump(gestores_data, f, indent=2, ensure_ascii=False)
             
+            with open(data_backup_path / "page_visit_minutes.json", 'w', encoding='utf-8') as f:
+                json.dump(page_visits_data, f, indent=2, ensure_ascii=False)
+            
             # Crear resumen del backup
             summary = {
                 'backup_date': datetime.datetime.now().isoformat(),
@@ -315,6 +331,7 @@ class BackupManager:
                 'requests_count': len(requests_data),
                 'admins_count': len(admins_data),
                 'gestores_count': len(gestores_data),
+                'page_visit_minutes_count': len(page_visits_data),
                 'backup_type': 'data_only',
                 'note': 'Este backup contiene solo datos (URLs de imágenes, no archivos físicos)'
             }
@@ -323,7 +340,7 @@ class BackupManager:
                 json.dump(summary, f, indent=2, ensure_ascii=False)
             
             logging.info(f"Backup de datos completado: {data_backup_path}")
-            logging.info(f"Vehículos: {len(vehicles_data)}, Solicitudes: {len(requests_data)}, Admins: {len(admins_data)}, Gestores: {len(gestores_data)}")
+            logging.info(f"Vehículos: {len(vehicles_data)}, Solicitudes: {len(requests_data)}, Admins: {len(admins_data)}, Gestores: {len(gestores_data)}, Visitas por minuto: {len(page_visits_data)}")
             return True
             
         except Exception as e:
@@ -538,7 +555,7 @@ class BackupManager:
         """Restaura datos desde archivos JSON"""
         try:
             from app import app
-            from models import db, Vehicle, ClientRequest, Admin, Gestor
+            from models import db, Vehicle, ClientRequest, Admin, Gestor, PageVisitMinute
             
             with app.app_context():
                 # Crear backup de seguridad de la base de datos actual
@@ -553,6 +570,7 @@ class BackupManager:
                 requests_file = data_backup_path / 'client_requests.json'
                 admins_file = data_backup_path / 'admins.json'
                 gestores_file = data_backup_path / 'gestores.json'
+                page_visits_file = data_backup_path / 'page_visit_minutes.json'
                 summary_file = data_backup_path / 'backup_summary.json'
                 
                 # Leer resumen del backup
@@ -567,9 +585,11 @@ class BackupManager:
                 db.session.query(Vehicle).delete()
                 db.session.query(ClientRequest).delete()
                 db.session.query(Gestor).delete()
+                if page_visits_file.exists():
+                    db.session.query(PageVisitMinute).delete()
                 db.session.commit()
                 
-                restored_counts = {'vehicles': 0, 'requests': 0, 'admins': 0, 'gestores': 0}
+                restored_counts = {'vehicles': 0, 'requests': 0, 'admins': 0, 'gestores': 0, 'page_visit_minutes': 0}
                 
                 # Restaurar vehículos
                 if vehicles_file.exists():
@@ -635,6 +655,19 @@ class BackupManager:
                         except Exception as e:
                             logging.error(f"Error restaurando gestor {gestor_data.get('id', 'desconocido')}: {e}")
                 
+                # Restaurar visitas de páginas por minuto
+                if page_visits_file.exists():
+                    with open(page_visits_file, 'r', encoding='utf-8') as f:
+                        page_visits_data = json.load(f)
+                        
+                    for page_visit_data in page_visits_data:
+                        try:
+                            page_visit_data['minute'] = datetime.datetime.fromisoformat(page_visit_data['minute'])
+                            db.session.add(PageVisitMinute(**page_visit_data))
+                            restored_counts['page_visit_minutes'] += 1
+                        except Exception as e:
+                            logging.error(f"Error restaurando visitas {page_visit_data.get('id', 'desconocido')}: {e}")
+                
                 # Restaurar administradores (solo si no existen)
                 if admins_file.exists():
                     with open(admins_file, 'r', encoding='utf-8') as f:
@@ -660,6 +693,7 @@ class BackupManager:
                 logging.info(f"- Vehículos: {restored_counts['vehicles']}")
                 logging.info(f"- Solicitudes: {restored_counts['requests']}")
                 logging.info(f"- Gestores: {restored_counts['gestores']}")
+                logging.info(f"- Visitas por minuto: {restored_counts['page_visit_minutes']}")
                 logging.info(f"- Administradores: {restored_counts['admins']}")
                 
                 return {
@@ -5,6 +5,7 @@ Handles image uploads with automatic optimization and CDN
 """
 
 import os
+import re
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
@@ -12,6 +13,10 @@ from datetime import datetime
 import uuid
 import logging
 from werkzeug.utils import secure_filename
+from utils.cache import LRUCache
+
+# Size of recent uploads by URL, until the gallery is saved (utils.images)
+_upload_dimensions = LRUCache(maxsize=1024, ttl=3600)
 
 class CloudinaryStorage:
     def __init__(self):
@@ -96,11 +101,15 @@ class CloudinaryStorage:
             )
             
             print(f"✅ Cloudinary upload successful: {result['secure_url']}")
+            if result.get('width') and result.get('height'):
+                _upload_dimensions.set(result['secure_url'], (result['width'], result['height']))
             
             return {
                 'success': True,
                 'url': result['secure_url'],
                 'public_id': result['public_id'],
+                'width': result.get('width'),
+                'height': result.get('height'),
                 'filename': filename,
                 'thumbnails': {
                     'large': result['eager'][0]['secure_url'] if result.get('eager') else result['secure_url'],
@@ -180,6 +189,54 @@ class CloudinaryStorage:
             logging.error(f"Cloudinary URL generation error: {e}")
             return None
 
+# Sizes of the eager transformations generated in upload_file
+THUMBNAIL_SIZES = {
+    'large': (800, 600),
+    'medium': (400, 300),
+    'small': (150, 150)
+}
+
+def is_cloudinary_url(url):
+    return isinstance(url, str) and 'res.cloudinary.com' in url and '/upload/' in url
+
+def public_id_from_url(url):
+    """
+    Extract the Cloudinary public_id from a delivery URL
+    .../image/upload/[transformations/][v123/]folder/name.jpg -> folder/name
+    Returns None for non-Cloudinary URLs
+    """
+    if not is_cloudinary_url(url):
+        return None
+    path = url.split('/upload/', 1)[1].split('?', 1)[0]
+    parts = [part for part in path.split('/') if part]
+    # Skip transformation segments (e.g. c_fill,w_400) and the version (v123)
+    versions = [i for i, part in enumerate(parts) if re.match(r'^v\d+$', part)]
+    if versions:
+        parts = parts[versions[0] + 1:]
+    else:
+        while parts and ',' in parts[0]:
+            parts = parts[1:]
+    if not parts:
+        return None
+    return os.path.splitext('/'.join(parts))[0]
+
+def variant_url(url, size):
+    """
+    URL of a thumbnail variant ('small', 'medium', 'large') of a Cloudinary image,
+    built with the same transformation as the eager upload so the CDN already has it.
+    Non-Cloudinary URLs are returned unchanged.
+    """
+    if not is_cloudinary_url(url) or size not in THUMBNAIL_SIZES:
+        return url
+    width, height = THUMBNAIL_SIZES[size]
+    transformation = f"c_fill,h_{height},q_auto:good,w_{width}"
+    base, rest = url.split('/upload/', 1)
+    return f"{base}/upload/{transformation}/{rest}"
+
+def uploaded_dimensions(url):
+    """(width, height) of an image uploaded by this process, or None"""
+    return _upload_dimensions.get(url)
+
 # Global instance
 cloudinary_storage = CloudinaryStorage()
 
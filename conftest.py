@@ -0,0 +1,55 @@
+"""
+Fixtures de los tests: una app mínima (sin rutas ni tareas de fondo) sobre
+una base SQLite temporal, con los mismos hooks de flush que registra app.py
+"""
+
+import itertools
+import pytest
+from flask import Flask
+from models import db, Vehicle
+
+# Mismos módulos que importa app.py por sus listeners de Session
+import utils.pricing
+import utils.locations
+import utils.images
+import utils.catalog_events
+
+
+@pytest.fixture
+def app_db(tmp_path, monkeypatch):
+    """App con la base temporal creada (db.create_all) y su contexto activo"""
+    # Versión del catálogo en un archivo propio del test (base sin catalog_state)
+    monkeypatch.setattr(utils.catalog_events, 'VERSION_FILE', str(tmp_path / 'catalog_version'))
+    test_app = Flask(__name__)
+    test_app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}",
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        TESTING=True,
+    )
+    db.init_app(test_app)
+    with test_app.app_context():
+        db.create_all()
+        yield test_app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def add_vehicle(app_db):
+    """Crea un Vehicle activo con valores mínimos; los kwargs los reemplazan"""
+    counter = itertools.count(1)
+
+    def create(**values):
+        number = next(counter)
+        fields = dict(
+            title=f'Vehículo {number}', description='Descripción', price=1000000 + number,
+            currency='ARS', year=2015, brand='Toyota', model='Corolla', kilometers=50000,
+            whatsapp_number='2622123456', is_active=True, is_plus=False,
+        )
+        fields.update(values)
+        vehicle = Vehicle(**fields)
+        db.session.add(vehicle)
+        db.session.commit()
+        return vehicle
+
+    return create
@@ -1,6 +1,6 @@
 """
 Script de migración para sistema de analytics y anti-fraude
-Agrega nuevas columnas a vehicle_view y crea tabla daily_stats
+Agrega nuevas columnas a vehicle_view y click y crea tabla daily_stats
 """
 
 import os
@@ -103,7 +103,12 @@ def main():
     add_column_sql('vehicle_view', 'is_counted', 'BOOLEAN DEFAULT TRUE')
     add_column_sql('vehicle_view', 'blocked_reason', 'VARCHAR(100)')
     
-    print("\n2. Creando tabla daily_stats...")
+    print("\n2. Actualizando tabla click...")
+    
+    # Clicks de una IP por encima del límite: se guardan sin contar
+    add_column_sql('click', 'is_counted', 'BOOLEAN DEFAULT TRUE')
+    
+    print("\n3. Creando tabla daily_stats...")
     create_daily_stats_table()
     
     print("\n" + "="*60)
@@ -113,6 +118,7 @@ def main():
     print("- Cooldown: 30 minutos entre vistas del mismo vehículo")
     print("- Límite diario: 10 vistas por IP del mismo vehículo")
     print("- Rate limiting: Máx 15 vistas en 5 minutos")
+    print("- Clicks: Máx 15 por IP en 5 minutos cuentan en estadísticas (el resto se guarda marcado)")
     print("\nNuevas funcionalidades:")
     print("- Tracking de dispositivos (mobile/desktop/tablet)")
     print("- Tracking de navegador y OS")
@@ -0,0 +1,162 @@
+"""
+Script de migración para las ubicaciones normalizadas
+Crea la tabla location (departamentos y sub-ubicaciones de
+utils.locations.MENDOZA_LOCATIONS), agrega location_id/sub_location_id a
+vehicle y client_request con el índice del catálogo y los completa a partir
+del texto de location/sub_location.
+Es idempotente: se puede ejecutar varias veces.
+"""
+
+import os
+from sqlalchemy import create_engine, inspect, text, table, column
+from models import Vehicle, Location
+from utils.locations import MENDOZA_LOCATIONS, build_lookup, resolve
+
+# Load DATABASE_URL
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///vehicle_marketplace.db")
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+engine = create_engine(DATABASE_URL)
+inspector = inspect(engine)
+
+# Sólo las columnas que toca el backfill (sin los onupdate del modelo)
+LOCATED_TABLES = {
+    name: table(name, column('location'), column('sub_location'), column('location_id'), column('sub_location_id'))
+    for name in ('vehicle', 'client_request')
+}
+
+
+def table_exists(table_name):
+    """Check if table exists"""
+    try:
+        return table_name in inspector.get_table_names()
+    except Exception:
+        return False
+
+
+def column_exists(table_name, column_name):
+    """Check if column exists in table"""
+    try:
+        cols = inspector.get_columns(table_name)
+        return any(col.get('name') == column_name for col in cols)
+    except Exception:
+        return False
+
+
+def index_exists(table_name, index_name):
+    """Check if index exists on table"""
+    try:
+        return any(ix.get('name') == index_name for ix in inspector.get_indexes(table_name))
+    except Exception:
+        return False
+
+
+def create_location_table():
+    if table_exists('location'):
+        print("[INFO] Table location already exists")
+        return
+    Location.__table__.create(bind=engine)
+    print("[OK] Created table location")
+
+
+def seed_locations():
+    """Inserta los departamentos y sub-ubicaciones que falten"""
+    created = 0
+    with engine.begin() as conn:
+        for zone, departments in MENDOZA_LOCATIONS.items():
+            for department, sub_locations in departments.items():
+                department_id = conn.execute(
+                    text("SELECT id FROM location WHERE parent_id IS NULL AND name = :name"),
+                    {'name': department}
+                ).scalar()
+                if department_id is None:
+                    conn.execute(
+                        text("INSERT INTO location (name, zone) VALUES (:name, :zone)"),
+                        {'name': department, 'zone': zone}
+                    )
+                    department_id = conn.execute(
+                        text("SELECT id FROM location WHERE parent_id IS NULL AND name = :name"),
+                        {'name': department}
+                    ).scalar()
+                    created += 1
+                existing = {row[0] for row in conn.execute(
+                    text("SELECT name FROM location WHERE parent_id = :parent_id"),
+                    {'parent_id': department_id}
+                )}
+                for name in sub_locations:
+                    if name not in existing:
+                        conn.execute(
+                            text("INSERT INTO location (name, parent_id) VALUES (:name, :parent_id)"),
+                            {'name': name, 'parent_id': department_id}
+                        )
+                        created += 1
+    print(f"[OK] {created} ubicación(es) nuevas")
+
+
+def add_location_columns():
+    for table_name in LOCATED_TABLES:
+        for column in ('location_id', 'sub_location_id'):
+            if column_exists(table_name, column):
+                print(f"[INFO] Column {table_name}.{column} already exists")
+                continue
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"ALTER TABLE {table_name} ADD COLUMN {column} INTEGER REFERENCES location(id)"
+                ))
+            print(f"[OK] Added column {table_name}.{column}")
+
+    for index in Vehicle.__table__.indexes:
+        if 'location_id' in index.columns and not index_exists('vehicle', index.name):
+            index.create(bind=engine)
+            print(f"[OK] Created index {index.name}")
+
+
+def backfill_location_ids():
+    """Un UPDATE por cada combinación distinta de location/sub_location"""
+    with engine.begin() as conn:
+        lookup = build_lookup(conn.execute(text("SELECT id, name, parent_id FROM location")))
+        for table_name, located in LOCATED_TABLES.items():
+            pairs = conn.execute(text(
+                f"SELECT DISTINCT location, sub_location FROM {table_name}"
+            )).fetchall()
+            unmatched = []
+            for location, sub_location in pairs:
+                location_id, sub_location_id = resolve(lookup, location, sub_location)
+                if location and location_id is None:
+                    unmatched.append(location)
+                conn.execute(
+                    located.update()
+                    .where(located.c.location.is_not_distinct_from(location))
+                    .where(located.c.sub_location.is_not_distinct_from(sub_location))
+                    .values(location_id=location_id, sub_location_id=sub_location_id)
+                )
+            print(f"[OK] {table_name}: {len(pairs)} combinación(es) de ubicación")
+            for location in sorted(set(unmatched)):
+                print(f"[WARN] {table_name}: departamento no reconocido '{location}' (queda sin location_id)")
+
+
+def main():
+    print("="*60)
+    print("MIGRACIÓN: Ubicaciones normalizadas (tabla location)")
+    print("="*60)
+
+    try:
+        print("\n1. Tabla de ubicaciones...")
+        create_location_table()
+        seed_locations()
+        print("\n2. Columnas location_id/sub_location_id...")
+        add_location_columns()
+        print("\n3. Completando ids a partir del texto...")
+        backfill_location_ids()
+    except Exception as e:
+        print(f"[ERROR] Migration failed: {e}")
+        return
+
+    print("\n" + "="*60)
+    print("MIGRACIÓN COMPLETADA")
+    print("="*60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Script de migración para los contadores de visitas por minuto
+Crea la tabla page_visit_minute (visitas por página, minuto y host del
+referrer, que escribe utils.page_visits) y, si está vacía, la completa con
+las filas históricas de page_visit para que el panel siga mostrando los
+totales de antes.
+Es idempotente: se puede ejecutar varias veces.
+"""
+
+import os
+from datetime import datetime
+from collections import Counter
+from sqlalchemy import create_engine, inspect, text, Float
+from models import PageVisitMinute
+from utils.page_visits import referrer_host
+
+# Load DATABASE_URL
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///vehicle_marketplace.db")
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+engine = create_engine(DATABASE_URL)
+inspector = inspect(engine)
+
+# Filas de page_visit que se leen por vez
+FETCH_SIZE = 5000
+
+
+def table_exists(table_name):
+    """Check if table exists"""
+    try:
+        return table_name in inspector.get_table_names()
+    except Exception:
+        return False
+
+
+def visits_column_type():
+    """Tipo de page_visit_minute.visits en la base (None si no está)"""
+    try:
+        for column in inspector.get_columns('page_visit_minute'):
+            if column['name'] == 'visits':
+                return column['type']
+    except Exception:
+        pass
+    return None
+
+
+def create_page_visit_minute_table():
+    if table_exists('page_visit_minute'):
+        print("[INFO] Table page_visit_minute already exists")
+        return
+    PageVisitMinute.__table__.create(bind=engine)
+    print("[OK] Created table page_visit_minute (with unique index ix_page_visit_minute_key)")
+
+
+def upgrade_visits_column():
+    """
+    Las visitas estimadas con muestreo no son enteras: si la tabla se creó
+    con visits INTEGER se pasa a punto flotante (SQLite ya guarda REAL en
+    una columna INTEGER cuando el valor no es entero)
+    """
+    column_type = visits_column_type()
+    if column_type is None or isinstance(column_type, Float):
+        print("[INFO] page_visit_minute.visits is already a float column")
+        return
+    if engine.dialect.name == 'sqlite':
+        print("[INFO] SQLite stores fractional visits as REAL, nothing to change")
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE page_visit_minute ALTER COLUMN visits TYPE DOUBLE PRECISION"))
+    print("[OK] page_visit_minute.visits changed to DOUBLE PRECISION")
+
+
+def backfill_page_visit_minutes():
+    """Agrupa page_visit por (página, host del referrer, minuto) en Python"""
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT COUNT(*) FROM page_visit_minute")).scalar():
+            print("[INFO] page_visit_minute already has rows, skipping backfill")
+            return
+        if not table_exists('page_visit'):
+            print("[WARN] Table page_visit does not exist, nothing to backfill")
+            return
+
+        counts = Counter()
+        result = conn.execution_options(yield_per=FETCH_SIZE).execute(text(
+            "SELECT page, referrer, created_at FROM page_visit WHERE created_at IS NOT NULL"
+        ))
+        for page, referrer, created_at in result:
+            if isinstance(created_at, str):  # SQLite devuelve texto
+                created_at = datetime.fromisoformat(created_at)
+            counts[(page, referrer_host(referrer), created_at.replace(second=0, microsecond=0))] += 1
+
+        rows = [
+            {'page': page, 'referrer_host': host, 'minute': minute, 'visits': visits}
+            for (page, host, minute), visits in counts.items()
+        ]
+        if rows:
+            conn.execute(PageVisitMinute.__table__.insert(), rows)
+        print(f"[OK] {sum(counts.values())} visita(s) agrupadas en {len(rows)} fila(s)")
+
+
+def main():
+    print("="*60)
+    print("MIGRACIÓN: Visitas de páginas por minuto (page_visit_minute)")
+    print("="*60)
+
+    try:
+        print("\n1. Tabla de contadores...")
+        create_page_visit_minute_table()
+        upgrade_visits_column()
+        print("\n2. Agrupando las visitas históricas...")
+        backfill_page_visit_minutes()
+    except Exception as e:
+        print(f"[ERROR] Migration failed: {e}")
+        return
+
+    print("\n" + "="*60)
+    print("MIGRACIÓN COMPLETADA")
+    print("="*60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Script de migración para la tabla vehicle_image
+Crea la tabla (una fila por imagen, con posición, public_id de Cloudinary,
+tamaño y URLs de miniaturas) y la llena a partir de la columna JSON `images`
+de vehicle y client_request. El tamaño de las imágenes ya subidas se pide a
+la API de Cloudinary (o se lee del archivo con Pillow si es local).
+Es idempotente: vuelve a generar las filas de cada publicación y sólo busca
+el tamaño de las filas que no lo tienen.
+"""
+
+import os
+import json
+from sqlalchemy import create_engine, inspect, text
+from models import VehicleImage
+from utils.images import replace_image_rows
+from cloudinary_storage import cloudinary_storage
+
+# Load DATABASE_URL
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///vehicle_marketplace.db")
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+engine = create_engine(DATABASE_URL)
+inspector = inspect(engine)
+
+# Tabla de origen -> columna de vehicle_image
+SOURCES = [('vehicle', 'vehicle_id'), ('client_request', 'client_request_id')]
+
+
+def table_exists(table_name):
+    """Check if table exists"""
+    try:
+        return table_name in inspector.get_table_names()
+    except Exception:
+        return False
+
+
+def create_vehicle_image_table():
+    """Create vehicle_image table (and its indexes) if it doesn't exist"""
+    if table_exists('vehicle_image'):
+        print("[INFO] Table vehicle_image already exists")
+        return True
+    try:
+        VehicleImage.__table__.create(bind=engine)
+        print("[OK] Created table vehicle_image")
+        return True
+    except Exception as e:
+        print(f"[ERROR] Failed to create vehicle_image table: {e}")
+        return False
+
+
+def add_dimension_columns():
+    """Add width/height to tables created (or trimmed) by earlier versions"""
+    columns = [c['name'] for c in inspect(engine).get_columns('vehicle_image')]
+    for column in ('width', 'height'):
+        if column in columns:
+            print(f"[INFO] Column vehicle_image.{column} already exists")
+            continue
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE vehicle_image ADD COLUMN {column} INTEGER"))
+            print(f"[OK] Added column vehicle_image.{column}")
+        except Exception as e:
+            print(f"[ERROR] Failed to add vehicle_image.{column}: {e}")
+            return False
+    return True
+
+
+def parse_images(raw):
+    if not raw:
+        return []
+    try:
+        images = json.loads(raw)
+    except (ValueError, TypeError):
+        # Valor viejo con una sola URL sin JSON
+        return [raw]
+    return images if isinstance(images, list) else []
+
+
+def backfill(table_name, owner_column):
+    """Generate vehicle_image rows from table_name.images"""
+    if not table_exists(table_name):
+        print(f"[WARN] Table {table_name} does not exist, skipping")
+        return
+    with engine.begin() as conn:
+        rows = conn.execute(text(f"SELECT id, images FROM {table_name}")).fetchall()
+        total_images = 0
+        for owner_id, raw in rows:
+            images = parse_images(raw)
+            replace_image_rows(conn, owner_column, owner_id, images)
+            total_images += len(images)
+    print(f"[OK] {table_name}: {len(rows)} publicaciones, {total_images} imágenes")
+
+
+def image_size(url, public_id):
+    """(width, height) de una imagen: Cloudinary si tiene public_id, si no el archivo en static/"""
+    if public_id:
+        if not cloudinary_storage.enabled:
+            return None
+        import cloudinary.api
+        resource = cloudinary.api.resource(public_id)
+        return resource.get('width'), resource.get('height')
+    from PIL import Image
+    path = url.lstrip('/')
+    if not path.startswith('static/'):
+        path = os.path.join('static', path)
+    if not os.path.exists(path):
+        return None
+    with Image.open(path) as image:
+        return image.size
+
+
+def backfill_dimensions():
+    """Fill width/height of the rows that don't have them yet"""
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT DISTINCT url, public_id FROM vehicle_image WHERE width IS NULL"
+        )).fetchall()
+    if any(public_id for _, public_id in rows) and not cloudinary_storage.enabled:
+        print("[WARN] Cloudinary no configurado: se omiten las imágenes de Cloudinary")
+
+    filled = 0
+    for url, public_id in rows:
+        try:
+            size = image_size(url, public_id)
+        except Exception as e:
+            print(f"[WARN] No se pudo leer el tamaño de {url}: {e}")
+            continue
+        if not size or not all(size):
+            continue
+        with engine.begin() as conn:
+            conn.execute(
+                text("UPDATE vehicle_image SET width = :width, height = :height WHERE url = :url"),
+                {'width': size[0], 'height': size[1], 'url': url}
+            )
+        filled += 1
+    print(f"[OK] Tamaño cargado para {filled} de {len(rows)} imágenes")
+
+
+def main():
+    print("="*60)
+    print("MIGRACIÓN: Tabla de imágenes vehicle_image")
+    print("="*60)
+
+    print("\n1. Creando tabla vehicle_image...")
+    if not create_vehicle_image_table():
+        return
+    if not add_dimension_columns():
+        return
+
+    print("\n2. Convirtiendo imágenes existentes (JSON -> filas)...")
+    for table_name, owner_column in SOURCES:
+        try:
+            backfill(table_name, owner_column)
+        except Exception as e:
+            print(f"[ERROR] Failed to backfill {table_name}: {e}")
+
+    print("\n3. Cargando el tamaño de las imágenes...")
+    try:
+        backfill_dimensions()
+    except Exception as e:
+        print(f"[ERROR] Failed to backfill image sizes: {e}")
+
+    print("\n" + "="*60)
+    print("MIGRACIÓN COMPLETADA")
+    print("="*60)
+    print("\nReiniciar la aplicación para que detecte la nueva tabla.")
+
+
+if __name__ == '__main__':
+    main()
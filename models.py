@@ -1,3 +1,4 @@
+import json
 from datetime import datetime
 from sqlalchemy import func
 from flask_sqlalchemy import SQLAlchemy
@@ -6,18 +7,59 @@ from flask_sqlalchemy import SQLAlchemy
 db = SQLAlchemy()
 
 
+class ImageListMixin:
+    """Parsed-once access to the JSON list stored in the `images` column"""
+
+    def _parsed_images(self):
+        # Memoized per instance; keyed on the raw string itself, so assigning
+        # a new value to `images` invalidates it
+        raw = self.images
+        cached = self.__dict__.get('_images_cache')
+        if cached is not None and cached[0] is raw:
+            return cached[1]
+        images = self.parse_images(raw)
+        self.__dict__['_images_cache'] = (raw, images)
+        return images
+
+    @staticmethod
+    def parse_images(raw):
+        """Image list from a raw `images` value ([] if empty or not a JSON list)"""
+        if not raw:
+            return []
+        try:
+            images = json.loads(raw)
+        except (ValueError, TypeError):
+            return []
+        return images if isinstance(images, list) else []
+
+    @staticmethod
+    def pick_main_image(images, main_image_index):
+        """Entry at main_image_index, or the first one if it is out of range (None if no images)"""
+        if not images:
+            return None
+        if main_image_index is not None and 0 <= main_image_index < len(images):
+            return images[main_image_index]
+        return images[0]
+
+    def get_images_list(self):
+        # Return images as-is - let templates handle URL formatting.
+        # A copy, so callers can modify it without touching the cache
+        return list(self._parsed_images())
+
+
 class Admin(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
 
 
-class Vehicle(db.Model):
+class Vehicle(ImageListMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
     price = db.Column(db.Integer, nullable=False)
     currency = db.Column(db.String(3), default='ARS')  # USD or ARS
+    price_ars = db.Column(db.BigInteger, nullable=True)  # Price converted to ARS (maintained by utils.pricing)
     year = db.Column(db.Integer)
     brand = db.Column(db.String(100))
     model = db.Column(db.String(100))
@@ -49,40 +91,52 @@ class Vehicle(db.Model):
                            onupdate=datetime.utcnow)
     location = db.Column(db.String(50), nullable=True)  # Department (e.g., Tunuyán, Tupungato, San Carlos, San Rafael)
     sub_location = db.Column(db.String(50), nullable=True)  # Sub-location (e.g., Ciudad, Vista Flores, Cordon del Plata, Cuadro Benegas)
+    # Normalized location (utils.locations, resolved from the text columns on flush)
+    location_id = db.Column(db.Integer, db.ForeignKey('location.id'), nullable=True)
+    sub_location_id = db.Column(db.Integer, db.ForeignKey('location.id'), nullable=True)
     tire_condition = db.Column(db.String(50), nullable=True)  # Estado de Cubiertas
     seller_keyword = db.Column(db.String(50), nullable=True)  # Palabra clave del vendedor para agrupar vehículos
     client_request_id = db.Column(
         db.Integer, db.ForeignKey('client_request.id'), nullable=True
     )  # Link to original request if created from client request
 
+    __table_args__ = (
+        # Public catalog: active vehicles, Plus first, newest first
+        db.Index('ix_vehicle_active_plus_created', 'is_active', 'is_plus', 'created_at'),
+        # Catalog sort options (utils.catalog.CATALOG_SORTS): one index per sort
+        # key, with id as tie-breaker so keyset cursors walk the index
+        db.Index('ix_vehicle_sort_price', 'is_active', 'price_ars', 'id'),
+        db.Index('ix_vehicle_sort_year', 'is_active', 'year', 'id'),
+        db.Index('ix_vehicle_sort_kilometers', 'is_active', 'kilometers', 'id'),
+        db.Index('ix_vehicle_sort_created', 'is_active', 'created_at', 'id'),
+        # Descending sorts put vehicles without the value last (NULLS LAST).
+        # PostgreSQL cannot get that order walking the ascending indexes
+        # backwards (SQLite sorts NULL first, so it can)
+        db.Index('ix_vehicle_sort_price_desc', 'is_active', db.text('price_ars DESC NULLS LAST'),
+                 db.text('id DESC')).ddl_if(dialect='postgresql'),
+        db.Index('ix_vehicle_sort_year_desc', 'is_active', db.text('year DESC NULLS LAST'),
+                 db.text('id DESC')).ddl_if(dialect='postgresql'),
+        db.Index('ix_vehicle_sort_kilometers_desc', 'is_active', db.text('kilometers DESC NULLS LAST'),
+                 db.text('id DESC')).ddl_if(dialect='postgresql'),
+        # Department filter and location facet counts
+        db.Index('ix_vehicle_active_location', 'is_active', 'location_id'),
+        # Vehicles created from a seller's client requests (vehicle_detail)
+        db.Index('ix_vehicle_client_request_active', 'client_request_id', 'is_active'),
+    )
+
     # Relationships
     clicks = db.relationship('Click',
                              backref='vehicle',
                              lazy=True,
                              cascade='all, delete-orphan')
 
-    def get_images_list(self):
-        if self.images:
-            import json
-            try:
-                images = json.loads(self.images)
-                # Return images as-is - let templates handle URL formatting
-                return images
-            except:
-                return []
-        return []
-
     def get_main_image(self):
-        images = self.get_images_list()
-        if images:
-            # Use the main_image_index to get the selected main image
-            main_index = self.main_image_index if (self.main_image_index is not None and 
-                                                   self.main_image_index < len(images)) else 0
-            main_image = images[main_index]
-
+        # Use the main_image_index to get the selected main image
+        main_image = self.pick_main_image(self._parsed_images(), self.main_image_index)
+        if main_image is not None:
             # Return main image as-is - let templates handle URL formatting
             return main_image
-        
+
         # Return placeholder for both free and plus plans without images
         from flask import url_for
         return url_for('static', filename='placeholder-car.png')
@@ -183,7 +237,8 @@ class Vehicle(db.Model):
         if self.location:
             return self.location
         elif self.client_request_id:
-            client_request = ClientRequest.query.get(self.client_request_id)
+            # Relationship: uses the eager-loaded request in list queries
+            client_request = self.original_request
             if client_request and client_request.location:
                 return client_request.location
         return "Valle de Uco"  # Default location
@@ -193,7 +248,7 @@ class Vehicle(db.Model):
         if self.sub_location:
             return self.sub_location
         elif self.client_request_id:
-            client_request = ClientRequest.query.get(self.client_request_id)
+            client_request = self.original_request
             if client_request and getattr(client_request, 'sub_location', None):
                 return client_request.sub_location
         return None
@@ -239,6 +294,11 @@ class Click(db.Model):
     ip_address = db.Column(db.String(45))
     user_agent = db.Column(db.String(500))
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    is_counted = db.Column(db.Boolean, default=True)  # False si la IP superó el límite de clicks
+
+    __table_args__ = (
+        db.Index('ix_click_vehicle_id', 'vehicle_id'),
+    )
 
 
 class VehicleView(db.Model):
@@ -262,9 +322,96 @@ class VehicleView(db.Model):
     is_counted = db.Column(db.Boolean, default=True)  # Si se contó en estadísticas
     blocked_reason = db.Column(db.String(100))  # Razón de bloqueo si aplica
 
+    __table_args__ = (
+        # Anti-fraude: última vista / vistas del día de una IP sobre un vehículo
+        db.Index('ix_vehicle_view_vehicle_ip_timestamp', 'vehicle_id', 'ip_address', 'timestamp'),
+        # Dashboards y ranking: vistas contadas en una ventana de tiempo
+        db.Index('ix_vehicle_view_timestamp_counted', 'timestamp', 'is_counted'),
+    )
+
     vehicle = db.relationship('Vehicle', backref='views')
 
 
+class VehicleImage(db.Model):
+    """Image of a vehicle or client request, one row per position in the gallery.
+
+    Kept in sync with the `images` JSON column by utils.images (on flush),
+    so deletes and reorders are indexed row operations and a page of cards
+    can load just its main thumbnails in one query.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    vehicle_id = db.Column(db.Integer,
+                           db.ForeignKey('vehicle.id', ondelete='CASCADE'),
+                           nullable=True)
+    client_request_id = db.Column(db.Integer,
+                                  db.ForeignKey('client_request.id', ondelete='CASCADE'),
+                                  nullable=True)
+    position = db.Column(db.Integer, nullable=False, default=0)  # Order in the gallery
+    url = db.Column(db.String(500), nullable=False)  # Original URL (Cloudinary or local path)
+    public_id = db.Column(db.String(255), nullable=True)  # Cloudinary public_id (None for local files)
+    width = db.Column(db.Integer, nullable=True)  # Original size in pixels (Cloudinary upload response)
+    height = db.Column(db.Integer, nullable=True)
+    thumb_small_url = db.Column(db.String(500), nullable=True)  # 150x150
+    thumb_medium_url = db.Column(db.String(500), nullable=True)  # 400x300
+    thumb_large_url = db.Column(db.String(500), nullable=True)  # 800x600
+
+    __table_args__ = (
+        db.Index('ix_vehicle_image_vehicle_position', 'vehicle_id', 'position'),
+        db.Index('ix_vehicle_image_request_position', 'client_request_id', 'position'),
+    )
+
+
+class SimilarVehicle(db.Model):
+    """Precomputed nearest neighbour of a vehicle (utils.recommendations),
+    read on vehicle_detail in position order"""
+    id = db.Column(db.Integer, primary_key=True)
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicle.id', ondelete='CASCADE'), nullable=False)
+    similar_vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicle.id', ondelete='CASCADE'), nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    score = db.Column(db.Float, nullable=False)  # 1 / (1 + distance)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_similar_vehicle_vehicle_position', 'vehicle_id', 'position'),
+        # Incremental refresh: lists that point to a changed vehicle
+        db.Index('ix_similar_vehicle_similar', 'similar_vehicle_id'),
+    )
+
+
+class ExchangeRate(db.Model):
+    """Local exchange rate of a currency in ARS, used to compute Vehicle.price_ars"""
+    id = db.Column(db.Integer, primary_key=True)
+    currency = db.Column(db.String(3), unique=True, nullable=False)  # e.g. 'USD'
+    rate = db.Column(db.Numeric(14, 4), nullable=False)  # ARS per unit of currency
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class CatalogState(db.Model):
+    """Single row (id=1) with the catalog version, bumped by database triggers on
+    every write to vehicle (add_catalog_version_table.py), so writes from any
+    dyno or script invalidate the in-memory caches (see utils.catalog_events)"""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class Location(db.Model):
+    """Department (parent_id NULL) or sub-location of a department, seeded from
+    utils.locations.MENDOZA_LOCATIONS"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    parent_id = db.Column(db.Integer, db.ForeignKey('location.id'), nullable=True)
+    zone = db.Column(db.String(50), nullable=True)  # e.g. 'Valle de Uco' (departments only)
+
+    parent = db.relationship('Location', remote_side=[id], backref='sub_locations')
+
+    __table_args__ = (
+        db.Index('ix_location_parent_name', 'parent_id', 'name', unique=True),
+    )
+
+    def __repr__(self):
+        return f'<Location {self.name}>'
+
+
 class DailyStats(db.Model):
     """Estadísticas agregadas por día para dashboard y reportes"""
     id = db.Column(db.Integer, primary_key=True)
@@ -293,7 +440,7 @@ class DailyStats(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
-class ClientRequest(db.Model):
+class ClientRequest(ImageListMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     # Personal information
     full_name = db.Column(db.String(200), nullable=False)
@@ -306,6 +453,8 @@ class ClientRequest(db.Model):
     location = db.Column(db.String(50),
                          nullable=False)  # Department (e.g., Tunuyán, Tupungato, San Carlos, San Rafael)
     sub_location = db.Column(db.String(50), nullable=True)  # Sub-location inside department
+    location_id = db.Column(db.Integer, db.ForeignKey('location.id'), nullable=True)
+    sub_location_id = db.Column(db.Integer, db.ForeignKey('location.id'), nullable=True)
     address = db.Column(db.String(500), nullable=True)  # Optional address
 
     # Seller grouping
@@ -342,25 +491,21 @@ class ClientRequest(db.Model):
                                       db.ForeignKey('admin.id'),
                                       nullable=True)
 
+    __table_args__ = (
+        # Solicitudes previas del mismo DNI (y estado)
+        db.Index('ix_client_request_dni_status', 'dni', 'status'),
+        # Listado del panel por estado, más recientes primero
+        db.Index('ix_client_request_status_created', 'status', 'created_at'),
+    )
+
     # Relationships
     processed_by_admin = db.relationship('Admin', backref='processed_requests')
     created_vehicle = db.relationship('Vehicle',
                                       backref='original_request',
                                       uselist=False)
 
-    def get_images_list(self):
-        if self.images:
-            import json
-            try:
-                images = json.loads(self.images)
-                # Return images as-is - let templates handle URL formatting
-                return images
-            except:
-                return []
-        return []
-
     def get_main_image(self):
-        images = self.get_images_list()
+        images = self._parsed_images()
         if images:
             return images[0]
         return "/static/placeholder-car.png"
@@ -410,10 +555,36 @@ class PageVisit(db.Model):
     referrer = db.Column(db.String(500), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_page_visit_page_created', 'page', 'created_at'),
+    )
+
     def __repr__(self):
         return f'<PageVisit {self.page} - {self.created_at}>'
 
 
+class PageVisitMinute(db.Model):
+    """Page visits per minute, page and referrer host (written by utils.page_visits).
+
+    With sampling, `visits` holds the estimated count as is (each sampled
+    visit weighs 1 / sample rate, so it is not a whole number). '' is a visit
+    without referrer.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    page = db.Column(db.String(100), nullable=False)
+    referrer_host = db.Column(db.String(255), nullable=False, default='')
+    minute = db.Column(db.DateTime, nullable=False)
+    visits = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        # Clave del upsert de cada lote y visitas de una página en un rango de tiempo
+        db.Index('ix_page_visit_minute_key', 'page', 'minute', 'referrer_host', unique=True),
+    )
+
+    def __repr__(self):
+        return f'<PageVisitMinute {self.page} {self.minute} {self.referrer_host}: {self.visits}>'
+
+
 class Gestor(db.Model):
     """Model for automotive managers/brokers"""
     id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Recalcula los vehículos similares de todo el catálogo (tabla similar_vehicle)
+Crea la tabla si no existe y reconstruye todas las listas con numpy. Entre
+ejecuciones la aplicación las actualiza de forma incremental al modificar
+publicaciones; correrlo periódicamente (p.ej. una vez por día con el
+scheduler de Heroku) recoge los cambios masivos (p.ej. cambio de cotización).
+
+Uso: python refresh_similar_vehicles.py
+"""
+import os
+import sys
+import time
+os.environ.setdefault("SKIP_ROUTES", "1")
+
+from app import app, db
+from models import SimilarVehicle
+from utils import recommendations
+
+
+def create_similar_vehicle_table():
+    if recommendations.similar_table_ready():
+        print("[INFO] Table similar_vehicle already exists")
+        return
+    SimilarVehicle.__table__.create(bind=db.engine)
+    recommendations._table_cache.clear()
+    print("[OK] Created table similar_vehicle")
+
+
+def main():
+    print("="*60)
+    print("VEHÍCULOS SIMILARES: reconstrucción completa")
+    print("="*60)
+
+    if recommendations.np is None:
+        print("[ERROR] numpy no está instalado (pip install -r requirements.txt)")
+        sys.exit(1)
+
+    with app.app_context():
+        try:
+            create_similar_vehicle_table()
+            started = time.monotonic()
+            lists = recommendations.similarity_engine.rebuild()
+        except Exception as e:
+            print(f"[ERROR] Refresh failed: {e}")
+            sys.exit(1)
+        print(f"[OK] {lists} lista(s) de similares guardadas en {time.monotonic() - started:.1f}s")
+
+    print("\n" + "="*60)
+    print("RECONSTRUCCIÓN COMPLETADA")
+    print("="*60)
+
+
+if __name__ == '__main__':
+    main()
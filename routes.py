@@ -3,16 +3,16 @@ import json
 import hashlib
 import secrets
 import logging
-from flask import render_template, request, redirect, url_for, session, flash, jsonify, make_response, send_file
+from flask import render_template, request, redirect, url_for, session, flash, jsonify, make_response, send_file, Response, stream_with_context, abort
 from werkzeug.security import check_password_hash, generate_password_hash
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
 import uuid
 import base64
 import re
-from cloudinary_storage import upload_to_cloudinary, delete_from_cloudinary
+from cloudinary_storage import upload_to_cloudinary, delete_from_cloudinary, public_id_from_url
 from app import app, db
-from models import Vehicle, Admin, Click, VehicleView, ClientRequest, PageVisit, Gestor
+from models import Vehicle, Admin, Click, VehicleView, ClientRequest, PageVisitMinute, Gestor
 import urllib.parse
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
@@ -56,23 +56,15 @@ def verify_password_sha256(password, stored_hash):
     return computed_hash == password_hash
 
 def track_page_visit(page_name):
-    """Track page visits for analytics"""
+    """Track page visits for analytics (sampled and counted per minute, see utils.page_visits)"""
+    from utils.page_visits import page_visit_pipeline
     try:
         # Get client information
         ip_address = request.environ.get('HTTP_X_FORWARDED_FOR', request.environ.get('REMOTE_ADDR'))
         user_agent = request.headers.get('User-Agent')
         referrer = request.headers.get('Referer')
         
-        # Create page visit record
-        visit = PageVisit(
-            page=page_name,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            referrer=referrer
-        )
-        
-        db.session.add(visit)
-        db.session.commit()
+        page_visit_pipeline.record(page_name, ip_address, user_agent, referrer)
     except Exception as e:
         # Log error but don't break the page
         print(f"Error tracking page visit: {e}")
@@ -90,113 +82,68 @@ def index():
     track_page_visit('index')
     
     # Get search and filter parameters
-    search_query = request.args.get('search', '').strip()
-    price_min = request.args.get('price_min', type=int)
-    price_max = request.args.get('price_max', type=int)
-    brand = request.args.get('brand', '').strip()
-    year_min = request.args.get('year_min', type=int)
-    year_max = request.args.get('year_max', type=int)
-    location = request.args.get('location', '').strip()
-    fuel_type = request.args.get('fuel_type', '').strip()
-    transmission = request.args.get('transmission', '').strip()
-    km_min = request.args.get('km_min', type=int)
-    km_max = request.args.get('km_max', type=int)
-    
-    # Start with base query
-    query = Vehicle.query.filter_by(is_active=True)
-    
-    # Apply search filter
-    if search_query:
-        search_filter = f"%{search_query}%"
-        query = query.filter(
-            db.or_(
-                Vehicle.title.ilike(search_filter),
-                Vehicle.brand.ilike(search_filter),
-                Vehicle.model.ilike(search_filter),
-                Vehicle.description.ilike(search_filter),
-                Vehicle.seller_keyword.ilike(search_filter)
-            )
-        )
+    from utils.catalog import parse_catalog_filters
+    from utils.carousel import view_ranking
+    from utils.page_cache import catalog_page_cache
+    current_filters = parse_catalog_filters(request.args)
+    
+    # Anonymous visitors get the rendered page from cache (keyed by catalog
+    # version, carousel ranking and normalized filters), with ETag/304
+    cache_key = catalog_page_cache.key(
+        tuple(view_ranking.ranking()),
+        tuple(sorted((k, v) for k, v in current_filters.items() if v not in (None, ''))),
+        request.args.get('page', 1, type=int),
+        request.args.get('after'),
+        request.args.get('before')
+    )
+    return catalog_page_cache.respond(cache_key, lambda: render_catalog(current_filters))
+
+
+def render_catalog(current_filters):
+    """Render the public catalog page for the given filters"""
+    from utils.catalog import apply_catalog_filters, catalog_order, catalog_uses_cursors, paginate_catalog, count_catalog, with_request_location, MAX_OFFSET_PAGE
+    query, search_rank = apply_catalog_filters(Vehicle.query, current_filters)
     
-    # Apply price filters
-    if price_min is not None:
-        query = query.filter(Vehicle.price >= price_min)
-    if price_max is not None:
-        query = query.filter(Vehicle.price <= price_max)
-    
-    # Apply brand filter
-    if brand:
-        query = query.filter(Vehicle.brand.ilike(f"%{brand}%"))
-    
-    # Apply year filters
-    if year_min is not None:
-        query = query.filter(Vehicle.year >= year_min)
-    if year_max is not None:
-        query = query.filter(Vehicle.year <= year_max)
-    
-    # Apply location filter by department stored in Vehicle.location
-    if location:
-        query = query.filter(Vehicle.location.ilike(f"%{location}%"))
-    
-    # Apply fuel type filter
-    if fuel_type:
-        query = query.filter(Vehicle.fuel_type == fuel_type)
-    
-    # Apply transmission filter
-    if transmission:
-        query = query.filter(Vehicle.transmission == transmission)
-    
-    # Apply kilometers filters
-    if km_min is not None:
-        query = query.filter(Vehicle.kilometers >= km_min)
-    if km_max is not None:
-        query = query.filter(Vehicle.kilometers <= km_max)
-    
-    # Pagination parameters
+    # Pagination happens in the database: only one page of rows is loaded.
+    # Order: by relevance when searching, otherwise Plus first, then newest
     page = request.args.get('page', 1, type=int)
-    per_page = 10
+    result = paginate_catalog(
+        with_request_location(query),
+        page=page,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        order=catalog_order(search_rank, current_filters['sort']),
+        cursors=catalog_uses_cursors(search_rank, current_filters['sort'])
+    )
+    vehicles = result['items']
+    page = result['page']
+    per_page = result['per_page']
     
-    # Order vehicles: Plus first, then Free, then by creation date (newest first)
-    all_vehicles = query.order_by(
-        Vehicle.is_plus.desc(),  # Plus vehicles first (True > False)
-        Vehicle.created_at.desc()  # Then by newest first
-    ).all()
+    # Separate count query (no rows hydrated)
+    total_vehicles = count_catalog(query)
+    total_pages = (total_vehicles + per_page - 1) // per_page
+    has_prev = result['has_prev']
+    has_next = result['has_next']
     
-    # Calculate pagination
-    total_vehicles = len(all_vehicles)
-    start_index = (page - 1) * per_page
-    end_index = start_index + per_page
-    vehicles = all_vehicles[start_index:end_index]
+    # Most viewed Plus vehicles for the carousel (precomputed ranking)
+    from utils.carousel import view_ranking
+    most_viewed_vehicles = view_ranking.top_vehicles()
     
-    # Calculate pagination info
-    total_pages = (total_vehicles + per_page - 1) // per_page
-    has_prev = page > 1
-    has_next = page < total_pages
+    # Main image rows (thumbnail variants) for the carousel and simple cards, in one query
+    from utils.images import main_images
+    card_images = main_images(list(vehicles) + [v for v, _ in most_viewed_vehicles])
     
-    # Get most viewed vehicles for the carousel (only Plus publications)
-    from sqlalchemy import func
-    most_viewed_vehicles = db.session.query(
-        Vehicle,
-        func.count(VehicleView.id).label('view_count')
-    ).outerjoin(VehicleView).filter(
-        Vehicle.is_active == True,
-        Vehicle.is_plus == True  # Only Plus publications
-    ).group_by(Vehicle.id).order_by(
-        func.count(VehicleView.id).desc()
-    ).limit(10).all()
-    
-    # Get unique brands for filter dropdown
-    unique_brands = db.session.query(Vehicle.brand).filter(
-        Vehicle.is_active == True,
-        Vehicle.brand.isnot(None),
-        Vehicle.brand != ''
-    ).distinct().order_by(Vehicle.brand).all()
-    brands = [brand[0] for brand in unique_brands]
+    # Brands for the filter dropdown and result counts per filter option
+    from utils.facets import facet_engine
+    brands = facet_engine.brands()
+    facets = facet_engine.counts(current_filters)
     
     return render_template('index.html', 
                          vehicles=vehicles, 
                          most_viewed_vehicles=most_viewed_vehicles,
                          brands=brands,
+                         facets=facets,
+                         card_images=card_images,
                          pagination={
                              'page': page,
                              'per_page': per_page,
@@ -205,21 +152,12 @@ def index():
                              'has_prev': has_prev,
                              'has_next': has_next,
                              'prev_num': page - 1 if has_prev else None,
-                             'next_num': page + 1 if has_next else None
+                             'next_num': page + 1 if has_next else None,
+                             'prev_cursor': result['prev_cursor'],
+                             'next_cursor': result['next_cursor'],
+                             'max_offset_page': MAX_OFFSET_PAGE
                          },
-                         current_filters={
-                             'search': search_query,
-                             'price_min': price_min,
-                             'price_max': price_max,
-                             'brand': brand,
-                             'year_min': year_min,
-                             'year_max': year_max,
-                             'location': location,
-                             'fuel_type': fuel_type,
-                             'transmission': transmission,
-                             'km_min': km_min,
-                             'km_max': km_max
-                         })
+                         current_filters=current_filters)
 
 @app.route('/version')
 def version():
@@ -231,26 +169,14 @@ def version():
         sha = 'unknown'
     return jsonify({'version': sha})
 
-@app.route('/api/search')
-def api_search():
-    """API endpoint for AJAX search"""
-    search_query = request.args.get('q', '').strip()
-    
-    if not search_query:
-        return jsonify({'vehicles': []})
-    
-    # Search in title, brand, model, description, and seller keyword
-    search_filter = f"%{search_query}%"
-    vehicles = Vehicle.query.filter(
-        Vehicle.is_active == True,
-        db.or_(
-            Vehicle.title.ilike(search_filter),
-            Vehicle.brand.ilike(search_filter),
-            Vehicle.model.ilike(search_filter),
-            Vehicle.description.ilike(search_filter),
-            Vehicle.seller_keyword.ilike(search_filter)
-        )
-    ).limit(10).all()
+def search_vehicles(search_query, sort=None, limit=10):
+    """Top search results serialized for the AJAX search box"""
+    from utils.search import apply_search
+    from utils.catalog import order_catalog, catalog_order
+    query, rank = apply_search(Vehicle.query.filter(Vehicle.is_active == True), search_query)
+    if sort or rank is not None:
+        query = order_catalog(query, catalog_order(rank, sort))
+    vehicles = query.limit(limit).all()
     
     # Format results for JSON response
     results = []
@@ -267,77 +193,169 @@ def api_search():
             'image': vehicle.get_main_image(),
             'url': url_for('vehicle_detail', id=vehicle.id)
         })
-    
-    return jsonify({'vehicles': results})
+    return results
 
-@app.route('/vehicle/<int:id>')
-def vehicle_detail(id):
-    vehicle = Vehicle.query.get_or_404(id)
+@app.route('/api/search')
+def api_search():
+    """API endpoint for AJAX search"""
+    search_query = request.args.get('q', '').strip()
     
-    # Track view con sistema anti-fraude
-    from utils.analytics import create_vehicle_view
+    if not search_query:
+        return jsonify({'vehicles': []})
     
-    ip_address = request.remote_addr
-    user_agent = request.headers.get('User-Agent', '')
-    referrer = request.referrer
+    # Full-text search over title, brand, model, description and seller keyword,
+    # most relevant first unless a sort option is given. Results are cached per
+    # normalized query until the catalog changes (utils.search_cache)
+    from utils.catalog import CATALOG_SORTS
+    from utils.search_cache import search_cache
+    sort = request.args.get('sort') if request.args.get('sort') in CATALOG_SORTS else None
+    results = search_cache.get_or_compute(search_query, sort, lambda: search_vehicles(search_query, sort))
     
-    # Crear vista con anti-fraude
-    view, should_count = create_vehicle_view(
-        vehicle_id=vehicle.id,
-        ip_address=ip_address,
-        user_agent=user_agent,
-        referrer=referrer
-    )
+    return jsonify({'vehicles': results})
+
+@app.route('/api/vehicles')
+def api_vehicles():
+    """Catalog as JSON: index filters and sorts, cursor pagination and sparse fieldsets"""
+    from utils.catalog import parse_catalog_filters, apply_catalog_filters
+    from utils.vehicle_api import parse_fields, decode_api_cursor, stream_vehicles, DEFAULT_LIMIT, MAX_LIMIT, API_FIELDS
+    
+    fields, unknown = parse_fields(request.args.get('fields', ''))
+    if unknown:
+        return jsonify({'error': f"Campos desconocidos: {', '.join(unknown)}",
+                        'fields': list(API_FIELDS)}), 400
+    limit = max(1, min(request.args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT))
+    
+    current_filters = parse_catalog_filters(request.args)
+    query, rank = apply_catalog_filters(Vehicle.query, current_filters)
+    cursor = request.args.get('cursor') or None
+    position = decode_api_cursor(cursor, rank, current_filters['sort']) if cursor else None
+    if cursor and position is None:
+        return jsonify({'error': 'Cursor inválido'}), 400
+    
+    return Response(stream_with_context(stream_vehicles(query, rank, current_filters, fields, limit, position)),
+                    mimetype='application/json')
+
+@app.route('/sitemap.xml')
+def sitemap():
+    """Sitemap (or sitemap index past 50k URLs), cached on disk per catalog version"""
+    from utils.sitemap import sitemap_path
+    return send_file(sitemap_path(request.host_url.rstrip('/')), mimetype='application/xml')
+
+@app.route('/sitemap-<int:part>.xml')
+def sitemap_part(part):
+    """One file of a split sitemap (listed in the sitemap index)"""
+    from utils.sitemap import sitemap_path
+    path = sitemap_path(request.host_url.rstrip('/'), f'sitemap-{part}.xml')
+    if path is None:
+        abort(404)
+    return send_file(path, mimetype='application/xml')
+
+@app.route('/api/autocomplete')
+def api_autocomplete():
+    """Typeahead suggestions for the search box, served from an in-memory prefix index"""
+    from utils.autocomplete import autocomplete_index
+    prefix = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 8, type=int), 20))
+    
+    return jsonify({'suggestions': autocomplete_index.suggest(prefix, limit=limit)})
+
+@app.route('/api/facets')
+def api_facets():
+    """Result counts per filter option for the current catalog filters"""
+    from utils.catalog import parse_catalog_filters
+    from utils.facets import facet_engine
     
-    db.session.add(view)
-    db.session.commit()
+    return jsonify(facet_engine.counts(parse_catalog_filters(request.args)))
+
+@app.route('/vehicle/<int:id>')
+def vehicle_detail(id):
+    from utils.page_cache import vehicle_page_cache
     
-    # Nota: El conteo de vistas se hace directamente desde VehicleView
-    # con is_counted=True para filtrar vistas bloqueadas por fraude
+    # La vista se registra desde la página (beacon a track_vehicle_view), así
+    # este HTML no depende de quién lo pide: los visitantes anónimos reciben
+    # la ficha del cache (por vehículo, versión del catálogo y host), con ETag/304
+    cache_key = vehicle_page_cache.key(id, request.host_url)
+    return vehicle_page_cache.respond(cache_key, lambda: render_vehicle_detail(id))
+
+
+def render_vehicle_detail(id):
+    """Render the public detail page of a vehicle"""
+    vehicle = Vehicle.query.get_or_404(id)
     
     # Check if seller has multiple vehicles (for share button)
     seller_vehicle_count = 0
     seller_name = "Vendedor"
     
-    if vehicle.client_request_id:
-        # Get the original client request to find DNI
-        client_request = ClientRequest.query.get(vehicle.client_request_id)
-        if client_request and client_request.dni:
-            # Count vehicles from the same DNI (through client requests)
-            seller_requests = ClientRequest.query.filter_by(
-                dni=client_request.dni,
-                status='approved'
-            ).all()
-            
-            # Count active vehicles from these requests
-            for req in seller_requests:
-                vehicle_from_request = Vehicle.query.filter_by(
-                    client_request_id=req.id,
-                    is_active=True
-                ).first()
-                if vehicle_from_request:
-                    seller_vehicle_count += 1
-            
-            seller_name = client_request.full_name
+    client_request = vehicle.original_request if vehicle.client_request_id else None
+    if client_request and client_request.dni:
+        # Active vehicles from the same DNI (through approved client requests),
+        # counted in one query whatever the seller's history
+        seller_vehicle_count = db.session.query(
+            db.func.count(db.distinct(Vehicle.client_request_id))
+        ).join(
+            ClientRequest, ClientRequest.id == Vehicle.client_request_id
+        ).filter(
+            ClientRequest.dni == client_request.dni,
+            ClientRequest.status == 'approved',
+            Vehicle.is_active == True
+        ).scalar() or 0
+        
+        seller_name = client_request.full_name
+    
+    # Precomputed nearest neighbours (utils.recommendations)
+    from utils.recommendations import similarity_engine
+    similar_vehicles = similarity_engine.similar_to(vehicle.id)
     
     return render_template('vehicle_detail.html', 
                          vehicle=vehicle, 
                          seller_vehicle_count=seller_vehicle_count,
-                         seller_name=seller_name)
+                         seller_name=seller_name,
+                         similar_vehicles=similar_vehicles)
+
+@app.route('/vehicle/<int:id>/view', methods=['POST'])
+def track_vehicle_view(id):
+    """View beacon sent by vehicle_detail.html (navigator.sendBeacon)"""
+    from utils.contact_cache import contact_cache
+    from utils.analytics import create_vehicle_view
+    from utils.write_behind import vehicle_view_buffer
+    
+    # Sólo vehículos que existen (consulta en cache)
+    if contact_cache.get(id) is not None:
+        # Crear vista con anti-fraude
+        view, should_count = create_vehicle_view(
+            vehicle_id=id,
+            ip_address=request.remote_addr,
+            user_agent=request.headers.get('User-Agent', '')[:500],
+            referrer=(request.form.get('referrer') or '')[:500] or None
+        )
+        
+        # Se inserta en lote desde un hilo de fondo, fuera del request.
+        # Nota: El conteo de vistas se hace directamente desde VehicleView
+        # con is_counted=True para filtrar vistas bloqueadas por fraude
+        vehicle_view_buffer.add(view)
+    
+    return '', 204
 
 @app.route('/track_click/<int:vehicle_id>/<click_type>')
 def track_click(vehicle_id, click_type):
-    vehicle = Vehicle.query.get_or_404(vehicle_id)
-    
-    # Track click
-    click = Click(
+    from utils.contact_cache import contact_cache
+    from utils.analytics import should_count_click
+    from utils.write_behind import click_buffer
+    
+    # Número y datos del mensaje desde el cache (sin consultar la base)
+    vehicle = contact_cache.get(vehicle_id)
+    if vehicle is None:
+        abort(404)
+    
+    # Track click (se inserta en lote desde un hilo de fondo, fuera del request).
+    # Los clicks repetidos de una misma IP se guardan sin contar en estadísticas
+    click_buffer.add(Click(
         vehicle_id=vehicle_id,
         click_type=click_type,
         ip_address=request.remote_addr,
-        user_agent=request.headers.get('User-Agent', '')[:500]
-    )
-    db.session.add(click)
-    db.session.commit()
+        user_agent=request.headers.get('User-Agent', '')[:500],
+        is_counted=should_count_click(request.remote_addr)
+    ))
     
     # Generate WhatsApp URL
     if click_type == 'whatsapp':
@@ -364,10 +382,12 @@ def panel_login():
     
     if request.method == 'POST':
         import time
+        from utils.shared_counters import shared_counters
         
-        # Control de intentos fallidos
+        # Control de intentos fallidos (por sesión y por IP en todos los workers)
         failed_attempts = session.get('failed_attempts', 0)
-        if failed_attempts >= 5:
+        failed_key = f'login_failed:{request.remote_addr}'
+        if failed_attempts >= 5 or shared_counters.count(failed_key, 15 * 60) >= 5:
             flash('Demasiados intentos fallidos. Intente más tarde.', 'error')
             return render_template('login.html')
         
@@ -377,6 +397,7 @@ def panel_login():
         # Validaciones básicas
         if not username or not password:
             session['failed_attempts'] = failed_attempts + 1
+            shared_counters.append(failed_key)
             flash('Acceso denegado', 'error')
             return render_template('login.html')
         
@@ -412,6 +433,7 @@ def panel_login():
             logging.warning(f"Intento de acceso no autorizado desde IP: {request.remote_addr}, UA: {request.headers.get('User-Agent', 'Unknown')}")
             
             session['failed_attempts'] = failed_attempts + 1
+            shared_counters.append(failed_key)
             flash('Acceso denegado', 'error')
     
     return render_template('login.html')
@@ -435,16 +457,20 @@ def admin_dashboard():
     # Get statistics
     active_vehicles = Vehicle.query.filter_by(is_active=True).count()
     total_vehicles = Vehicle.query.count()
-    total_whatsapp_clicks = Click.query.filter_by(click_type='whatsapp').count()
+    total_whatsapp_clicks = Click.query.filter_by(click_type='whatsapp', is_counted=True).count()
     total_views = VehicleView.query.count()
     pending_requests_count = ClientRequest.query.filter_by(status='pending').count()
     
-    # Get page visit statistics
-    total_page_visits = PageVisit.query.filter_by(page='index').count()
-    today_visits = PageVisit.query.filter(
-        PageVisit.page == 'index',
-        PageVisit.created_at >= datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    ).count()
+    # Get page visit statistics (per-minute counters, see utils.page_visits)
+    total_page_visits = db.session.query(db.func.coalesce(db.func.sum(PageVisitMinute.visits), 0)).filter(
+        PageVisitMinute.page == 'index'
+    ).scalar()
+    total_page_visits = round(total_page_visits)  # estimación con muestreo
+    today_visits = db.session.query(db.func.coalesce(db.func.sum(PageVisitMinute.visits), 0)).filter(
+        PageVisitMinute.page == 'index',
+        PageVisitMinute.minute >= datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    ).scalar()
+    today_visits = round(today_visits)
     
     # Most viewed vehicles with dynamic sorting
     from sqlalchemy import func
@@ -459,7 +485,7 @@ def admin_dashboard():
     clicks_subquery = db.session.query(
         Click.vehicle_id,
         func.count(Click.id).label('click_count')
-    ).group_by(Click.vehicle_id).subquery()
+    ).filter(Click.is_counted == True).group_by(Click.vehicle_id).subquery()
     
     # Query principal con joins separados
     query = db.session.query(
@@ -634,6 +660,8 @@ def edit_vehicle(id):
                 print(f"[ADMIN EDIT] Invalid main_image_index received: {e}")
         
         db.session.commit()
+        from utils.page_cache import vehicle_page_cache
+        vehicle_page_cache.evict(id)
         flash('Vehículo actualizado exitosamente', 'success')
         return redirect(url_for('admin_dashboard'))
     
@@ -691,6 +719,9 @@ def delete_vehicle(id):
     
     vehicle = Vehicle.query.get_or_404(id)
     
+    from utils.images import stored_public_ids
+    public_ids = stored_public_ids(vehicle.id)
+    
     print(f"🔍 DEBUG: Vehicle images field: {vehicle.images}")
     print(f"🔍 DEBUG: Vehicle images type: {type(vehicle.images)}")
     
@@ -711,48 +742,17 @@ def delete_vehicle(id):
             if 'cloudinary.com' in image_url or 'res.cloudinary.com' in image_url:
                 print(f"🔍 DEBUG: Detected Cloudinary URL: {image_url}")
                 try:
-                    # Extract public_id from Cloudinary URL
-                    # URL format: https://res.cloudinary.com/cloud_name/image/upload/v123456/folder/public_id.ext
-                    url_parts = image_url.split('/')
-                    print(f"🔍 DEBUG: URL parts: {url_parts}")
-                    
-                    if len(url_parts) >= 2:
-                        # Find the part after 'upload' or 'upload/v123456'
-                        upload_index = -1
-                        for j, part in enumerate(url_parts):
-                            if part == 'upload':
-                                upload_index = j
-                                break
-                        
-                        print(f"🔍 DEBUG: Upload index found at: {upload_index}")
-                        
-                        if upload_index != -1:
-                            # Get everything after upload (skip version if present)
-                            remaining_parts = url_parts[upload_index + 1:]
-                            print(f"🔍 DEBUG: Remaining parts after upload: {remaining_parts}")
-                            
-                            if remaining_parts and remaining_parts[0].startswith('v'):
-                                # Skip version number
-                                remaining_parts = remaining_parts[1:]
-                                print(f"🔍 DEBUG: After skipping version: {remaining_parts}")
-                            
-                            if remaining_parts:
-                                # Join the remaining parts and remove file extension
-                                public_id = '/'.join(remaining_parts)
-                                public_id = os.path.splitext(public_id)[0]  # Remove extension
-                                
-                                print(f"🗑️ Attempting to delete Cloudinary image with public_id: {public_id}")
-                                success = delete_from_cloudinary(public_id)
-                                if success:
-                                    print(f"✅ Successfully deleted from Cloudinary: {public_id}")
-                                else:
-                                    print(f"❌ Failed to delete from Cloudinary: {public_id}")
-                            else:
-                                print(f"❌ No remaining parts to form public_id")
+                    # public_id stored in vehicle_image (falls back to parsing the URL)
+                    public_id = public_ids.get(image_url) or public_id_from_url(image_url)
+                    if public_id:
+                        print(f"🗑️ Attempting to delete Cloudinary image with public_id: {public_id}")
+                        success = delete_from_cloudinary(public_id)
+                        if success:
+                            print(f"✅ Successfully deleted from Cloudinary: {public_id}")
                         else:
-                            print(f"❌ 'upload' not found in URL parts")
+                            print(f"❌ Failed to delete from Cloudinary: {public_id}")
                     else:
-                        print(f"❌ URL has insufficient parts: {len(url_parts)}")
+                        print(f"❌ Could not determine public_id for: {image_url}")
                 except Exception as e:
                     print(f"❌ Error deleting Cloudinary image {image_url}: {e}")
                     import traceback
@@ -784,6 +784,8 @@ def delete_vehicle(id):
     # Delete vehicle from database
     db.session.delete(vehicle)
     db.session.commit()
+    from utils.page_cache import vehicle_page_cache
+    vehicle_page_cache.evict(id)
     
     flash('Vehículo eliminado exitosamente', 'success')
     return redirect(url_for('admin_dashboard'))
@@ -1221,9 +1223,15 @@ def admin_statistics():
     
     # Top vehículos más vistos
     top_vehicles_data = get_top_vehicles(days=days, limit=10)
+    from utils.catalog import with_request_location
+    vehicles_by_id = {
+        v.id: v for v in with_request_location(Vehicle.query).filter(
+            Vehicle.id.in_([vehicle_id for vehicle_id, _ in top_vehicles_data])
+        ).all()
+    }
     top_vehicles = []
     for vehicle_id, views in top_vehicles_data:
-        vehicle = Vehicle.query.get(vehicle_id)
+        vehicle = vehicles_by_id.get(vehicle_id)
         if vehicle:
             top_vehicles.append({
                 'vehicle': vehicle,
@@ -1450,6 +1458,8 @@ def update_premium_duration(vehicle_id, months):
         vehicle.premium_expires_at = datetime.utcnow() + timedelta(days=months * 30)
     
     db.session.commit()
+    from utils.page_cache import vehicle_page_cache
+    vehicle_page_cache.evict(vehicle_id)
     
     return jsonify({'success': True, 'message': f'Duración premium actualizada a {months} meses'})
 
@@ -1462,6 +1472,8 @@ def toggle_vehicle_status(vehicle_id):
         vehicle = Vehicle.query.get_or_404(vehicle_id)
         vehicle.is_active = not vehicle.is_active
         db.session.commit()
+        from utils.page_cache import vehicle_page_cache
+        vehicle_page_cache.evict(vehicle_id)
         
         status_text = "activado" if vehicle.is_active else "pausado"
         return jsonify({
@@ -1482,6 +1494,8 @@ def delete_vehicle_ajax(vehicle_id):
         vehicle = Vehicle.query.get_or_404(vehicle_id)
         
         # Delete associated images from Cloudinary and filesystem
+        from utils.images import stored_public_ids
+        public_ids = stored_public_ids(vehicle.id)
         import os
         upload_folder = app.config['UPLOAD_FOLDER']
         
@@ -1525,47 +1539,17 @@ def delete_vehicle_ajax(vehicle_id):
                 if 'cloudinary.com' in image_url or 'res.cloudinary.com' in image_url:
                     print(f"🔍 DEBUG: Detected Cloudinary URL: {image_url}")
                     try:
-                        # Extract public_id from Cloudinary URL
-                        url_parts = image_url.split('/')
-                        print(f"🔍 DEBUG: URL parts: {url_parts}")
-                        
-                        if len(url_parts) >= 2:
-                            # Find the part after 'upload'
-                            upload_index = -1
-                            for j, part in enumerate(url_parts):
-                                if part == 'upload':
-                                    upload_index = j
-                                    break
-                            
-                            print(f"🔍 DEBUG: Upload index found at: {upload_index}")
-                            
-                            if upload_index != -1:
-                                # Get everything after upload (skip version if present)
-                                remaining_parts = url_parts[upload_index + 1:]
-                                print(f"🔍 DEBUG: Remaining parts after upload: {remaining_parts}")
-                                
-                                if remaining_parts and remaining_parts[0].startswith('v'):
-                                    # Skip version number
-                                    remaining_parts = remaining_parts[1:]
-                                    print(f"🔍 DEBUG: After skipping version: {remaining_parts}")
-                                
-                                if remaining_parts:
-                                    # Join the remaining parts and remove file extension
-                                    public_id = '/'.join(remaining_parts)
-                                    public_id = os.path.splitext(public_id)[0]  # Remove extension
-                                    
-                                    print(f"🗑️ Attempting to delete Cloudinary image with public_id: {public_id}")
-                                    success = delete_from_cloudinary(public_id)
-                                    if success:
-                                        print(f"✅ Successfully deleted from Cloudinary: {public_id}")
-                                    else:
-                                        print(f"❌ Failed to delete from Cloudinary: {public_id}")
-                                else:
-                                    print(f"❌ No remaining parts to form public_id")
+                        # public_id stored in vehicle_image (falls back to parsing the URL)
+                        public_id = public_ids.get(image_url) or public_id_from_url(image_url)
+                        if public_id:
+                            print(f"🗑️ Attempting to delete Cloudinary image with public_id: {public_id}")
+                            success = delete_from_cloudinary(public_id)
+                            if success:
+                                print(f"✅ Successfully deleted from Cloudinary: {public_id}")
                             else:
-                                print(f"❌ 'upload' not found in URL parts")
+                                print(f"❌ Failed to delete from Cloudinary: {public_id}")
                         else:
-                            print(f"❌ URL has insufficient parts: {len(url_parts)}")
+                            print(f"❌ Could not determine public_id for: {image_url}")
                     except Exception as e:
                         print(f"❌ Error deleting Cloudinary image {image_url}: {e}")
                         import traceback
@@ -1616,6 +1600,8 @@ def delete_vehicle_ajax(vehicle_id):
         # Delete vehicle from database
         db.session.delete(vehicle)
         db.session.commit()
+        from utils.page_cache import vehicle_page_cache
+        vehicle_page_cache.evict(vehicle_id)
         
         return jsonify({
             'success': True, 
@@ -1638,12 +1624,7 @@ def gestores():
     regular_gestores = Gestor.query.filter_by(is_active=True, is_featured=False).all()
     
     # Track page visit
-    try:
-        page_visit = PageVisit(page='gestores')
-        db.session.add(page_visit)
-        db.session.commit()
-    except:
-        pass  # Don't fail if tracking fails
+    track_page_visit('gestores')
     
     return render_template('gestores.html', 
                          featured_gestores=featured_gestores,
@@ -2040,7 +2021,7 @@ def admin_seller_keywords():
             total_clicks = 0
             for vehicle in vehicles:
                 vehicle_views = VehicleView.query.filter_by(vehicle_id=vehicle.id).count()
-                vehicle_clicks = Click.query.filter_by(vehicle_id=vehicle.id).count()
+                vehicle_clicks = Click.query.filter_by(vehicle_id=vehicle.id, is_counted=True).count()
                 total_views += vehicle_views
                 total_clicks += vehicle_clicks
             
@@ -2083,7 +2064,8 @@ def seller_profile(keyword):
     track_page_visit(f'seller_profile_{keyword}')
     
     # Get all vehicles for this seller keyword
-    vehicles = Vehicle.query.filter_by(seller_keyword=keyword, is_active=True).order_by(
+    from utils.catalog import with_request_location
+    vehicles = with_request_location(Vehicle.query).filter_by(seller_keyword=keyword, is_active=True).order_by(
         Vehicle.is_plus.desc(),  # Plus vehicles first
         Vehicle.created_at.desc()  # Then by newest first
     ).all()
@@ -2092,10 +2074,13 @@ def seller_profile(keyword):
         # If no vehicles found, redirect to main page with search
         return redirect(url_for('index', search=keyword))
     
-    # Get seller information from the first vehicle
+    # Get seller information from the first vehicle. Vehicle has no name
+    # column: the seller's name comes from the client request it was created
+    # from, if any
+    original_request = vehicles[0].original_request
     seller_info = {
         'keyword': keyword,
-        'name': vehicles[0].full_name if vehicles[0].full_name else 'Vendedor',
+        'name': (original_request.full_name if original_request else None) or 'Vendedor',
         'location': vehicles[0].location if vehicles[0].location else '',
         'whatsapp': vehicles[0].whatsapp_number if vehicles[0].whatsapp_number else '',
         'total_vehicles': len(vehicles)
@@ -2106,7 +2091,7 @@ def seller_profile(keyword):
     total_clicks = 0
     for vehicle in vehicles:
         vehicle_views = VehicleView.query.filter_by(vehicle_id=vehicle.id).count()
-        vehicle_clicks = Click.query.filter_by(vehicle_id=vehicle.id).count()
+        vehicle_clicks = Click.query.filter_by(vehicle_id=vehicle.id, is_counted=True).count()
         total_views += vehicle_views
         total_clicks += vehicle_clicks
     
@@ -2121,6 +2106,60 @@ def seller_profile(keyword):
                          seller_info=seller_info,
                          seller_stats=seller_stats)
 
+@app.route('/admin/api/exchange-rates', methods=['GET', 'POST'])
+def api_exchange_rates():
+    """List or set the local exchange rates used for Vehicle.price_ars"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'success': False, 'error': 'No autorizado'}), 401
+    
+    from models import ExchangeRate
+    from utils.pricing import set_exchange_rate
+    
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or request.form
+        currency = (data.get('currency') or '').strip()
+        rate = data.get('rate')
+        if not currency or not rate:
+            return jsonify({'success': False, 'error': 'Faltan parámetros'})
+        try:
+            updated = set_exchange_rate(currency, rate)
+        except (ValueError, ArithmeticError):
+            db.session.rollback()
+            return jsonify({'success': False, 'error': 'Cotización inválida'})
+        return jsonify({'success': True, 'message': f'Cotización actualizada. {updated} vehículos recalculados.'})
+    
+    rates = ExchangeRate.query.order_by(ExchangeRate.currency).all()
+    return jsonify({
+        'success': True,
+        'rates': [{
+            'currency': r.currency,
+            'rate': float(r.rate),
+            'updated_at': r.updated_at.isoformat() if r.updated_at else None
+        } for r in rates]
+    })
+
+@app.route('/admin/api/cache-stats')
+def api_cache_stats():
+    """Size and hit/miss counters of this worker's in-memory caches"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'success': False, 'error': 'No autorizado'}), 401
+    
+    from utils.search_cache import search_cache
+    from utils.page_cache import catalog_page_cache, vehicle_page_cache
+    from utils.facets import facet_engine
+    from utils.contact_cache import contact_cache
+    from utils.shared_counters import shared_counters
+    
+    return jsonify({
+        'success': True,
+        'search': search_cache.stats(),
+        'catalog_page': catalog_page_cache.stats(),
+        'vehicle_page': vehicle_page_cache.stats(),
+        'facets': facet_engine.stats(),
+        'contact': contact_cache.stats(),
+        'shared_counters': shared_counters.stats()
+    })
+
 @app.route('/admin/api/keyword-vehicles/<keyword>')
 def api_keyword_vehicles(keyword):
     if not session.get('admin_logged_in'):
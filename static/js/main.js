@@ -14,6 +14,9 @@ document.addEventListener("DOMContentLoaded", function () {
 
     // Initialize search and filter functionality
     initializeSearchAndFilters();
+
+    // Initialize typeahead suggestions for the search box
+    initializeSearchSuggestions();
     
     // Initialize delete vehicle functionality
     initializeDeleteVehicle();
@@ -343,6 +346,7 @@ function applyFilters() {
         "transmission",
         "km_min",
         "km_max",
+        "sort",
     ];
     filterParams.forEach((param) => url.searchParams.delete(param));
 
@@ -377,7 +381,7 @@ function applyFilters() {
     }
 
     // Add other filters
-    const otherFilters = ["brand", "location", "fuel_type", "transmission"];
+    const otherFilters = ["brand", "location", "fuel_type", "transmission", "sort"];
     otherFilters.forEach((filter) => {
         const value = formData.get(filter);
         if (value) {
@@ -405,6 +409,7 @@ function clearAllFilters() {
         "transmission",
         "km_min",
         "km_max",
+        "sort",
     ];
     filterParams.forEach((param) => url.searchParams.delete(param));
 
@@ -423,30 +428,42 @@ function clearAllFilters() {
     window.location.href = url.toString();
 }
 
-// Real-time search suggestions (optional enhancement)
+// Typeahead suggestions for the search box (served from /api/autocomplete)
 function initializeSearchSuggestions() {
     const searchInput = document.getElementById("searchInput");
     if (!searchInput) return;
 
+    const datalist = document.createElement("datalist");
+    datalist.id = "searchSuggestions";
+    searchInput.after(datalist);
+    searchInput.setAttribute("list", datalist.id);
+    searchInput.setAttribute("autocomplete", "off");
+
     let searchTimeout;
+    let lastQuery = "";
 
     searchInput.addEventListener("input", function () {
         clearTimeout(searchTimeout);
         const query = this.value.trim();
 
-        if (query.length < 2) return;
+        if (query.length < 2 || query === lastQuery) return;
 
         searchTimeout = setTimeout(() => {
-            fetch(`/api/search?q=${encodeURIComponent(query)}`)
+            lastQuery = query;
+            fetch(`/api/autocomplete?q=${encodeURIComponent(query)}`)
                 .then((response) => response.json())
                 .then((data) => {
-                    // Handle search suggestions if needed
-                    console.log("Search results:", data);
+                    datalist.innerHTML = "";
+                    data.suggestions.forEach((suggestion) => {
+                        const option = document.createElement("option");
+                        option.value = suggestion.text;
+                        datalist.appendChild(option);
+                    });
                 })
                 .catch((error) => {
-                    console.error("Search error:", error);
+                    console.error("Autocomplete error:", error);
                 });
-        }, 300);
+        }, 150);
     });
 }
 
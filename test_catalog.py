@@ -0,0 +1,122 @@
+"""
+Tests del listado del catálogo (utils.catalog): paginación por página y por
+cursor, vehículos sin valor de orden (NULL) y validación de cursores
+"""
+
+import base64
+import json
+import pytest
+from werkzeug.datastructures import MultiDict
+from models import db, Vehicle
+from utils.catalog import (CATALOG_ORDER, CATALOG_SORTS, apply_catalog_filters, decode_cursor,
+                           encode_cursor, order_catalog, paginate_catalog, parse_catalog_filters)
+
+
+def _token(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def _active():
+    return Vehicle.query.filter(Vehicle.is_active == True)
+
+
+def _walk_forward(order, per_page):
+    ids, after = [], None
+    while True:
+        result = paginate_catalog(_active(), after=after, per_page=per_page, order=order)
+        ids += [vehicle.id for vehicle in result['items']]
+        if not result['has_next']:
+            return ids
+        after = encode_cursor(result['items'][-1], order)
+
+
+def _walk_backward(order, per_page, last):
+    ids, before = [last.id], encode_cursor(last, order)
+    while True:
+        result = paginate_catalog(_active(), before=before, per_page=per_page, order=order)
+        ids = [vehicle.id for vehicle in result['items']] + ids
+        if not result['has_prev']:
+            return ids
+        before = encode_cursor(result['items'][0], order)
+
+
+@pytest.fixture
+def catalog(add_vehicle):
+    """13 vehículos; uno de cada tres sin kilómetros y en USD sin cotización (price_ars NULL)"""
+    vehicles = []
+    for i in range(13):
+        without_values = i % 3 == 0
+        vehicles.append(add_vehicle(
+            kilometers=None if without_values else (i % 5) * 10000,
+            currency='USD' if without_values else 'ARS',
+            year=2010 + i % 4,
+            is_plus=i % 4 == 0,
+        ))
+    return vehicles
+
+
+@pytest.mark.parametrize('sort', ['default'] + list(CATALOG_SORTS))
+def test_cursor_pages_cover_the_catalog_in_order(catalog, sort):
+    order = CATALOG_ORDER if sort == 'default' else CATALOG_SORTS[sort]
+    expected = [vehicle.id for vehicle in order_catalog(_active(), order).all()]
+
+    assert _walk_forward(order, per_page=4) == expected
+    last = db.session.get(Vehicle, expected[-1])
+    assert _walk_backward(order, per_page=4, last=last) == expected
+
+
+def test_offset_pages_match_the_full_order(catalog):
+    order = CATALOG_SORTS['km_asc']
+    expected = [vehicle.id for vehicle in order_catalog(_active(), order).all()]
+    ids = []
+    for page in range(1, 5):
+        ids += [vehicle.id for vehicle in paginate_catalog(_active(), page=page, per_page=4, order=order)['items']]
+    assert ids == expected
+
+
+@pytest.mark.parametrize('sort', ['km_asc', 'km_desc', 'price_asc', 'price_desc'])
+def test_vehicles_without_the_sort_value_are_listed_last(catalog, sort):
+    filters = parse_catalog_filters(MultiDict({'sort': sort}))
+    query, rank = apply_catalog_filters(Vehicle.query, filters)
+    vehicles = order_catalog(query, CATALOG_SORTS[sort]).all()
+
+    column = CATALOG_SORTS[sort][0][0].key
+    values = [getattr(vehicle, column) for vehicle in vehicles]
+    assert len(vehicles) == len(catalog)
+    assert values.count(None) == 5
+    assert all(value is None for value in values[-5:])
+    # Entre sí, los NULL siguen el orden del id
+    tail = [vehicle.id for vehicle in vehicles[-5:]]
+    assert tail == sorted(tail, reverse=sort.endswith('desc'))
+
+
+def test_cursor_roundtrip(catalog):
+    vehicle = catalog[1]
+    token = encode_cursor(vehicle, CATALOG_ORDER)
+    assert decode_cursor(token, CATALOG_ORDER) == [vehicle.is_plus, vehicle.created_at, vehicle.id]
+
+
+def test_cursor_keeps_null_sort_values(catalog):
+    vehicle = catalog[0]
+    order = CATALOG_SORTS['km_asc']
+    assert vehicle.kilometers is None
+    assert decode_cursor(encode_cursor(vehicle, order), order) == [None, vehicle.id]
+
+
+@pytest.mark.parametrize('values', [
+    ['10', 1],            # texto en una columna entera
+    [1000, None],         # id NULL
+    [True, 1],            # booleano en una columna entera
+    [1.5, 1],             # float en una columna entera
+    [1000],               # cantidad de valores distinta al orden
+    {'kilometers': 1000},  # no es una lista
+])
+def test_decode_cursor_rejects_wrong_values(values):
+    assert decode_cursor(_token(values), CATALOG_SORTS['km_asc']) is None
+
+
+def test_decode_cursor_rejects_bad_dates_and_garbage():
+    assert decode_cursor(_token([True, {'dt': 'ayer'}, 1]), CATALOG_ORDER) is None
+    assert decode_cursor(_token([True, '2024-01-01T00:00:00', 1]), CATALOG_ORDER) is None
+    assert decode_cursor('%%%no-es-base64', CATALOG_ORDER) is None
+    assert decode_cursor(_token([True, {'dt': '2024-01-01T00:00:00'}, 1]), CATALOG_ORDER) is not None
@@ -0,0 +1,87 @@
+"""
+Tests de la versión del catálogo (utils.catalog_events): cambia con cada
+commit que escribe vehículos y con ella las claves de los caches
+"""
+
+import importlib
+import pytest
+from sqlalchemy import text
+from models import db, Vehicle, CatalogState
+from utils import catalog_events
+from utils.catalog_events import get_catalog_version
+from utils.page_cache import catalog_page_cache
+
+
+@pytest.fixture
+def published(monkeypatch):
+    """Cambios que reciben los suscriptores: [(changes, previous, version)]"""
+    calls = []
+    monkeypatch.setattr(catalog_events, '_subscribers', [lambda *args: calls.append(args)])
+    return calls
+
+
+def test_commit_bumps_version_and_cache_keys(app_db, add_vehicle, published):
+    before = get_catalog_version()
+    key = catalog_page_cache.key('page-1')
+
+    vehicle = add_vehicle()
+
+    assert get_catalog_version() > before
+    assert catalog_page_cache.key('page-1') != key
+    (changes, previous, version), = published
+    assert (previous, version) == (before, get_catalog_version())
+    assert [(change.op, change.vehicle_id) for change in changes] == [('insert', vehicle.id)]
+
+
+def test_update_and_delete_are_published(app_db, add_vehicle, published):
+    vehicle = add_vehicle()
+    vehicle.price = 5
+    db.session.commit()
+    db.session.delete(vehicle)
+    db.session.commit()
+
+    ops = [change.op for changes, _, _ in published for change in changes]
+    assert ops == ['insert', 'update', 'delete']
+    assert published[1][0][0].data['price'] == 5
+
+
+def test_rollback_and_unrelated_writes_keep_the_version(app_db, add_vehicle, published):
+    add_vehicle()
+    version = get_catalog_version()
+
+    db.session.add(Vehicle(title='x', description='x', price=1, year=2020, brand='b', model='m'))
+    db.session.flush()
+    db.session.rollback()
+    db.session.add(CatalogState(id=99, version=0))
+    db.session.commit()
+
+    assert get_catalog_version() == version
+    assert len(published) == 1
+
+
+def test_bulk_update_is_published(app_db, add_vehicle, published):
+    add_vehicle()
+    Vehicle.query.filter(Vehicle.is_plus == False).update({'is_active': False})
+    db.session.commit()
+    assert [change.op for change in published[-1][0]] == ['bulk']
+
+
+def test_version_from_database_triggers(app_db, add_vehicle, published, monkeypatch):
+    # Triggers de add_catalog_version_table.py (la constante, sin correr su main)
+    monkeypatch.setenv('DATABASE_URL', str(db.engine.url))
+    migration = importlib.import_module('add_catalog_version_table')
+    monkeypatch.setattr(catalog_events, 'CATALOG_VERSION_POLL_SECONDS', 0)
+    with db.engine.begin() as connection:
+        for statement in migration.SQLITE_STATEMENTS:
+            connection.execute(text(statement))
+        connection.execute(text("INSERT INTO catalog_state (id, version) VALUES (1, 100)"))
+
+    assert get_catalog_version() == 100
+    add_vehicle()
+    assert get_catalog_version() == 101
+    assert published[-1][1:] == (100, 101)
+
+    # Una escritura por fuera de la app (otro dyno, SQL directo) también cuenta
+    with db.engine.begin() as connection:
+        connection.execute(text("UPDATE vehicle SET price = price + 1"))
+    assert get_catalog_version() == 102
@@ -0,0 +1,66 @@
+"""
+Tests de los conteos de filtros (utils.facets): cada faceta se cuenta con
+todos los filtros menos el propio y se recalcula al cambiar el catálogo
+"""
+
+import pytest
+from utils.facets import FacetEngine, normalize_filters
+
+NO_FILTERS = {'search': '', 'brand': '', 'fuel_type': '', 'transmission': '', 'location': '',
+              'year_min': None, 'year_max': None, 'price_min': None, 'price_max': None,
+              'km_min': None, 'km_max': None, 'sort': ''}
+
+
+def _filters(**values):
+    return dict(NO_FILTERS, **values)
+
+
+@pytest.fixture
+def engine(add_vehicle):
+    add_vehicle(brand='Toyota', fuel_type='Nafta', year=2022, price=12000000, kilometers=20000)
+    add_vehicle(brand='Toyota', fuel_type='Diesel', year=2018, price=8000000, kilometers=80000)
+    add_vehicle(brand='Ford', fuel_type='Diesel', year=2012, price=3000000, kilometers=150000)
+    add_vehicle(brand='Ford', fuel_type='Nafta', year=2019, price=20000000, kilometers=None)
+    add_vehicle(brand='Fiat', fuel_type='Nafta', year=2020, price=4000000, is_active=False)
+    return FacetEngine()
+
+
+def test_counts_without_filters(engine):
+    counts = engine.counts(_filters())
+    assert counts['total'] == 4
+    assert counts['brand'] == {'Toyota': 2, 'Ford': 2}
+    assert counts['fuel_type'] == {'Nafta': 2, 'Diesel': 2}
+    assert counts['year_range'] == {'2021-2024': 1, '2016-2020': 2, '2010-2015': 1}
+    assert counts['price_range'] == {'1000000-5000000': 1, '5000000-10000000': 1,
+                                     '10000000-15000000': 1, '15000000-999999999': 1}
+    # Sin kilómetros cargados no entra en ningún rango
+    assert sum(counts['km_range'].values()) == 3
+
+
+def test_each_facet_ignores_its_own_filter(engine):
+    counts = engine.counts(_filters(brand='Toyota', fuel_type='Diesel'))
+    assert counts['total'] == 1
+    # Marcas con combustible Diesel; combustibles de Toyota
+    assert counts['brand'] == {'Toyota': 1, 'Ford': 1}
+    assert counts['fuel_type'] == {'Nafta': 1, 'Diesel': 1}
+    assert counts['year_range'] == {'2021-2024': 0, '2016-2020': 1, '2010-2015': 0}
+
+
+def test_range_filters(engine):
+    counts = engine.counts(_filters(year_min=2016, year_max=2020))
+    assert counts['total'] == 2
+    assert counts['year_range'] == {'2021-2024': 1, '2016-2020': 2, '2010-2015': 1}
+    assert counts['brand'] == {'Toyota': 1, 'Ford': 1}
+
+
+def test_counts_follow_catalog_writes(engine, add_vehicle):
+    assert engine.counts(_filters())['brand'] == {'Toyota': 2, 'Ford': 2}
+    add_vehicle(brand='Renault')
+    assert engine.counts(_filters())['brand'] == {'Toyota': 2, 'Ford': 2, 'Renault': 1}
+    assert engine.brands() == ['Ford', 'Renault', 'Toyota']
+
+
+def test_normalize_filters_ignores_empty_values_and_sort():
+    assert normalize_filters(_filters(sort='price_asc')) == ()
+    assert normalize_filters(_filters(search='  Camión   Tunuyán ', brand='Ford')) == (
+        ('brand', 'Ford'), ('search', 'camion tunuyan'))
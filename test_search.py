@@ -0,0 +1,76 @@
+"""
+Tests de la búsqueda de texto (utils.search): índice FTS5 de SQLite cuando
+está instalado, ILIKE cuando no o cuando la búsqueda no tiene términos
+"""
+
+import importlib
+import pytest
+from sqlalchemy import text
+from models import db, Vehicle
+from utils.search import apply_search, get_search_backend, tokenize_query
+
+
+def _search(search_query):
+    query, rank = apply_search(Vehicle.query.filter(Vehicle.is_active == True), search_query)
+    if rank is not None:
+        query = query.order_by(rank.desc(), Vehicle.id.desc())
+    return [vehicle.title for vehicle in query.all()], rank
+
+
+@pytest.fixture
+def vehicles(add_vehicle):
+    add_vehicle(title='Camioneta Hilux', brand='Toyota', model='Hilux', description='Doble cabina')
+    add_vehicle(title='Gol Trend', brand='Volkswagen', model='Gol', description='Ideal para la ciudad, no es camioneta')
+    add_vehicle(title='Peugeot 208 "full"', brand='Peugeot', model='208', description='Único dueño en Tunuyán')
+
+
+@pytest.fixture
+def fts(app_db, monkeypatch):
+    """Tabla vehicle_fts y sus triggers (la constante de add_fulltext_search.py, sin correr su main)"""
+    monkeypatch.setenv('DATABASE_URL', str(db.engine.url))
+    migration = importlib.import_module('add_fulltext_search')
+    with db.engine.begin() as connection:
+        for statement in migration.SQLITE_STATEMENTS:
+            connection.execute(text(statement))
+
+
+def test_tokenize_folds_accents_and_drops_punctuation():
+    assert tokenize_query('  Tunuyán, "4x4"-Hilux ') == ['tunuyan', '4x4', 'hilux']
+    assert tokenize_query('"-"') == []
+
+
+def test_ilike_fallback_without_index(vehicles):
+    assert get_search_backend() is None
+    titles, rank = _search('hilux')
+    assert rank is None
+    assert titles == ['Camioneta Hilux']
+
+
+def test_fulltext_search_ranks_and_stems(fts, vehicles):
+    assert get_search_backend() == 'sqlite'
+
+    titles, rank = _search('camionetas')
+    assert rank is not None
+    # Coincidencia en el título pesa más que en la descripción
+    assert titles == ['Camioneta Hilux', 'Gol Trend']
+
+    titles, _ = _search('tunuyan')
+    assert titles == ['Peugeot 208 "full"']
+    titles, _ = _search('toy')
+    assert titles == ['Camioneta Hilux']
+
+
+def test_fulltext_index_follows_vehicle_writes(fts, vehicles, add_vehicle):
+    vehicle = add_vehicle(title='Ranger XLT', brand='Ford', model='Ranger')
+    assert _search('ranger')[0] == ['Ranger XLT']
+
+    vehicle.title = 'Ranger Limited'
+    db.session.commit()
+    assert _search('xlt')[0] == []
+    assert _search('limited')[0] == ['Ranger Limited']
+
+
+def test_query_without_terms_falls_back_to_ilike(fts, vehicles):
+    titles, rank = _search('"')
+    assert rank is None
+    assert titles == ['Peugeot 208 "full"']
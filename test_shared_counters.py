@@ -0,0 +1,74 @@
+"""
+Tests de los contadores compartidos (utils.shared_counters): ventanas
+deslizantes y límites de tasa vistos igual desde varios workers
+"""
+
+import pytest
+from utils.shared_counters import RING_SIZE, SharedCounters
+
+
+@pytest.fixture
+def counters(tmp_path):
+    return SharedCounters(path=str(tmp_path / 'counters'), buckets=16)
+
+
+def test_hit_allows_limit_events_per_window(counters):
+    now = 1000.0
+    assert [counters.hit('ip:1', 3, 60, now=now + i) for i in range(5)] == [True, True, True, False, False]
+    # Otra clave tiene su propia ventana
+    assert counters.hit('ip:2', 3, 60, now=now)
+
+
+def test_window_slides(counters):
+    for second in (0, 10, 20):
+        counters.hit('ip:1', 3, 60, now=1000.0 + second)
+    # A los 61 s el primer evento salió de la ventana
+    assert counters.hit('ip:1', 3, 60, now=1061.0)
+    assert counters.count('ip:1', 60, now=1061.0) == 3
+
+
+def test_rejected_events_stay_in_the_window(counters):
+    for second in (0, 10, 20):
+        counters.hit('ip:1', 3, 60, now=1000.0 + second)
+    assert not counters.hit('ip:1', 3, 60, now=1059.0)
+    # Quien sigue insistiendo no recupera cupo cuando vence su primer evento
+    assert not counters.hit('ip:1', 3, 60, now=1061.0)
+    assert counters.hit('ip:1', 3, 60, now=1130.0)
+
+
+def test_limit_above_ring_size_is_rejected(counters):
+    with pytest.raises(ValueError):
+        counters.hit('ip:1', RING_SIZE + 1, 60)
+
+
+def test_ring_keeps_the_newest_timestamps(counters):
+    for i in range(RING_SIZE + 4):
+        counters.append('key', timestamp=float(i))
+    assert counters.recent('key') == [float(i) for i in range(4, RING_SIZE + 4)]
+
+
+def test_workers_share_the_file(counters):
+    other_worker = SharedCounters(path=counters.path, buckets=counters.buckets)
+    counters.incr('views', 2)
+    assert other_worker.incr('views') == 3
+    counters.hit('ip:1', 2, 60, now=1000.0)
+    other_worker.hit('ip:1', 2, 60, now=1001.0)
+    assert not counters.hit('ip:1', 2, 60, now=1002.0)
+
+
+def test_full_bucket_reuses_the_oldest_slot(tmp_path):
+    counters = SharedCounters(path=str(tmp_path / 'counters'), buckets=1)
+    stats = counters.stats()
+    for i in range(stats['slots'] + 1):
+        counters.append(f'key:{i}', timestamp=float(i))
+    assert counters.stats()['used'] == stats['slots']
+    assert counters.recent('key:0') == []
+    assert counters.recent(f"key:{stats['slots']}") == [float(stats['slots'])]
+
+
+def test_clear(counters):
+    counters.incr('views')
+    counters.append('ip:1')
+    counters.clear()
+    assert counters.get('views') == 0
+    assert counters.recent('ip:1') == []
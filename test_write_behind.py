@@ -0,0 +1,99 @@
+"""
+Tests de la escritura diferida (utils.write_behind): lotes, tope de la cola
+y recuperación de las filas que dejó en disco un worker que murió
+"""
+
+import os
+import subprocess
+import sys
+import pytest
+from models import VehicleView
+from utils.write_behind import WriteBehindBuffer
+
+
+def _buffer(app, **config):
+    app.config.update({'VIEW_FLUSH_SECONDS': 3600, 'VIEW_BATCH_SIZE': 1000, **config})
+    buffer = WriteBehindBuffer(VehicleView, 'VIEW')
+    buffer.init_app(app)
+    return buffer
+
+
+def _stored():
+    return VehicleView.query.count()
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+@pytest.fixture
+def vehicle(add_vehicle):
+    return add_vehicle()
+
+
+def test_rows_wait_in_memory_until_flush(app_db, vehicle):
+    buffer = _buffer(app_db)
+    for i in range(3):
+        buffer.add(VehicleView(vehicle_id=vehicle.id, ip_address=f'10.0.0.{i}'))
+
+    assert len(buffer.pending()) == 3
+    assert _stored() == 0
+    assert buffer.flush() == 3
+    assert buffer.pending() == []
+    assert sorted(view.ip_address for view in VehicleView.query) == ['10.0.0.0', '10.0.0.1', '10.0.0.2']
+    # Los defaults de Python se resuelven al encolar
+    assert all(view.timestamp is not None for view in VehicleView.query)
+
+
+def test_full_queue_flushes_in_the_request(app_db, vehicle):
+    buffer = _buffer(app_db, VIEW_MAX_PENDING=2)
+    buffer.add(VehicleView(vehicle_id=vehicle.id))
+    assert _stored() == 0
+    buffer.add(VehicleView(vehicle_id=vehicle.id))
+    assert _stored() == 2
+    assert buffer.pending() == []
+
+
+def test_disabled_buffer_inserts_immediately(app_db, vehicle):
+    buffer = _buffer(app_db, VIEW_WRITE_BEHIND=False)
+    buffer.add(VehicleView(vehicle_id=vehicle.id))
+    assert _stored() == 1
+
+
+def test_spool_keeps_only_pending_rows(app_db, vehicle, tmp_path):
+    buffer = _buffer(app_db, VIEW_SPOOL_DIR=str(tmp_path / 'spool'))
+    buffer.add(VehicleView(vehicle_id=vehicle.id))
+    buffer.add(VehicleView(vehicle_id=vehicle.id))
+    spool, = (tmp_path / 'spool').glob(f'vehicle_view-{os.getpid()}-*.jsonl')
+    assert len(spool.read_text().splitlines()) == 2
+
+    buffer.flush()
+    assert spool.read_text() == ''
+    buffer.drain()
+    assert not spool.exists()
+
+
+def test_recover_rows_of_dead_workers_only(app_db, vehicle, tmp_path):
+    spool_dir = tmp_path / 'spool'
+    spool_dir.mkdir()
+    writer = WriteBehindBuffer(VehicleView, 'VIEW')
+    lines = ''.join(
+        writer._encode(writer.row_values(VehicleView(vehicle_id=vehicle.id, ip_address=ip))) + '\n'
+        for ip in ('1.1.1.1', '2.2.2.2')
+    )
+    dead = spool_dir / f'vehicle_view-{_dead_pid()}-abc123.jsonl'
+    dead.write_text(lines)
+    # Archivo de versiones anteriores (sin token) de otro worker muerto
+    (spool_dir / f'vehicle_view-{_dead_pid()}.jsonl').write_text(lines)
+    # Worker vivo (el proceso padre): su archivo no se toca
+    alive = spool_dir / f'vehicle_view-{os.getppid()}-def456.jsonl'
+    alive.write_text(lines)
+
+    buffer = _buffer(app_db, VIEW_SPOOL_DIR=str(spool_dir))
+
+    assert _stored() == 4
+    assert not dead.exists()
+    assert alive.exists()
+    assert buffer.recover() == 0
@@ -3,11 +3,13 @@ Analytics and Anti-Fraud System
 Maneja tracking de vistas, detección de fraude y estadísticas
 """
 
+import os
 import hashlib
 import re
 from datetime import datetime, timedelta
 from flask import request
 from models import db, VehicleView
+from utils.shared_counters import shared_counters
 
 # Configuración del sistema anti-fraude
 COOLDOWN_MINUTES = 180  # Tiempo mínimo entre vistas del mismo vehículo por IP (3 horas)
@@ -15,6 +17,17 @@ MAX_VIEWS_PER_DAY = 10  # Máximo de vistas al día por IP del mismo vehículo
 RATE_LIMIT_MINUTES = 5  # Ventana de tiempo para detectar spam
 RATE_LIMIT_MAX = 15  # Máximo de vistas en la ventana de tiempo
 
+# Clicks por IP en la ventana RATE_LIMIT_MINUTES que cuentan en estadísticas;
+# los siguientes se guardan igual, con is_counted=False (0 = sin límite)
+CLICK_RATE_LIMIT_MAX = int(os.environ.get('CLICK_RATE_LIMIT_MAX', 15))
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _epoch(timestamp):
+    """Segundos desde 1970 de un datetime UTC sin zona (formato del store compartido)"""
+    return (timestamp - EPOCH).total_seconds()
+
 
 def generate_session_id(ip_address, user_agent):
     """
@@ -82,52 +95,112 @@ def parse_user_agent(user_agent_string):
     }
 
 
+class ViewWindows:
+    """
+    Historial reciente de vistas para las reglas anti-fraude
+
+    Por (IP, vehículo) y por IP guarda los últimos timestamps en buffers
+    circulares del store compartido entre workers (utils.shared_counters):
+    alcanza con eso para decidir cooldown, límite diario y spam sin consultar
+    VehicleView. El primer worker que lo usa carga el historial desde la base.
+    """
+
+    def __init__(self, store=shared_counters):
+        self.store = store
+        self._warm_pid = None
+
+    @staticmethod
+    def _day_start(now):
+        return datetime.combine(now.date(), datetime.min.time())
+
+    def _retention_start(self, now):
+        """Vistas más viejas que esto ya no influyen en ninguna regla"""
+        return min(self._day_start(now), now - timedelta(minutes=COOLDOWN_MINUTES))
+
+    def _record(self, vehicle_id, ip_address, timestamp):
+        """
+        Registra la vista
+
+        Returns:
+            tuple: (vistas anteriores de la IP al vehículo, vistas anteriores de la IP)
+        """
+        epoch = _epoch(timestamp)
+        return (
+            self.store.append(f'view:{ip_address}:{vehicle_id}', epoch),
+            self.store.append(f'view_ip:{ip_address}', epoch),
+        )
+
+    def _load(self, store):
+        """Carga las vistas de la base que todavía caen dentro de las ventanas"""
+        rows = db.session.query(
+            VehicleView.vehicle_id, VehicleView.ip_address, VehicleView.timestamp
+        ).filter(
+            VehicleView.timestamp >= self._retention_start(datetime.utcnow())
+        ).order_by(VehicleView.timestamp).yield_per(1000)
+        for vehicle_id, ip_address, timestamp in rows:
+            self._record(vehicle_id, ip_address, timestamp)
+
+    def check_and_record(self, vehicle_id, ip_address, now=None):
+        """
+        Aplica las reglas anti-fraude y registra la vista (contada o no)
+
+        Returns:
+            tuple: (should_count: bool, reason: str or None, is_unique_today: bool)
+        """
+        if self._warm_pid != os.getpid():
+            self._warm_pid = os.getpid()
+            self.store.warm_once(self._load)
+
+        now = now or datetime.utcnow()
+        day_start = _epoch(self._day_start(now))
+        rate_limit_window = _epoch(now - timedelta(minutes=RATE_LIMIT_MINUTES))
+
+        # Las vistas bloqueadas también se guardan en VehicleView y cuentan
+        vehicle_views, ip_views = self._record(vehicle_id, ip_address, now)
+
+        # 1. Cooldown - No contar si vio el vehículo hace menos de COOLDOWN_MINUTES
+        if vehicle_views:
+            minutes_ago = (_epoch(now) - vehicle_views[-1]) / 60
+            if minutes_ago < COOLDOWN_MINUTES:
+                return False, f"cooldown_{int(COOLDOWN_MINUTES - minutes_ago)}min", False
+
+        # 2. Límite diario - No contar si excede el máximo diario
+        views_today = sum(1 for timestamp in vehicle_views if timestamp >= day_start)
+        if views_today >= MAX_VIEWS_PER_DAY:
+            return False, "daily_limit_exceeded", False
+
+        # 3. Rate limiting - Detectar spam extremo
+        recent_views = sum(1 for timestamp in ip_views if timestamp >= rate_limit_window)
+        if recent_views >= RATE_LIMIT_MAX:
+            return False, "rate_limit_spam_detected", False
+
+        # 4. Vista única del día
+        return True, None, views_today == 0
+
+
+view_windows = ViewWindows()
+
+
 def should_count_view(vehicle_id, ip_address):
     """
     Determina si se debe contar la vista según las reglas anti-fraude
+    (sobre el historial compartido de view_windows; registra la vista)
     
     Returns:
         tuple: (should_count: bool, reason: str or None, is_unique_today: bool)
     """
-    now = datetime.utcnow()
-    today = now.date()
-    
-    # 1. Check cooldown - No contar si vio el vehículo hace menos de COOLDOWN_MINUTES
-    last_view = VehicleView.query.filter_by(
-        vehicle_id=vehicle_id,
-        ip_address=ip_address
-    ).order_by(VehicleView.timestamp.desc()).first()
-    
-    if last_view:
-        minutes_ago = (now - last_view.timestamp).total_seconds() / 60
-        if minutes_ago < COOLDOWN_MINUTES:
-            return False, f"cooldown_{int(COOLDOWN_MINUTES - minutes_ago)}min", False
-    
-    # 2. Check daily limit - No contar si excede el máximo diario
-    views_today = VehicleView.query.filter(
-        VehicleView.vehicle_id == vehicle_id,
-        VehicleView.ip_address == ip_address,
-        db.func.date(VehicleView.timestamp) == today
-    ).count()
-    
-    if views_today >= MAX_VIEWS_PER_DAY:
-        return False, "daily_limit_exceeded", False
-    
-    # 3. Check rate limiting - Detectar spam extremo
-    rate_limit_window = now - timedelta(minutes=RATE_LIMIT_MINUTES)
-    recent_views = VehicleView.query.filter(
-        VehicleView.ip_address == ip_address,
-        VehicleView.timestamp >= rate_limit_window
-    ).count()
-    
-    if recent_views >= RATE_LIMIT_MAX:
-        return False, "rate_limit_spam_detected", False
-    
-    # 4. Check if es vista única del día
-    is_unique = views_today == 0
-    
-    # Todas las validaciones pasaron
-    return True, None, is_unique
+    return view_windows.check_and_record(vehicle_id, ip_address)
+
+
+def should_count_click(ip_address):
+    """
+    Si el click cuenta en estadísticas (límite de CLICK_RATE_LIMIT_MAX por IP
+    cada RATE_LIMIT_MINUTES, compartido entre workers). El click se guarda
+    siempre; este valor va en Click.is_counted
+    """
+    if CLICK_RATE_LIMIT_MAX <= 0:
+        return True
+    return shared_counters.hit(f'click_ip:{ip_address}', CLICK_RATE_LIMIT_MAX, RATE_LIMIT_MINUTES * 60)
 
 
 def get_location_from_ip(ip_address):
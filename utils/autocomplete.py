@@ -0,0 +1,152 @@
+"""
+Autocompletado del buscador
+Índice de prefijos en memoria (arreglo ordenado + bisect) sobre marcas,
+modelos, títulos y palabras clave de vendedores de los vehículos activos.
+Se construye una vez desde la base y después se actualiza con los eventos
+de escritura del catálogo, así cada consulta se resuelve sin SQL.
+"""
+
+import threading
+from bisect import bisect_left, insort
+from models import db, Vehicle
+from utils.catalog_events import subscribe, get_catalog_version
+from utils.search import fold_text
+
+# Orden de prioridad de los tipos de sugerencia
+KIND_PRIORITY = {'brand': 0, 'model': 1, 'seller': 2, 'title': 3}
+
+# Máximo de entradas a recorrer por consulta (prefijos muy cortos)
+MAX_SCAN = 300
+
+INDEXED_COLUMNS = ('title', 'brand', 'model', 'seller_keyword', 'is_active')
+
+
+def _vehicle_terms(data):
+    """Sugerencias (kind, texto) que aporta un vehículo"""
+    terms = set()
+    brand = (data.get('brand') or '').strip()
+    model = (data.get('model') or '').strip()
+    if brand:
+        terms.add(('brand', brand))
+    if model:
+        terms.add(('model', f"{brand} {model}".strip()))
+    if (data.get('seller_keyword') or '').strip():
+        terms.add(('seller', data['seller_keyword'].strip()))
+    if (data.get('title') or '').strip():
+        terms.add(('title', data['title'].strip()))
+    return terms
+
+
+def _index_keys(text):
+    """
+    Claves de búsqueda de un texto: el texto completo y cada sufijo que
+    empieza en una palabra, para que "hil" sugiera "Toyota Hilux"
+    """
+    words = fold_text(text).split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+class PrefixIndex:
+    """Arreglo ordenado de (clave, sugerencia) con conteo de vehículos por sugerencia"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []  # [(clave normalizada, (kind, texto))] ordenado
+        self._vehicles = {}  # (kind, texto normalizado) -> set(vehicle_id)
+        self._display = {}  # (kind, texto normalizado) -> texto original
+        self._by_vehicle = {}  # vehicle_id -> set((kind, texto normalizado))
+        self._version = None
+
+    def _add_vehicle(self, vehicle_id, data):
+        terms = set()
+        for kind, text in _vehicle_terms(data):
+            term = (kind, fold_text(text))
+            terms.add(term)
+            if term not in self._vehicles:
+                self._vehicles[term] = set()
+                self._display[term] = text
+                for key in _index_keys(text):
+                    insort(self._keys, (key, term))
+            self._vehicles[term].add(vehicle_id)
+        self._by_vehicle[vehicle_id] = terms
+
+    def _remove_vehicle(self, vehicle_id):
+        for term in self._by_vehicle.pop(vehicle_id, ()):
+            owners = self._vehicles.get(term)
+            if owners is None:
+                continue
+            owners.discard(vehicle_id)
+            if not owners:
+                # Ninguna publicación usa ya esta sugerencia
+                del self._vehicles[term]
+                text = self._display.pop(term)
+                for key in _index_keys(text):
+                    i = bisect_left(self._keys, (key, term))
+                    if i < len(self._keys) and self._keys[i] == (key, term):
+                        del self._keys[i]
+
+    def rebuild(self):
+        """Reconstruye el índice desde la base (un solo SELECT de columnas)"""
+        version = get_catalog_version()
+        rows = db.session.query(
+            Vehicle.id, Vehicle.title, Vehicle.brand, Vehicle.model, Vehicle.seller_keyword
+        ).filter(Vehicle.is_active == True).all()
+        with self._lock:
+            self._keys = []
+            self._vehicles = {}
+            self._display = {}
+            self._by_vehicle = {}
+            for row in rows:
+                self._add_vehicle(row.id, row._asdict())
+            self._version = version
+
+    def apply_changes(self, changes, previous_version, version):
+        """Aplica cambios del catálogo de forma incremental (ver utils.catalog_events)"""
+        with self._lock:
+            if self._version is None:
+                return
+            if self._version != previous_version:
+                # Otro worker escribió en el medio: reconstruir en la próxima consulta
+                self._version = None
+                return
+            for change in changes:
+                if change.op == 'bulk' or (change.op != 'delete' and
+                                           not all(c in change.data for c in INDEXED_COLUMNS)):
+                    self._version = None
+                    return
+                self._remove_vehicle(change.vehicle_id)
+                if change.op != 'delete' and change.data.get('is_active'):
+                    self._add_vehicle(change.vehicle_id, change.data)
+            self._version = version
+
+    def suggest(self, prefix, limit=8):
+        """
+        Sugerencias para un prefijo
+
+        Returns:
+            list: [{'text': 'Toyota Hilux', 'type': 'model', 'count': 3}, ...]
+        """
+        prefix = ' '.join(fold_text(prefix).split())
+        if not prefix:
+            return []
+        if self._version != get_catalog_version():
+            self.rebuild()
+
+        with self._lock:
+            found = set()
+            i = bisect_left(self._keys, (prefix,))
+            end = min(len(self._keys), i + MAX_SCAN)
+            while i < end and self._keys[i][0].startswith(prefix):
+                found.add(self._keys[i][1])
+                i += 1
+            results = [
+                {'text': self._display[term], 'type': term[0], 'count': len(self._vehicles[term])}
+                for term in found
+            ]
+
+        results.sort(key=lambda r: (KIND_PRIORITY[r['type']], -r['count'], r['text']))
+        return results[:limit]
+
+
+autocomplete_index = PrefixIndex()
+subscribe(autocomplete_index.apply_changes)
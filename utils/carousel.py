@@ -0,0 +1,145 @@
+"""
+Ranking "Más vistos" del carrusel de la página principal
+Se calcula en un hilo de fondo (nunca dentro de un request) contando sólo
+las vistas válidas (is_counted) dentro de una ventana de días configurable,
+y se guarda en memoria como lista de (vehicle_id, vistas). Se recalcula
+cuando vence o cuando cambia el catálogo (baja de una publicación, deja de
+ser Plus, etc.); mientras tanto los requests leen el ranking anterior.
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from models import db, Vehicle, VehicleView
+from utils.catalog_events import get_catalog_version
+
+CAROUSEL_SIZE = 10
+
+# Valores por defecto (se pueden cambiar en app.config)
+DEFAULT_WINDOW_DAYS = 30  # CAROUSEL_VIEW_WINDOW_DAYS
+DEFAULT_REFRESH_SECONDS = 300  # CAROUSEL_REFRESH_SECONDS
+
+
+class ViewRanking:
+    """Top de vehículos Plus por vistas, precalculado y refrescado periódicamente"""
+
+    def __init__(self, size=CAROUSEL_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._ranking = None  # [(vehicle_id, vistas)]
+        self._version = None
+        self._computed_at = 0.0
+        self._app = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        """Calcula el ranking en segundo plano en lugar de hacerlo en el request"""
+        self._app = app
+
+    def _refresh_seconds(self):
+        return current_app.config.get('CAROUSEL_REFRESH_SECONDS', DEFAULT_REFRESH_SECONDS)
+
+    def _is_stale(self, version):
+        return (self._ranking is None or self._version != version or
+                time.monotonic() - self._computed_at > self._refresh_seconds())
+
+    def _ensure_thread(self):
+        # Después de un fork (workers de gunicorn) el hilo no existe en el hijo
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='view-ranking', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.clear()
+            with self._app.app_context():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    db.session.rollback()
+                    logging.error(f"Error calculando el ranking del carrusel: {e}")
+                refresh_seconds = self._refresh_seconds()
+            # Se despierta antes si un request ve el catálogo cambiado
+            self._wakeup.wait(timeout=refresh_seconds)
+
+    def refresh(self):
+        """Recalcula el ranking con una consulta agregada sobre la ventana de vistas"""
+        version = get_catalog_version()
+        window_days = current_app.config.get('CAROUSEL_VIEW_WINDOW_DAYS', DEFAULT_WINDOW_DAYS)
+        since = datetime.utcnow() - timedelta(days=window_days)
+
+        view_count = func.count(VehicleView.id)
+        rows = db.session.query(VehicleView.vehicle_id, view_count).join(
+            Vehicle, Vehicle.id == VehicleView.vehicle_id
+        ).filter(
+            VehicleView.is_counted == True,
+            VehicleView.timestamp >= since,
+            Vehicle.is_active == True,
+            Vehicle.is_plus == True
+        ).group_by(VehicleView.vehicle_id).order_by(
+            view_count.desc(), VehicleView.vehicle_id.desc()
+        ).limit(self.size).all()
+        ranking = [(vehicle_id, count) for vehicle_id, count in rows]
+
+        # Completar con publicaciones Plus sin vistas en la ventana
+        if len(ranking) < self.size:
+            ranked_ids = [vehicle_id for vehicle_id, _ in ranking]
+            filler = db.session.query(Vehicle.id).filter(
+                Vehicle.is_active == True,
+                Vehicle.is_plus == True
+            )
+            if ranked_ids:
+                filler = filler.filter(~Vehicle.id.in_(ranked_ids))
+            filler = filler.order_by(Vehicle.created_at.desc()).limit(self.size - len(ranking)).all()
+            ranking.extend((row[0], 0) for row in filler)
+
+        with self._lock:
+            self._ranking = ranking
+            self._version = version
+            self._computed_at = time.monotonic()
+        return ranking
+
+    def ranking(self):
+        """
+        Ranking precalculado. Si venció o cambió el catálogo se pide al hilo
+        de fondo que lo recalcule y se devuelve el anterior (vacío hasta el
+        primer cálculo). Sin init_app (scripts) se calcula en el momento.
+
+        Returns:
+            list: [(vehicle_id, vistas)] de mayor a menor
+        """
+        if not self._is_stale(get_catalog_version()):
+            return self._ranking
+        if self._app is None:
+            return self.refresh()
+        self._ensure_thread()
+        self._wakeup.set()
+        return self._ranking or []
+
+    def top_vehicles(self):
+        """
+        Vehículos del carrusel listos para la plantilla
+
+        Returns:
+            list: [(Vehicle, vistas)] de mayor a menor (mismo formato que antes)
+        """
+        ranking = self.ranking()
+        if not ranking:
+            return []
+        from utils.catalog import with_request_location
+        vehicles = {
+            v.id: v for v in with_request_location(Vehicle.query).filter(
+                Vehicle.id.in_([vid for vid, _ in ranking])).all()
+        }
+        return [(vehicles[vid], count) for vid, count in ranking if vid in vehicles]
+
+
+view_ranking = ViewRanking()
@@ -0,0 +1,351 @@
+"""
+Catálogo público de vehículos
+Filtros, orden y paginación del listado (index) hechos en la base de datos
+"""
+
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import func, tuple_, and_, or_, false
+from sqlalchemy.orm import selectinload
+from models import Vehicle, ClientRequest
+from utils.search import apply_search
+from utils.locations import location_index
+
+# Tamaño de página del catálogo
+PER_PAGE = 10
+
+# Hasta esta página se usa LIMIT/OFFSET; más allá se navega con cursores
+MAX_OFFSET_PAGE = 5
+
+# Orden del catálogo: Plus primero, luego más nuevos. El id desempata para
+# que el orden sea total y los cursores no salteen ni repitan filas.
+CATALOG_ORDER = [
+    (Vehicle.is_plus, 'desc'),
+    (Vehicle.created_at, 'desc'),
+    (Vehicle.id, 'desc'),
+]
+
+# Órdenes que puede elegir el usuario (parámetro sort). Cada uno tiene su
+# índice compuesto (is_active, columna, id) en models.Vehicle, así la página
+# y los cursores se resuelven recorriendo el índice. Todas las columnas van
+# en la misma dirección para que el cursor sea una comparación de tuplas.
+# Los vehículos sin ese dato (NULL) van al final, ordenados por id.
+CATALOG_SORTS = {
+    'newest': [(Vehicle.created_at, 'desc'), (Vehicle.id, 'desc')],
+    'price_asc': [(Vehicle.price_ars, 'asc'), (Vehicle.id, 'asc')],
+    'price_desc': [(Vehicle.price_ars, 'desc'), (Vehicle.id, 'desc')],
+    'year_desc': [(Vehicle.year, 'desc'), (Vehicle.id, 'desc')],
+    'year_asc': [(Vehicle.year, 'asc'), (Vehicle.id, 'asc')],
+    'km_asc': [(Vehicle.kilometers, 'asc'), (Vehicle.id, 'asc')],
+    'km_desc': [(Vehicle.kilometers, 'desc'), (Vehicle.id, 'desc')],
+}
+
+# Columnas de orden que pueden ser NULL: año o km sin cargar, precio en USD
+# sin cotización (ver utils.pricing)
+NULLS_LAST_KEYS = {'price_ars', 'year', 'kilometers'}
+
+
+def parse_catalog_filters(args):
+    """
+    Lee los filtros del catálogo desde los parámetros de la request
+
+    Returns:
+        dict: Filtros normalizados (mismas claves que usa index.html)
+    """
+    return {
+        'search': args.get('search', '').strip(),
+        'price_min': args.get('price_min', type=int),
+        'price_max': args.get('price_max', type=int),
+        'brand': args.get('brand', '').strip(),
+        'year_min': args.get('year_min', type=int),
+        'year_max': args.get('year_max', type=int),
+        'location': args.get('location', '').strip(),
+        'fuel_type': args.get('fuel_type', '').strip(),
+        'transmission': args.get('transmission', '').strip(),
+        'km_min': args.get('km_min', type=int),
+        'km_max': args.get('km_max', type=int),
+        'sort': args.get('sort', '') if args.get('sort') in CATALOG_SORTS else ''
+    }
+
+
+def apply_catalog_filters(query, filters):
+    """
+    Aplica los filtros del catálogo a una query de Vehicle
+
+    Returns:
+        tuple: (query, rank) - rank es la relevancia de la búsqueda de texto
+               (ver utils.search.apply_search) o None si no hay búsqueda
+    """
+    query = query.filter(Vehicle.is_active == True)
+
+    rank = None
+    if filters.get('search'):
+        query, rank = apply_search(query, filters['search'])
+
+    # Rangos de precio en pesos: se comparan contra el precio convertido a ARS
+    if filters.get('price_min') is not None:
+        query = query.filter(Vehicle.price_ars >= filters['price_min'])
+    if filters.get('price_max') is not None:
+        query = query.filter(Vehicle.price_ars <= filters['price_max'])
+
+    if filters.get('brand'):
+        query = query.filter(Vehicle.brand.ilike(f"%{filters['brand']}%"))
+
+    if filters.get('year_min') is not None:
+        query = query.filter(Vehicle.year >= filters['year_min'])
+    if filters.get('year_max') is not None:
+        query = query.filter(Vehicle.year <= filters['year_max'])
+
+    # Departamento: igualdad sobre location_id (índice ix_vehicle_active_location)
+    if filters.get('location'):
+        department_id = location_index.department_id(filters['location'])
+        query = query.filter(Vehicle.location_id == department_id if department_id else false())
+
+    if filters.get('fuel_type'):
+        query = query.filter(Vehicle.fuel_type == filters['fuel_type'])
+
+    if filters.get('transmission'):
+        query = query.filter(Vehicle.transmission == filters['transmission'])
+
+    if filters.get('km_min') is not None:
+        query = query.filter(Vehicle.kilometers >= filters['km_min'])
+    if filters.get('km_max') is not None:
+        query = query.filter(Vehicle.kilometers <= filters['km_max'])
+
+    return query, rank
+
+
+def catalog_order(rank=None, sort=None):
+    """
+    Orden del listado: el elegido por el usuario (CATALOG_SORTS), si no por
+    relevancia si hay búsqueda de texto, si no CATALOG_ORDER
+    """
+    if sort in CATALOG_SORTS:
+        return CATALOG_SORTS[sort]
+    if rank is None:
+        return CATALOG_ORDER
+    return [(rank, 'desc'), (Vehicle.id, 'desc')]
+
+
+def catalog_uses_cursors(rank=None, sort=None):
+    """
+    Si el orden admite cursores: no cuando se ordena por relevancia, que es
+    un float calculado en cada consulta y no se puede comparar en un cursor
+    """
+    return rank is None or sort in CATALOG_SORTS
+
+
+def encode_cursor(vehicle, order=CATALOG_ORDER):
+    """
+    Genera un cursor opaco con los valores de orden de un vehículo
+    (base64 de un JSON; las fechas viajan en ISO 8601)
+    """
+    return encode_cursor_values([getattr(vehicle, column.key) for column, _ in order])
+
+
+def encode_cursor_values(values):
+    """Cursor opaco a partir de valores de orden ya leídos (p.ej. de una fila de with_entities)"""
+    values = [{'dt': value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, order=CATALOG_ORDER):
+    """
+    Decodifica un cursor generado por encode_cursor
+
+    Returns:
+        list or None: Valores de orden, o None si el cursor es inválido
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(order):
+            return None
+        values = [
+            datetime.fromisoformat(value['dt']) if isinstance(value, dict) else value
+            for value in values
+        ]
+    except (ValueError, TypeError, KeyError):
+        return None
+    if not all(_cursor_value_ok(column, value) for (column, _), value in zip(order, values)):
+        return None
+    return values
+
+
+def _cursor_value_ok(column, value):
+    """Si value es del tipo de la columna (NULL sólo en NULLS_LAST_KEYS)"""
+    if value is None:
+        return _nulls_last(column)
+    try:
+        expected = column.type.python_type
+    except NotImplementedError:
+        expected = float
+    if expected is not bool and isinstance(value, bool):
+        return False
+    if expected is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, expected)
+
+
+def order_catalog(query, order):
+    """Aplica un orden del catálogo (CATALOG_ORDER, CATALOG_SORTS o relevancia) a la query"""
+    return query.order_by(*_order_by(order))
+
+
+def _nulls_last(column):
+    return getattr(column, 'key', None) in NULLS_LAST_KEYS
+
+
+def _order_by(order, reverse=False):
+    clauses = []
+    for column, direction in order:
+        descending = (direction == 'desc') != reverse
+        clause = column.desc() if descending else column.asc()
+        if _nulls_last(column):
+            # Recorrido hacia atrás (cursor before): los NULL quedan primero
+            clause = clause.nullsfirst() if reverse else clause.nullslast()
+        clauses.append(clause)
+    return clauses
+
+
+def keyset_ranges(query, order, values, reverse=False):
+    """
+    Filas estrictamente después de values (antes, con reverse) según el orden
+
+    Si la primera columna puede ser NULL (NULLS_LAST_KEYS) esos vehículos van
+    al final: el tramo con valor y el de NULLs se piden por separado, así
+    cada consulta es un solo rango del índice.
+
+    Returns:
+        list: Queries ya filtradas y ordenadas; se toman filas de la primera
+              y se sigue con la siguiente hasta completar la página
+    """
+    column = order[0][0]
+    if not _nulls_last(column):
+        return [query.filter(keyset_condition(order, values, reverse)).order_by(*_order_by(order, reverse))]
+
+    rest = order[1:]
+    valued = query.filter(column.isnot(None))
+    nulls = query.filter(column.is_(None))
+    if values[0] is None:
+        # El cursor está en el tramo de NULLs: se sigue por id
+        nulls = nulls.filter(keyset_condition(rest, values[1:], reverse)).order_by(*_order_by(rest, reverse))
+        return [nulls, valued.order_by(*_order_by(order, reverse))] if reverse else [nulls]
+    valued = valued.filter(keyset_condition(order, values, reverse)).order_by(*_order_by(order, reverse))
+    return [valued] if reverse else [valued, nulls.order_by(*_order_by(rest, reverse))]
+
+
+def fetch_ranges(queries, limit):
+    """Hasta limit filas de las queries de keyset_ranges, en orden"""
+    rows = []
+    for query in queries:
+        rows.extend(query.limit(limit - len(rows)).all())
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+def keyset_condition(order, values, reverse=False):
+    """
+    Condición "estrictamente después de values" según el orden dado (sin
+    NULLs en values; las columnas que los admiten pasan por keyset_ranges)
+    """
+    directions = {direction for _, direction in order}
+    if len(directions) == 1:
+        # Todas las columnas en la misma dirección: comparación de tuplas,
+        # que el índice compuesto resuelve con un solo rango
+        descending = (directions.pop() == 'desc') != reverse
+        columns = tuple_(*[column for column, _ in order])
+        return columns < tuple_(*values) if descending else columns > tuple_(*values)
+
+    # Direcciones mixtas: expansión (a > x) OR (a = x AND b > y) OR ...
+    conditions = []
+    for i, (column, direction) in enumerate(order):
+        descending = (direction == 'desc') != reverse
+        step = column < values[i] if descending else column > values[i]
+        equals = [order[j][0] == values[j] for j in range(i)]
+        conditions.append(and_(*equals, step))
+    return or_(*conditions)
+
+
+def with_request_location(query):
+    """
+    Carga en una sola consulta extra la ubicación de las solicitudes de
+    origen, que usan Vehicle.get_location()/get_sub_location() cuando el
+    vehículo no tiene ubicación propia (evita una consulta por tarjeta)
+    """
+    return query.options(
+        selectinload(Vehicle.original_request).load_only(
+            ClientRequest.location, ClientRequest.sub_location)
+    )
+
+
+def count_catalog(query):
+    """Cuenta los resultados sin cargar filas (SELECT count(*) sobre la query)"""
+    return query.order_by(None).with_entities(func.count(Vehicle.id)).scalar() or 0
+
+
+def paginate_catalog(query, page=1, after=None, before=None, per_page=PER_PAGE,
+                     order=CATALOG_ORDER, cursors=True):
+    """
+    Pagina el catálogo en la base de datos
+
+    Las primeras páginas usan LIMIT/OFFSET; los enlaces Anterior/Siguiente
+    llevan cursores (after/before) con los valores de orden del último o
+    primer vehículo mostrado, así las páginas profundas no escanean filas
+    salteadas. Sólo se cargan per_page + 1 filas por request.
+
+    Con cursors=False (orden por relevancia, que no es una columna de
+    Vehicle) se pagina sólo por número de página.
+
+    Returns:
+        dict: items, page, has_prev, has_next, next_cursor, prev_cursor
+    """
+    page = max(page or 1, 1)
+    after_values = decode_cursor(after, order) if cursors else None
+    before_values = decode_cursor(before, order) if cursors else None
+
+    if after_values is not None:
+        rows = fetch_ranges(keyset_ranges(query, order, after_values), per_page + 1)
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_prev = True
+    elif before_values is not None:
+        rows = fetch_ranges(keyset_ranges(query, order, before_values, reverse=True), per_page + 1)
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_next = True
+    else:
+        rows = query.order_by(*_order_by(order)).offset(
+            (page - 1) * per_page).limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_prev = page > 1
+
+    if not items:
+        # Cursor que ya no apunta a nada (p.ej. vehículos borrados)
+        has_prev = page > 1
+        has_next = False
+
+    # Páginas profundas: siempre por cursor. Las primeras, por número de página
+    # para que los enlaces sean estables y cacheables.
+    next_cursor = prev_cursor = None
+    if cursors and items:
+        if has_next and page >= MAX_OFFSET_PAGE:
+            next_cursor = encode_cursor(items[-1], order)
+        if has_prev and page - 1 > MAX_OFFSET_PAGE:
+            prev_cursor = encode_cursor(items[0], order)
+
+    return {
+        'items': items,
+        'page': page,
+        'per_page': per_page,
+        'has_prev': has_prev,
+        'has_next': has_next,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor
+    }
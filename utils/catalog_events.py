@@ -0,0 +1,256 @@
+"""
+Eventos de escritura del catálogo
+Detecta altas, cambios y bajas de Vehicle al hacer commit y mantiene una
+versión del catálogo compartida, para que los índices y caches en memoria
+sepan cuándo quedaron desactualizados.
+
+La versión vive en la tabla catalog_state y la incrementan triggers de la
+base en cada escritura de vehicle (add_catalog_version_table.py), así que
+cuentan también las de otros dynos y scripts sueltos; cada worker la relee
+cada CATALOG_VERSION_POLL_SECONDS. Mientras la tabla no exista se usa un
+archivo en disco, compartido sólo por los workers de una misma máquina.
+"""
+
+import os
+import time
+import logging
+import tempfile
+from collections import namedtuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models import db, Vehicle, CatalogState
+
+try:
+    import fcntl
+except ImportError:  # Windows (desarrollo local)
+    fcntl = None
+
+# Archivo con la versión actual del catálogo (compartido por los workers de gunicorn)
+VERSION_FILE = os.environ.get(
+    'CATALOG_VERSION_FILE',
+    os.path.join(tempfile.gettempdir(), 'marketplace_catalog_version')
+)
+
+# Segundos que un worker reutiliza la versión leída de catalog_state
+CATALOG_VERSION_POLL_SECONDS = float(os.environ.get('CATALOG_VERSION_POLL_SECONDS', 1.0))
+
+# op: 'insert', 'update', 'delete' o 'bulk' (UPDATE/DELETE masivo sin detalle)
+# data: valores de columnas cargados al momento del flush (None en 'bulk')
+VehicleChange = namedtuple('VehicleChange', ['op', 'vehicle_id', 'data'])
+
+_subscribers = []
+
+# catalog_state instalada (fila + triggers) por motor de base de datos
+_table_cache = {}
+# Última versión leída de la base: (url del motor, momento de lectura, versión)
+_last_read = (None, 0.0, 0)
+
+
+def _state_table_ready(bind):
+    """
+    True si la migración instaló catalog_state (se verifica una vez por motor).
+    db.create_all() crea la tabla vacía y sin triggers: la fila id=1 la inserta
+    add_catalog_version_table.py junto con los triggers
+    """
+    key = str(bind.url)
+    if key not in _table_cache:
+        try:
+            ready = inspect(bind).has_table(CatalogState.__tablename__)
+            if ready:
+                with bind.connect() as connection:
+                    ready = connection.execute(
+                        db.select(CatalogState.id).where(CatalogState.id == 1)
+                    ).first() is not None
+            _table_cache[key] = ready
+        except Exception as e:
+            logging.error(f"No se pudo verificar la tabla catalog_state: {e}")
+            return False
+    return _table_cache[key]
+
+
+def _current_engine():
+    try:
+        return db.engine
+    except RuntimeError:  # Fuera de un contexto de la app
+        return None
+
+
+def _select_version(connection):
+    return connection.execute(
+        db.select(CatalogState.version).where(CatalogState.id == 1)
+    ).scalar() or 0
+
+
+def _remember_version(bind, version):
+    global _last_read
+    _last_read = (str(bind.url), time.monotonic(), version)
+
+
+def _file_version():
+    try:
+        with open(VERSION_FILE, 'r') as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def get_catalog_version():
+    """Versión actual del catálogo (0 si nunca hubo escrituras)"""
+    engine = _current_engine()
+    if engine is None or not _state_table_ready(engine):
+        return _file_version()
+
+    url, read_at, version = _last_read
+    if url == str(engine.url) and time.monotonic() - read_at < CATALOG_VERSION_POLL_SECONDS:
+        return version
+    try:
+        with engine.connect() as connection:
+            version = _select_version(connection)
+    except Exception as e:
+        logging.error(f"No se pudo leer la versión del catálogo: {e}")
+        return version if url == str(engine.url) else 0
+    _remember_version(engine, version)
+    return version
+
+
+def _bump_version():
+    """
+    Incrementa la versión del catálogo en el archivo (sin tabla catalog_state)
+
+    Returns:
+        tuple: (versión anterior, versión nueva)
+    """
+    with open(VERSION_FILE, 'a+') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            try:
+                previous = int(f.read().strip() or 0)
+            except ValueError:
+                previous = 0
+            # Basada en el reloj para que siga creciendo tras reinicios
+            version = max(previous + 1, time.time_ns() // 1000)
+            f.seek(0)
+            f.truncate()
+            f.write(str(version))
+            f.flush()
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    return previous, version
+
+
+def subscribe(callback):
+    """
+    Registra un callback(changes, previous_version, version) que se llama
+    después de cada commit que modificó vehículos.
+
+    Si el consumidor estaba en previous_version puede aplicar los cambios
+    de forma incremental; si no, otro worker escribió en el medio y debe
+    reconstruirse desde la base.
+    """
+    _subscribers.append(callback)
+    return callback
+
+
+def _snapshot(obj, inserted=False):
+    state = inspect(obj)
+    loaded = state.dict
+    if inserted:
+        # Columnas que no se asignaron quedaron en NULL
+        return {attr.key: loaded.get(attr.key) for attr in state.mapper.column_attrs}
+    return {
+        attr.key: loaded[attr.key]
+        for attr in state.mapper.column_attrs
+        if attr.key in loaded
+    }
+
+
+def _lock_version(session):
+    """
+    Primera escritura de vehículos de la transacción: bloquea la fila de
+    catalog_state (nadie más la incrementa hasta el commit) y guarda la
+    versión de la que se parte
+    """
+    if 'catalog_previous' in session.info or not _state_table_ready(session.get_bind()):
+        return
+    connection = session.connection()
+    state = CatalogState.__table__
+    connection.execute(state.update().where(state.c.id == 1).values(version=state.c.version))
+    session.info['catalog_previous'] = _select_version(connection)
+
+
+def _read_locked_version(session):
+    """Versión después de las escrituras (los triggers ya la incrementaron)"""
+    if 'catalog_previous' in session.info:
+        session.info['catalog_version'] = _select_version(session.connection())
+
+
+@event.listens_for(Session, 'before_flush')
+def _lock_before_vehicle_writes(session, flush_context, instances):
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Vehicle):
+            return _lock_version(session)
+    for obj in session.dirty:
+        if isinstance(obj, Vehicle) and session.is_modified(obj, include_collections=False):
+            return _lock_version(session)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_vehicle_changes(session, flush_context):
+    changes = session.info.setdefault('catalog_changes', [])
+    for obj in session.new:
+        if isinstance(obj, Vehicle):
+            changes.append(VehicleChange('insert', obj.id, _snapshot(obj, inserted=True)))
+    for obj in session.dirty:
+        if isinstance(obj, Vehicle) and session.is_modified(obj, include_collections=False):
+            changes.append(VehicleChange('update', obj.id, _snapshot(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, Vehicle):
+            changes.append(VehicleChange('delete', obj.id, None))
+    if changes:
+        _read_locked_version(session)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_changes(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is Vehicle:
+        session = orm_execute_state.session
+        session.info.setdefault('catalog_changes', []).append(VehicleChange('bulk', None, None))
+        _lock_version(session)
+        result = orm_execute_state.invoke_statement()
+        _read_locked_version(session)
+        return result
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_vehicle_changes(session):
+    changes = session.info.pop('catalog_changes', None)
+    previous = session.info.pop('catalog_previous', None)
+    version = session.info.pop('catalog_version', None)
+    if not changes:
+        return
+    if version is not None:
+        # Este worker ve su propia escritura sin esperar a la próxima lectura
+        _remember_version(session.get_bind(), version)
+    else:
+        try:
+            previous, version = _bump_version()
+        except OSError as e:
+            logging.error(f"No se pudo actualizar la versión del catálogo: {e}")
+            return
+    for callback in _subscribers:
+        try:
+            callback(changes, previous, version)
+        except Exception as e:
+            logging.error(f"Error notificando cambios del catálogo: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_vehicle_changes(session):
+    for key in ('catalog_changes', 'catalog_previous', 'catalog_version'):
+        session.info.pop(key, None)
@@ -0,0 +1,55 @@
+"""
+Cache de datos de contacto para /track_click
+El redirect a WhatsApp sólo necesita número, título, precio y moneda del
+vehículo: se guardan por (versión del catálogo, id) en un LRU acotado, así
+el click se registra (en lote, utils.write_behind) y se redirige sin
+consultar la base. Los mensajes se arman con los mismos métodos de Vehicle.
+El beacon de vistas lo usa también para saber si el vehículo existe.
+"""
+
+import os
+from models import db, Vehicle
+from utils.cache import LRUCache
+from utils.catalog_events import subscribe, get_catalog_version
+
+CONTACT_CACHE_SIZE = int(os.environ.get('CONTACT_CACHE_SIZE', 2048))
+# Segundos de vida (tope si una escritura no cambia la versión del catálogo)
+CONTACT_CACHE_TTL = int(os.environ.get('CONTACT_CACHE_TTL', 300))
+
+# Columnas que usan get_whatsapp_contact_message / get_whatsapp_offer_message
+CONTACT_COLUMNS = [Vehicle.id, Vehicle.title, Vehicle.price, Vehicle.currency, Vehicle.whatsapp_number]
+
+
+class ContactCache:
+    """Vehículos (sólo las columnas de contacto) por versión del catálogo"""
+
+    def __init__(self, maxsize=CONTACT_CACHE_SIZE, ttl=CONTACT_CACHE_TTL):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, vehicle_id):
+        """
+        Vehicle transitorio (fuera de la sesión) con las columnas de contacto
+
+        Returns:
+            Vehicle or None: None si el vehículo no existe
+        """
+        key = (get_catalog_version(), vehicle_id)
+        vehicle = self._cache.get(key, False)
+        if vehicle is False:
+            row = db.session.query(*CONTACT_COLUMNS).filter(Vehicle.id == vehicle_id).first()
+            vehicle = Vehicle(**row._asdict()) if row else None
+            self._cache.set(key, vehicle)
+        return vehicle
+
+    def on_catalog_change(self, changes, previous_version, version):
+        self._cache.clear()
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+contact_cache = ContactCache()
+subscribe(contact_cache.on_catalog_change)
@@ -0,0 +1,197 @@
+"""
+Conteos de filtros (facetas) del catálogo
+Para los filtros actuales calcula cuántos vehículos devolvería cada opción
+de marca, combustible, transmisión, ubicación y rangos de año, precio y km.
+Trabaja sobre una copia columnar en memoria de los vehículos activos (una
+sola pasada) y guarda el resultado por conjunto de filtros normalizado.
+"""
+
+import os
+import time
+import threading
+from models import db, Vehicle
+from utils.cache import LRUCache
+from utils.catalog_events import get_catalog_version
+from utils.search import apply_search, fold_text
+from utils.locations import location_index
+
+# Rangos de los selectores de index.html (valor de la opción, mínimo, máximo).
+# None = sin límite, igual que los parámetros que arma main.js
+YEAR_RANGES = [('2021-2024', 2021, 2024), ('2016-2020', 2016, 2020), ('2010-2015', 2010, 2015)]
+PRICE_RANGES = [
+    ('1000000-5000000', 1000000, 5000000),
+    ('5000000-10000000', 5000000, 10000000),
+    ('10000000-15000000', 10000000, 15000000),
+    ('15000000-999999999', 15000000, None),
+]
+KM_RANGES = [('0-50000', None, 50000), ('50000-100000', 50000, 100000), ('100000-999999999', 100000, None)]
+
+# Segundos de vida de la copia y de los conteos: tope por si una escritura no
+# cambia la versión del catálogo (base sin catalog_state, ver utils.catalog_events)
+FACET_CACHE_TTL = int(os.environ.get('FACET_CACHE_TTL', 300))
+
+# Faceta -> (columna, filtro, tipo)
+VALUE_FACETS = {
+    'brand': ('brand', 'brand', 'contains'),
+    'location': ('location', 'location', 'department'),
+    'fuel_type': ('fuel_type', 'fuel_type', 'equals'),
+    'transmission': ('transmission', 'transmission', 'equals'),
+}
+# Faceta -> (columna, filtro mínimo, filtro máximo, rangos)
+RANGE_FACETS = {
+    'year_range': ('year', 'year_min', 'year_max', YEAR_RANGES),
+    'price_range': ('price_ars', 'price_min', 'price_max', PRICE_RANGES),
+    'km_range': ('kilometers', 'km_min', 'km_max', KM_RANGES),
+}
+
+SNAPSHOT_COLUMNS = ('id', 'brand', 'location_id', 'fuel_type', 'transmission', 'year', 'price_ars', 'kilometers')
+
+
+def normalize_filters(filters):
+    """Clave estable para un conjunto de filtros (ignora vacíos y el orden, búsqueda sin acentos)"""
+    key = []
+    for name in sorted(filters):
+        value = filters[name]
+        if value is None or value == '' or name == 'sort':
+            continue
+        if name == 'search':
+            value = ' '.join(fold_text(value).split())
+        key.append((name, value))
+    return tuple(key)
+
+
+def _in_range(value, low, high):
+    if value is None:
+        return False
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+class FacetEngine:
+    """Copia columnar de los vehículos activos + cache de conteos por filtros"""
+
+    def __init__(self, cache_size=256, ttl=FACET_CACHE_TTL):
+        self._lock = threading.Lock()
+        self._columns = None
+        self._version = None
+        self._loaded_at = 0.0
+        self.ttl = ttl
+        self._cache = LRUCache(maxsize=cache_size, ttl=ttl)
+
+    def _is_current(self, version):
+        return (self._columns is not None and self._version == version and
+                time.monotonic() - self._loaded_at < self.ttl)
+
+    def _snapshot(self):
+        version = get_catalog_version()
+        if self._is_current(version):
+            return self._columns, version
+        with self._lock:
+            if not self._is_current(version):
+                rows = db.session.query(
+                    *[getattr(Vehicle, column) for column in SNAPSHOT_COLUMNS]
+                ).filter(Vehicle.is_active == True).all()
+                columns = {
+                    column: [row[i] for row in rows]
+                    for i, column in enumerate(SNAPSHOT_COLUMNS)
+                }
+                # Nombre del departamento (tabla location) para los conteos;
+                # el filtro compara location_id, igual que utils.catalog
+                departments = location_index.department_names()
+                columns['location'] = [departments.get(i) for i in columns['location_id']]
+                self._columns = columns
+                self._version = version
+                self._loaded_at = time.monotonic()
+        return self._columns, version
+
+    def brands(self):
+        """Marcas presentes en vehículos activos, ordenadas"""
+        columns, _ = self._snapshot()
+        return sorted({brand for brand in columns['brand'] if brand})
+
+    def counts(self, filters):
+        """
+        Conteos por faceta para los filtros dados
+
+        Cada faceta se cuenta aplicando todos los filtros menos el propio,
+        así el usuario ve cuántos resultados tendría si cambia esa opción.
+
+        Returns:
+            dict: {'total': n, 'brand': {'Toyota': 3, ...}, 'year_range': {'2016-2020': 5, ...}, ...}
+        """
+        columns, version = self._snapshot()
+        key = (version, normalize_filters(filters))
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        result = self._compute(columns, filters)
+        self._cache.set(key, result)
+        return result
+
+    def stats(self):
+        """Métricas del cache de conteos (ver LRUCache.stats)"""
+        return self._cache.stats()
+
+    def _search_ids(self, search_query):
+        query, _ = apply_search(
+            db.session.query(Vehicle.id).filter(Vehicle.is_active == True), search_query)
+        return {row[0] for row in query.all()}
+
+    def _compute(self, columns, filters):
+        # Un predicado por faceta (None = esa faceta no filtra)
+        predicates = {}
+        for facet, (column, name, kind) in VALUE_FACETS.items():
+            value = filters.get(name)
+            if value:
+                if kind == 'contains':
+                    needle = value.lower()
+                    predicates[facet] = (column, lambda v, n=needle: bool(v) and n in v.lower())
+                elif kind == 'department':
+                    # Sin acentos ni mayúsculas, por id (ver LocationIndex.department_id)
+                    department_id = location_index.department_id(value)
+                    predicates[facet] = ('location_id', lambda v, x=department_id: x is not None and v == x)
+                else:
+                    predicates[facet] = (column, lambda v, x=value: v == x)
+        for facet, (column, low_name, high_name, _) in RANGE_FACETS.items():
+            low, high = filters.get(low_name), filters.get(high_name)
+            if low is not None or high is not None:
+                predicates[facet] = (column, lambda v, lo=low, hi=high: _in_range(v, lo, hi))
+
+        search_ids = self._search_ids(filters['search']) if filters.get('search') else None
+
+        result = {'total': 0}
+        for facet in VALUE_FACETS:
+            result[facet] = {}
+        for facet, (_, _, _, ranges) in RANGE_FACETS.items():
+            result[facet] = {value: 0 for value, _, _ in ranges}
+
+        names = list(columns)
+        for row in zip(*columns.values()):
+            record = dict(zip(names, row))
+            if search_ids is not None and record['id'] not in search_ids:
+                continue
+
+            failed = [facet for facet, (column, test) in predicates.items() if not test(record[column])]
+            if len(failed) > 1:
+                continue
+            if not failed:
+                result['total'] += 1
+
+            # Una fila que sólo falla la faceta F cuenta únicamente para F
+            for facet, (column, _, _) in VALUE_FACETS.items():
+                if failed and failed[0] != facet:
+                    continue
+                value = record[column]
+                if value:
+                    result[facet][value] = result[facet].get(value, 0) + 1
+            for facet, (column, _, _, ranges) in RANGE_FACETS.items():
+                if failed and failed[0] != facet:
+                    continue
+                for value, low, high in ranges:
+                    if _in_range(record[column], low, high):
+                        result[facet][value] += 1
+
+        return result
+
+
+facet_engine = FacetEngine()
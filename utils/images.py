@@ -0,0 +1,146 @@
+"""
+Imágenes de publicaciones como filas (tabla vehicle_image)
+La columna JSON `images` de Vehicle y ClientRequest sigue siendo la que
+escriben los formularios; al hacer flush se sincronizan sus filas en
+vehicle_image (posición, URL, public_id de Cloudinary, tamaño y miniaturas).
+El tamaño sale de la respuesta de Cloudinary al subir la imagen
+(cloudinary_storage.uploaded_dimensions) y se conserva al reemplazar filas.
+Mientras la tabla no exista (migración sin correr) no se hace nada.
+"""
+
+import logging
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models import db, Vehicle, ClientRequest, VehicleImage
+from cloudinary_storage import public_id_from_url, variant_url, uploaded_dimensions
+
+# Columna de vehicle_image que apunta a cada tipo de publicación
+OWNER_COLUMNS = {
+    Vehicle: 'vehicle_id',
+    ClientRequest: 'client_request_id',
+}
+
+# Tabla disponible por motor de base de datos
+_table_cache = {}
+
+
+def images_table_ready(bind=None):
+    """True si la tabla vehicle_image existe (se verifica una vez por motor)"""
+    bind = bind or db.engine
+    key = str(bind.url)
+    if key not in _table_cache:
+        try:
+            _table_cache[key] = inspect(bind).has_table(VehicleImage.__tablename__)
+        except Exception as e:
+            logging.error(f"No se pudo verificar la tabla vehicle_image: {e}")
+            return False
+    return _table_cache[key]
+
+
+def image_rows(images, dimensions=None):
+    """
+    Filas de vehicle_image para una lista de URLs (en orden)
+
+    Args:
+        dimensions: {url: (width, height)} ya conocidos (p.ej. de las filas anteriores)
+
+    Returns:
+        list: [{'position', 'url', 'public_id', 'width', 'height', 'thumb_*_url'}, ...]
+    """
+    dimensions = dimensions or {}
+    rows = []
+    for url in images or []:
+        if not isinstance(url, str) or not url.strip():
+            continue
+        width, height = dimensions.get(url) or uploaded_dimensions(url) or (None, None)
+        rows.append({
+            'position': len(rows),
+            'url': url,
+            'public_id': public_id_from_url(url),
+            'width': width,
+            'height': height,
+            'thumb_small_url': variant_url(url, 'small'),
+            'thumb_medium_url': variant_url(url, 'medium'),
+            'thumb_large_url': variant_url(url, 'large'),
+        })
+    return rows
+
+
+def replace_image_rows(connection, owner_column, owner_id, images):
+    """Reemplaza las filas de una publicación (images=None sólo las borra)"""
+    table = VehicleImage.__table__
+    owner = table.c[owner_column] == owner_id
+    dimensions = {}
+    if images:
+        # Las imágenes que siguen en la galería conservan su tamaño
+        dimensions = {
+            url: (width, height) for url, width, height in connection.execute(
+                db.select(table.c.url, table.c.width, table.c.height).where(owner, table.c.width.isnot(None))
+            )
+        }
+    connection.execute(table.delete().where(owner))
+    rows = image_rows(images, dimensions)
+    if rows:
+        connection.execute(table.insert(), [dict(row, **{owner_column: owner_id}) for row in rows])
+
+
+@event.listens_for(Session, 'after_flush')
+def _sync_image_rows(session, flush_context):
+    pending = []
+    for obj in list(session.new) + list(session.dirty):
+        owner_column = OWNER_COLUMNS.get(type(obj))
+        if owner_column is None:
+            continue
+        if obj in session.new or inspect(obj).attrs.images.history.has_changes():
+            pending.append((owner_column, obj.id, obj._parsed_images()))
+    for obj in session.deleted:
+        owner_column = OWNER_COLUMNS.get(type(obj))
+        if owner_column is not None:
+            pending.append((owner_column, obj.id, None))
+
+    if not pending or not images_table_ready(session.get_bind()):
+        return
+    connection = session.connection()
+    for owner_column, owner_id, images in pending:
+        replace_image_rows(connection, owner_column, owner_id, images)
+
+
+def stored_public_ids(vehicle_id):
+    """
+    public_id de Cloudinary de cada imagen de un vehículo (consulta por índice)
+
+    Returns:
+        dict: {url: public_id} (vacío si la tabla no existe)
+    """
+    if not images_table_ready():
+        return {}
+    rows = db.session.query(VehicleImage.url, VehicleImage.public_id).filter(
+        VehicleImage.vehicle_id == vehicle_id,
+        VehicleImage.public_id.isnot(None)
+    ).all()
+    return {url: public_id for url, public_id in rows}
+
+
+def main_images(vehicles):
+    """
+    Imagen principal de cada vehículo en una sola consulta
+
+    Returns:
+        dict: {vehicle_id: VehicleImage} (vacío si la tabla no existe)
+    """
+    if not vehicles or not images_table_ready():
+        return {}
+    wanted = {v.id: v.main_image_index or 0 for v in vehicles}
+    rows = VehicleImage.query.filter(
+        VehicleImage.vehicle_id.in_(list(wanted)),
+        VehicleImage.position.in_(set(wanted.values()) | {0})
+    ).all()
+
+    result = {}
+    for row in rows:
+        if row.position == wanted[row.vehicle_id]:
+            result[row.vehicle_id] = row
+        elif row.position == 0:
+            # main_image_index fuera de rango: se usa la primera, como get_main_image()
+            result.setdefault(row.vehicle_id, row)
+    return result
@@ -0,0 +1,170 @@
+"""
+Ubicaciones normalizadas (tabla location: departamento -> sub-ubicación)
+Los formularios siguen guardando el texto en location/sub_location; al hacer
+flush se resuelven los ids (location_id = departamento, sub_location_id =
+sub-ubicación) para filtrar por igualdad sobre un índice en vez de ilike.
+Las sub-ubicaciones que no están en la lista quedan sólo como texto.
+"""
+
+import re
+import threading
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models import db, Vehicle, ClientRequest, Location
+from utils.search import fold_text
+
+# Zona -> departamento -> sub-ubicaciones (SUB_UBICACIONES_MENDOZA.md)
+MENDOZA_LOCATIONS = {
+    'Valle de Uco': {
+        'Tunuyán': ['Ciudad', 'Vista Flores', 'Los Arboles', 'Colonia Las Rosas', 'La Consulta'],
+        'Tupungato': ['Ciudad', 'San José', 'Anchoris', 'Zapata', 'Cordón del Plata'],
+        'San Carlos': ['Ciudad', 'Eugenio Bustos', 'Chilecito', 'Pareditas', 'La Consulta'],
+    },
+    'Zona Sur': {
+        'San Rafael': ['Ciudad (Centro)', 'Cuadro Benegas', 'Cuadro Nacional', 'Salto de las Rosas',
+                       'Las Paredes', 'Rama Caída', 'Monte Comán', 'Goudge', 'Villa Atuel',
+                       '25 de Mayo', 'Cuadro Bombal', 'El Nihuil'],
+        'General Alvear': ['Ciudad (Centro)', 'Bowen', 'Carmensa', 'Los Compartos',
+                           'San Pedro del Atuel', 'Reducción', 'Colonia Segovia'],
+        'Malargüe': ['Ciudad (Centro)', 'Las Leñas', 'Los Molles', 'Bardas Blancas', 'Pata Mora',
+                     'Ranquil del Norte'],
+    },
+    'Zona Norte': {
+        'Las Heras': ['Ciudad', 'El Plumerillo', 'Panquehua', 'El Algarrobal', 'El Challao',
+                      'El Resguardo', 'El Pastal'],
+        'Lavalle': ['Villa Tulumaya', 'Costa de Araujo', 'Jocolí', 'El Vergel', 'Jocolí Viejo'],
+    },
+    'Área Metropolitana': {
+        'Capital': ['Ciudad (Centro)', 'Bombal', 'Barrio Cano', 'Belgrano', 'San Martín', 'Fuchs',
+                    'Quinta Sección'],
+        'Godoy Cruz': ['Ciudad (Centro)', 'Gobernador Benegas', 'Las Tortugas',
+                       'San Francisco del Monte', 'Presidente Sarmiento'],
+        'Guaymallén': ['Villa Nueva', 'Bermejo', 'Dorrego', 'San José', 'Jesús Nazareno', 'Belgrano',
+                       'Pedro Molina'],
+        'Luján de Cuyo': ['Luján', 'Chacras de Coria', 'Vistalba', 'Mayor Drummond', 'Perdriel',
+                          'Agrelo', 'Ugarteche', 'Carrodilla'],
+        'Maipú': ['Ciudad', 'Coquimbito', 'Cruz de Piedra', 'Russell', 'Rodeo del Medio',
+                  'General Gutiérrez', 'Fray Luis Beltrán', 'Lunlunta'],
+    },
+    'Zona Este': {
+        'Rivadavia': ['Ciudad', 'La Libertad', 'Los Campamentos', 'San Miguel', 'Medrano', 'Reducción'],
+        'Junín': ['Ciudad', 'Los Barriales', 'Algarrobo Grande', 'Mundo Nuevo', 'La Colonia', 'Phillips',
+                  'Rodríguez Peña'],
+        'San Martín': ['Ciudad', 'Chapanay', 'Palmira', 'La Colonia', 'Alto Verde', 'Nueva California',
+                       'Tres Porteñas', 'El Central'],
+    },
+    'Otras zonas': {
+        'La Paz': ['Desaguadero', 'Villa Antigua', 'Las Chacritas'],
+        'Santa Rosa': ['Santa Rosa (Ciudad)', 'Las Catitas', 'La Dormida', 'Ñacuñán'],
+    },
+}
+
+
+def _key(text):
+    """Texto comparable: sin acentos, minúsculas y espacios simples"""
+    return ' '.join(fold_text(text).split())
+
+
+def build_lookup(rows):
+    """
+    Índice de búsqueda a partir de las filas de location
+
+    Args:
+        rows: Iterable de (id, name, parent_id)
+
+    Returns:
+        dict: {'departments': {clave: (id, nombre)}, 'sub_locations': {id_depto: {clave: id}}}
+    """
+    rows = list(rows)
+    departments = {_key(name): (id_, name) for id_, name, parent_id in rows if parent_id is None}
+    sub_locations = {}
+    for id_, name, parent_id in rows:
+        if parent_id is None:
+            continue
+        subs = sub_locations.setdefault(parent_id, {})
+        subs[_key(name)] = id_
+        # "Ciudad (Centro)" también como "Ciudad"
+        short = _key(re.sub(r'\s*\(.*\)', '', name))
+        subs.setdefault(short, id_)
+    return {'departments': departments, 'sub_locations': sub_locations}
+
+
+def resolve(lookup, location, sub_location=None):
+    """
+    Ids de departamento y sub-ubicación para el texto de una publicación
+
+    El departamento se reconoce aunque el texto tenga más datos
+    ("Tunuyán, Mendoza"), igual que el filtro ilike anterior.
+
+    Returns:
+        tuple: (location_id, sub_location_id) - None si no se reconoce
+    """
+    text = _key(location)
+    if not text:
+        return None, None
+    match = lookup['departments'].get(text)
+    if match is None:
+        candidates = [key for key in lookup['departments'] if key in text]
+        if not candidates:
+            return None, None
+        match = lookup['departments'][max(candidates, key=len)]
+    department_id = match[0]
+    sub_location_id = lookup['sub_locations'].get(department_id, {}).get(_key(sub_location))
+    return department_id, sub_location_id
+
+
+class LocationIndex:
+    """Tabla location en memoria (es fija: se carga una vez por proceso)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lookup = None
+
+    def lookup(self, session=None):
+        if self._lookup is not None:
+            return self._lookup
+        session = session or db.session
+        with self._lock:
+            if self._lookup is None:
+                with session.no_autoflush:
+                    rows = session.query(Location.id, Location.name, Location.parent_id).all()
+                lookup = build_lookup(rows)
+                if not lookup['departments']:
+                    # Tabla sin cargar todavía (migración pendiente): no se guarda
+                    return lookup
+                self._lookup = lookup
+        return self._lookup
+
+    def department_id(self, name):
+        """Id del departamento por nombre exacto (sin acentos), o None"""
+        match = self.lookup()['departments'].get(_key(name))
+        return match[0] if match else None
+
+    def department_names(self):
+        """
+        Returns:
+            dict: {location_id: nombre del departamento}
+        """
+        return {id_: name for id_, name in self.lookup()['departments'].values()}
+
+
+location_index = LocationIndex()
+
+LOCATED_MODELS = (Vehicle, ClientRequest)
+
+
+@event.listens_for(Session, 'before_flush')
+def _update_location_ids(session, flush_context, instances):
+    pending = []
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, LOCATED_MODELS):
+            continue
+        state = inspect(obj)
+        if (obj in session.new or state.attrs.location.history.has_changes() or
+                state.attrs.sub_location.history.has_changes()):
+            pending.append(obj)
+    if not pending:
+        return
+    lookup = location_index.lookup(session)
+    for obj in pending:
+        obj.location_id, obj.sub_location_id = resolve(lookup, obj.location, obj.sub_location)
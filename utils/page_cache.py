@@ -0,0 +1,95 @@
+"""
+Cache de páginas completas para visitantes anónimos
+Guarda el HTML ya renderizado por clave (filtros normalizados + versión del
+catálogo + lo que cambie aparte, como el ranking del carrusel) y responde
+con ETag fuerte (hash del contenido); si el navegador ya tiene esa versión
+(If-None-Match) se devuelve 304 sin cuerpo.
+"""
+
+import os
+import hashlib
+from flask import request, session, make_response
+from utils.cache import LRUCache
+from utils.catalog_events import get_catalog_version
+
+# Fichas de vehículo en cache (cada una ocupa decenas de KB) y segundos de vida:
+# lo que no depende de Vehicle (vehículos similares, datos del vendedor) se
+# refresca al vencer
+VEHICLE_PAGE_CACHE_SIZE = int(os.environ.get('VEHICLE_PAGE_CACHE_SIZE', 256))
+VEHICLE_PAGE_CACHE_TTL = int(os.environ.get('VEHICLE_PAGE_CACHE_TTL', 600))
+
+# Segundos de vida del listado: tope por si la versión del catálogo no se
+# entera de una escritura (base sin catalog_state, ver utils.catalog_events)
+CATALOG_PAGE_CACHE_TTL = int(os.environ.get('CATALOG_PAGE_CACHE_TTL', 300))
+
+
+def is_cacheable_request():
+    """Sólo GET anónimos sin mensajes flash pendientes (el HTML no varía por usuario)"""
+    return (request.method == 'GET' and
+            not session.get('admin_logged_in') and
+            not session.get('_flashes'))
+
+
+def content_etag(body):
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+class PageCache:
+    """HTML renderizado por clave, con ETag y respuestas condicionales"""
+
+    def __init__(self, maxsize=128, ttl=None):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def key(self, *parts):
+        """Clave de cache: versión del catálogo + partes normalizadas"""
+        return (get_catalog_version(),) + parts
+
+    def respond(self, key, render):
+        """
+        Respuesta para la clave, renderizando sólo si no está en cache
+
+        Args:
+            key: clave armada con key()
+            render: función sin argumentos que devuelve el HTML
+
+        Returns:
+            Response: 200 con ETag, o 304 si el cliente ya tiene ese ETag
+        """
+        if not is_cacheable_request():
+            return make_response(render())
+
+        entry = self._cache.get(key)
+        if entry is None:
+            body = render().encode('utf-8')
+            entry = (content_etag(body), body)
+            self._cache.set(key, entry)
+        etag, body = entry
+
+        response = make_response(body)
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = 0
+        response.cache_control.must_revalidate = True
+        return response.make_conditional(request)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+class VehiclePageCache(PageCache):
+    """Fichas de vehículo por (versión del catálogo, id, host)"""
+
+    def key(self, vehicle_id, host_url):
+        # El host va en la clave porque la página tiene URLs absolutas (compartir, WhatsApp)
+        return super().key(vehicle_id, host_url)
+
+    def evict(self, vehicle_id):
+        """Descarta las fichas del vehículo (al editarlo, pausarlo o borrarlo)"""
+        return self._cache.discard(lambda key: key[1] == vehicle_id)
+
+
+catalog_page_cache = PageCache(ttl=CATALOG_PAGE_CACHE_TTL)
+vehicle_page_cache = VehiclePageCache(maxsize=VEHICLE_PAGE_CACHE_SIZE, ttl=VEHICLE_PAGE_CACHE_TTL)
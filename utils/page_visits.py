@@ -0,0 +1,141 @@
+"""
+Visitas de páginas (index, perfiles de vendedor, gestores)
+En lugar de un INSERT + commit de PageVisit al principio de cada request,
+las visitas se muestrean (PAGE_VISIT_SAMPLE_RATE) y se suman en memoria por
+minuto, página y host del referrer; un hilo de fondo las vuelca cada
+PAGE_VISIT_FLUSH_SECONDS con un upsert a page_visit_minute (la estimación
+se guarda sin redondear, así los totales no se desvían). Las filas
+completas de PageVisit (IP, user agent, referrer) sólo se guardan con
+PAGE_VISIT_DETAILED_LOG, usando la misma escritura en lote.
+"""
+
+import random
+import logging
+from datetime import datetime
+from urllib.parse import urlsplit
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, PageVisit, PageVisitMinute
+from utils.write_behind import WriteBehindBuffer
+
+
+def referrer_host(referrer):
+    """Host del referrer en minúsculas ('' si no hay o no se puede leer)"""
+    if not referrer:
+        return ''
+    try:
+        return (urlsplit(referrer).hostname or '')[:255]
+    except ValueError:
+        return ''
+
+
+class PageVisitPipeline(WriteBehindBuffer):
+    """Contadores por minuto (y, opcionalmente, filas de PageVisit) escritos en lote"""
+
+    def __init__(self, sample_rate=1.0, detailed_log=False, max_keys=10000):
+        super().__init__(PageVisit, 'PAGE_VISIT', flush_seconds=60.0)
+        self.sample_rate = sample_rate
+        self.detailed_log = detailed_log
+        self.max_keys = max_keys
+        self._counts = {}  # (page, referrer_host, minuto) -> visitas estimadas
+
+    def init_app(self, app):
+        """Además lee PAGE_VISIT_SAMPLE_RATE y PAGE_VISIT_DETAILED_LOG"""
+        super().init_app(app)
+        self.sample_rate = app.config.get('PAGE_VISIT_SAMPLE_RATE', self.sample_rate)
+        self.detailed_log = app.config.get('PAGE_VISIT_DETAILED_LOG', self.detailed_log)
+
+    def record(self, page, ip_address=None, user_agent=None, referrer=None):
+        """Registra una visita (si entra en la muestra)"""
+        if self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            return
+
+        key = (page, referrer_host(referrer), datetime.utcnow().replace(second=0, microsecond=0))
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1 / min(self.sample_rate, 1)
+
+        if self.detailed_log:
+            self.add(PageVisit(page=page, ip_address=ip_address, user_agent=user_agent, referrer=referrer))
+
+        if not self.enabled or self._app is None:
+            self.flush_counts()
+        else:
+            self._ensure_thread()
+
+    def _upsert(self, connection, rows):
+        table = PageVisitMinute.__table__
+        dialect = connection.dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+            statement = insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=['page', 'minute', 'referrer_host'],
+                set_={'visits': table.c.visits + statement.excluded.visits}
+            )
+            connection.execute(statement, rows)
+            return
+        for row in rows:
+            updated = connection.execute(
+                table.update()
+                .where(table.c.page == row['page'])
+                .where(table.c.minute == row['minute'])
+                .where(table.c.referrer_host == row['referrer_host'])
+                .values(visits=table.c.visits + row['visits'])
+            ).rowcount
+            if not updated:
+                connection.execute(table.insert(), [row])
+
+    def flush_counts(self):
+        """
+        Suma los contadores acumulados a page_visit_minute
+
+        Returns:
+            int: Cantidad de filas (minuto, página, referrer) actualizadas
+        """
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        rows = [
+            {'page': page, 'referrer_host': host, 'minute': minute, 'visits': visits}
+            for (page, host, minute), visits in counts.items()
+        ]
+        if not rows:
+            return 0
+        try:
+            if self._app is None:
+                with db.engine.begin() as connection:
+                    self._upsert(connection, rows)
+            else:
+                with self._app.app_context():
+                    with db.engine.begin() as connection:
+                        self._upsert(connection, rows)
+        except Exception as e:
+            logging.error(f"Error guardando {len(rows)} contadores de visitas: {e}")
+            with self._lock:
+                # Se reintentan en el próximo lote mientras no crezcan sin límite
+                if len(self._counts) + len(counts) <= self.max_keys:
+                    for key, visits in counts.items():
+                        self._counts[key] = self._counts.get(key, 0) + visits
+            return 0
+        return len(rows)
+
+    def flush(self):
+        """Vuelca contadores y filas de PageVisit pendientes"""
+        self.flush_counts()
+        return super().flush()
+
+    def drain(self):
+        if self._app is None:
+            return
+        self.flush_counts()
+        super().drain()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending_counts': len(self._counts),
+                'pending_rows': len(self._rows),
+                'sample_rate': self.sample_rate,
+                'detailed_log': self.detailed_log,
+            }
+
+
+page_visit_pipeline = PageVisitPipeline()
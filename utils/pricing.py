@@ -0,0 +1,113 @@
+"""
+Precio normalizado en pesos (Vehicle.price_ars)
+Los vehículos se publican en ARS o USD; para filtrar por rango y ordenar por
+precio entre monedas se guarda también el precio convertido a ARS con la
+cotización local de la tabla exchange_rate. Se recalcula al guardar un
+vehículo y, en bloque con un UPDATE, cuando cambia una cotización.
+"""
+
+from decimal import Decimal
+from sqlalchemy import event, inspect, func, cast, BigInteger
+from sqlalchemy.orm import Session
+from models import db, Vehicle, ExchangeRate
+
+BASE_CURRENCY = 'ARS'
+
+
+def get_rates(session=None):
+    """
+    Cotizaciones configuradas
+
+    Returns:
+        dict: {'ARS': Decimal(1), 'USD': Decimal('1000'), ...}
+    """
+    session = session or db.session
+    with session.no_autoflush:
+        rows = session.query(ExchangeRate.currency, ExchangeRate.rate).all()
+    rates = {currency.upper(): Decimal(rate) for currency, rate in rows}
+    rates[BASE_CURRENCY] = Decimal(1)
+    return rates
+
+
+def to_ars(price, currency, rates):
+    """Precio en ARS, o None si no hay cotización para la moneda"""
+    if price is None:
+        return None
+    rate = rates.get((currency or BASE_CURRENCY).upper())
+    if rate is None:
+        return None
+    return int((Decimal(price) * rate).to_integral_value())
+
+
+@event.listens_for(Session, 'before_flush')
+def _update_price_ars(session, flush_context, instances):
+    pending = []
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Vehicle):
+            continue
+        state = inspect(obj)
+        if (obj in session.new or state.attrs.price.history.has_changes() or
+                state.attrs.currency.history.has_changes()):
+            pending.append(obj)
+    if not pending:
+        return
+    rates = get_rates(session)
+    for vehicle in pending:
+        vehicle.price_ars = to_ars(vehicle.price, vehicle.currency, rates)
+
+
+def _recompute_statement(currency, rate):
+    """UPDATE en bloque de price_ars para los vehículos en una moneda"""
+    if currency == BASE_CURRENCY:
+        condition = db.or_(Vehicle.currency == currency, Vehicle.currency.is_(None))
+    else:
+        condition = Vehicle.currency == currency
+    value = cast(func.round(Vehicle.price * rate), BigInteger)
+    return Vehicle.query.filter(condition), value
+
+
+def set_exchange_rate(currency, rate):
+    """
+    Guarda la cotización de una moneda y recalcula price_ars de sus vehículos
+
+    Returns:
+        int: Cantidad de vehículos recalculados
+    """
+    currency = currency.upper()
+    if currency == BASE_CURRENCY:
+        raise ValueError('La moneda base no tiene cotización')
+    rate = Decimal(str(rate))
+    if rate <= 0:
+        raise ValueError('La cotización debe ser mayor a cero')
+
+    exchange_rate = ExchangeRate.query.filter_by(currency=currency).first()
+    if exchange_rate is None:
+        exchange_rate = ExchangeRate(currency=currency, rate=rate)
+        db.session.add(exchange_rate)
+    else:
+        exchange_rate.rate = rate
+
+    query, value = _recompute_statement(currency, rate)
+    updated = query.update({Vehicle.price_ars: value}, synchronize_session=False)
+    db.session.commit()
+    return updated
+
+
+def recompute_all_prices():
+    """
+    Recalcula price_ars de todo el catálogo (un UPDATE por moneda)
+
+    Returns:
+        int: Cantidad de vehículos recalculados
+    """
+    rates = get_rates()
+    updated = 0
+    for currency, rate in rates.items():
+        query, value = _recompute_statement(currency, rate)
+        updated += query.update({Vehicle.price_ars: value}, synchronize_session=False)
+    # Monedas sin cotización: sin precio normalizado
+    updated += Vehicle.query.filter(
+        Vehicle.currency.isnot(None), ~Vehicle.currency.in_(list(rates))
+    ).update({Vehicle.price_ars: None}, synchronize_session=False)
+    db.session.commit()
+    return updated
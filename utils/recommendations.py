@@ -0,0 +1,327 @@
+"""
+Vehículos similares (sección "Otros vehículos que te pueden interesar")
+Arma con numpy una matriz de características de los vehículos activos
+(precio en pesos, año y kilómetros en escala fija, marca, combustible,
+transmisión y departamento en one-hot) y calcula en bloques los k vecinos
+más cercanos de cada uno. El resultado se guarda en la tabla similar_vehicle
+y vehicle_detail lo lee con una consulta por índice.
+
+Se reconstruye completo periódicamente (refresh_similar_vehicles.py) y entre
+medio se actualiza de forma incremental con los eventos del catálogo: sólo
+se recalculan las listas del vehículo que cambió, las que lo incluían y
+aquellas en las que ahora entra. Esa actualización la hace un hilo de fondo
+del worker que hizo la escritura; la ficha sólo lee la tabla.
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from sqlalchemy import func, inspect
+from sqlalchemy.orm import joinedload
+from models import db, Vehicle, ClientRequest, SimilarVehicle
+from utils.catalog_events import subscribe
+from utils.search import fold_text
+
+try:
+    import numpy as np
+except ImportError:  # Sin numpy se siguen mostrando las listas ya guardadas
+    np = None
+
+# Vecinos guardados por vehículo
+TOP_K = 6
+
+# Filas de la matriz de distancias que se calculan por vez (acota la memoria)
+BLOCK_SIZE = 512
+
+# Segundos que espera el hilo de fondo para juntar varias escrituras seguidas
+REFRESH_DELAY = 2.0
+
+FEATURE_COLUMNS = ('id', 'price_ars', 'year', 'kilometers', 'brand', 'fuel_type', 'transmission', 'location_id')
+
+# Columna -> (valor de referencia, unidad, peso). La escala es fija (no
+# depende del resto del catálogo) para que la actualización incremental dé lo
+# mismo que la reconstrucción completa; un dato faltante toma la referencia
+NUMERIC_FEATURES = {
+    'price_ars': (10_000_000, 2, 1.5),  # logarítmica: el doble de precio = 1 unidad
+    'year': (2015, 5, 1.0),  # 5 años = 1 unidad
+    'kilometers': (100_000, 50_000, 0.75),  # 50.000 km = 1 unidad
+}
+LOG_COLUMNS = {'price_ars'}
+
+# Peso de cada categoría (one-hot) en la distancia
+CATEGORY_WEIGHTS = {'brand': 1.0, 'fuel_type': 0.5, 'transmission': 0.5, 'location_id': 0.5}
+
+_table_cache = {}
+
+
+def similar_table_ready(bind=None):
+    """True si la tabla similar_vehicle existe (se verifica una vez por motor)"""
+    bind = bind or db.engine
+    key = str(bind.url)
+    if key not in _table_cache:
+        try:
+            _table_cache[key] = inspect(bind).has_table(SimilarVehicle.__tablename__)
+        except Exception as e:
+            logging.error(f"No se pudo verificar la tabla similar_vehicle: {e}")
+            return False
+    return _table_cache[key]
+
+
+def _numeric(column, value):
+    """Valor en unidades de NUMERIC_FEATURES (0 = valor de referencia)"""
+    reference, unit, _ = NUMERIC_FEATURES[column]
+    if column in LOG_COLUMNS:
+        if value is None or value <= 0:
+            return 0.0
+        return float(np.log(float(value) / reference) / np.log(unit))
+    if value is None:
+        return 0.0
+    return (float(value) - reference) / unit
+
+
+def _category(value):
+    if isinstance(value, str):
+        return fold_text(value).strip() or None
+    return value
+
+
+def build_features(rows):
+    """
+    Matriz de características de los vehículos
+
+    Los valores numéricos se llevan a la escala de NUMERIC_FEATURES y las
+    categorías van en one-hot.
+
+    Args:
+        rows: [(id, price_ars, year, kilometers, brand, fuel_type, transmission, location_id)]
+
+    Returns:
+        tuple: (ids, matriz) - arrays de numpy, una fila por vehículo
+    """
+    records = [dict(zip(FEATURE_COLUMNS, row)) for row in rows]
+    ids = np.array([record['id'] for record in records], dtype=np.int64)
+
+    blocks = []
+    for column, (_, _, weight) in NUMERIC_FEATURES.items():
+        values = np.array([_numeric(column, record[column]) for record in records], dtype=float)
+        blocks.append(values.reshape(-1, 1) * weight)
+
+    for column, weight in CATEGORY_WEIGHTS.items():
+        keys = [_category(record[column]) for record in records]
+        categories = {key: i for i, key in enumerate(sorted({k for k in keys if k is not None}, key=str))}
+        onehot = np.zeros((len(records), len(categories)))
+        for row, key in enumerate(keys):
+            if key is not None:
+                onehot[row, categories[key]] = weight
+        blocks.append(onehot)
+
+    return ids, np.hstack(blocks)
+
+
+def _squared_distances(matrix, norms, rows):
+    """Distancias al cuadrado de las filas `rows` contra toda la matriz"""
+    d2 = norms[rows][:, None] + norms[None, :] - 2.0 * (matrix[rows] @ matrix.T)
+    return np.maximum(d2, 0.0, out=d2)
+
+
+def nearest_neighbours(matrix, rows, k=TOP_K):
+    """
+    k vecinos más cercanos (distancia euclídea) de las filas pedidas
+
+    Returns:
+        tuple: (índices, distancias) - arrays (len(rows), k) ordenados por distancia
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    k = min(k, matrix.shape[0] - 1)
+    if k <= 0 or len(rows) == 0:
+        return np.empty((len(rows), 0), dtype=np.int64), np.empty((len(rows), 0))
+
+    norms = np.einsum('ij,ij->i', matrix, matrix)
+    indices, distances = [], []
+    for start in range(0, len(rows), BLOCK_SIZE):
+        block = rows[start:start + BLOCK_SIZE]
+        d2 = _squared_distances(matrix, norms, block)
+        d2[np.arange(len(block)), block] = np.inf  # no recomendarse a sí mismo
+        top = np.argpartition(d2, k - 1, axis=1)[:, :k]
+        top_d2 = np.take_along_axis(d2, top, axis=1)
+        order = np.argsort(top_d2, axis=1, kind='stable')
+        indices.append(np.take_along_axis(top, order, axis=1))
+        distances.append(np.sqrt(np.take_along_axis(top_d2, order, axis=1)))
+    return np.vstack(indices), np.vstack(distances)
+
+
+class SimilarityEngine:
+    """Cálculo y lectura de la tabla similar_vehicle"""
+
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self._lock = threading.Lock()
+        self._pending = set()  # vehicle_id modificados desde la última actualización
+        self._app = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        """Habilita la actualización incremental en segundo plano"""
+        self._app = app
+
+    def on_catalog_change(self, changes, previous_version, version):
+        """
+        Anota los vehículos modificados (ver utils.catalog_events) y despierta
+        al hilo de fondo. Se llama sólo en el worker que hizo el commit.
+        """
+        with self._lock:
+            for change in changes:
+                # Los cambios masivos ('bulk') no traen ids: los cubre la reconstrucción periódica
+                if change.vehicle_id is not None:
+                    self._pending.add(change.vehicle_id)
+            pending = bool(self._pending)
+        if pending and self._app is not None and np is not None:
+            self._ensure_thread()
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        # Después de un fork (workers de gunicorn) el hilo no existe en el hijo
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='similar-vehicles', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            time.sleep(REFRESH_DELAY)
+            self._wakeup.clear()
+            with self._app.app_context():
+                self.apply_pending()
+
+    def _load_matrix(self):
+        rows = db.session.query(
+            *[getattr(Vehicle, column) for column in FEATURE_COLUMNS]
+        ).filter(Vehicle.is_active == True).order_by(Vehicle.id).all()
+        return build_features(rows)
+
+    def _store(self, ids, matrix, rows, replaced_ids=None):
+        """
+        Guarda los vecinos de las filas indicadas reemplazando las listas de
+        replaced_ids (None = toda la tabla)
+
+        Returns:
+            int: Cantidad de listas guardadas
+        """
+        table = SimilarVehicle.__table__
+        if replaced_ids is None:
+            db.session.execute(table.delete())
+        elif replaced_ids:
+            db.session.execute(table.delete().where(table.c.vehicle_id.in_(list(replaced_ids))))
+
+        indices, distances = nearest_neighbours(matrix, rows, self.k)
+        now = datetime.utcnow()
+        values = [
+            {
+                'vehicle_id': int(ids[row]),
+                'similar_vehicle_id': int(ids[neighbour]),
+                'position': position,
+                'score': float(1.0 / (1.0 + distance)),
+                'computed_at': now,
+            }
+            for row, neighbours, row_distances in zip(rows, indices, distances)
+            for position, (neighbour, distance) in enumerate(zip(neighbours, row_distances))
+        ]
+        if values:
+            db.session.execute(table.insert(), values)
+        db.session.commit()
+        return len(rows)
+
+    def rebuild(self):
+        """
+        Recalcula los vecinos de todos los vehículos activos
+
+        Returns:
+            int: Cantidad de listas guardadas
+        """
+        if np is None:
+            raise RuntimeError('numpy no está instalado')
+        with self._lock:
+            self._pending.clear()
+        ids, matrix = self._load_matrix()
+        return self._store(ids, matrix, list(range(len(ids))))
+
+    def refresh(self, vehicle_ids):
+        """
+        Actualización incremental después de cambios en algunos vehículos
+
+        Returns:
+            int: Cantidad de listas recalculadas
+        """
+        vehicle_ids = set(vehicle_ids)
+        ids, matrix = self._load_matrix()
+        position = {vehicle_id: row for row, vehicle_id in enumerate(ids.tolist())}
+        changed_rows = [position[vehicle_id] for vehicle_id in vehicle_ids if vehicle_id in position]
+        affected = set(changed_rows)
+
+        # Listas que incluían a un vehículo modificado (o dado de baja)
+        referencing = db.session.query(SimilarVehicle.vehicle_id).filter(
+            SimilarVehicle.similar_vehicle_id.in_(list(vehicle_ids))
+        ).distinct()
+        affected.update(position[vehicle_id] for (vehicle_id,) in referencing if vehicle_id in position)
+
+        # Listas en las que un vehículo modificado queda más cerca que el k-ésimo vecino
+        if changed_rows and len(ids) > 1:
+            thresholds = np.full(len(ids), np.inf)
+            farthest = db.session.query(
+                SimilarVehicle.vehicle_id, func.min(SimilarVehicle.score), func.count(SimilarVehicle.id)
+            ).group_by(SimilarVehicle.vehicle_id)
+            for vehicle_id, min_score, count in farthest:
+                if vehicle_id in position and count >= min(self.k, len(ids) - 1):
+                    thresholds[position[vehicle_id]] = 1.0 / min_score - 1.0
+            norms = np.einsum('ij,ij->i', matrix, matrix)
+            distances = np.sqrt(_squared_distances(matrix, norms, np.array(changed_rows)))
+            affected.update(np.nonzero((distances < thresholds[None, :]).any(axis=0))[0].tolist())
+
+        rows = sorted(affected)
+        replaced_ids = vehicle_ids | {int(ids[row]) for row in rows}
+        return self._store(ids, matrix, rows, replaced_ids)
+
+    def apply_pending(self):
+        """Aplica los cambios anotados desde la última actualización"""
+        if np is None:
+            return 0
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        if not pending:
+            return 0
+        try:
+            return self.refresh(pending)
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error actualizando vehículos similares: {e}")
+            return 0
+
+    def similar_to(self, vehicle_id, limit=TOP_K):
+        """
+        Vehículos activos similares a uno, en orden de cercanía
+
+        Returns:
+            list: [Vehicle, ...] (vacía si la tabla no existe o aún no se calculó)
+        """
+        if not similar_table_ready():
+            return []
+        # Una sola consulta: la ubicación de la solicitud de origen va en el mismo JOIN
+        vehicles = Vehicle.query.options(
+            joinedload(Vehicle.original_request).load_only(ClientRequest.location, ClientRequest.sub_location)
+        ).join(
+            SimilarVehicle, SimilarVehicle.similar_vehicle_id == Vehicle.id
+        ).filter(
+            SimilarVehicle.vehicle_id == vehicle_id,
+            Vehicle.is_active == True
+        ).order_by(SimilarVehicle.position).limit(limit).all()
+        return list(dict.fromkeys(vehicles))
+
+
+similarity_engine = SimilarityEngine()
+subscribe(similarity_engine.on_catalog_change)
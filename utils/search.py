@@ -0,0 +1,136 @@
+"""
+Búsqueda de texto completo de vehículos
+PostgreSQL: columna tsvector (configuración 'spanish' + unaccent) con índice GIN
+SQLite: tabla virtual FTS5 (vehicle_fts) sin acentos
+Ambas se mantienen con triggers en la base (ver add_fulltext_search.py)
+"""
+
+import re
+import logging
+import unicodedata
+from models import db, Vehicle
+
+# Pesos por columna para bm25() en SQLite (title, brand, model, description, seller_keyword)
+FTS5_WEIGHTS = (10.0, 8.0, 8.0, 1.0, 5.0)
+
+# Backend detectado por motor de base de datos (None = sin índice, usa ILIKE)
+_backend_cache = {}
+
+
+def fold_text(text):
+    """
+    Normaliza texto para búsqueda: minúsculas y sin acentos
+    ("Tunuyán" -> "tunuyan")
+    """
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize_query(search_query):
+    """Separa la búsqueda en términos alfanuméricos ya normalizados"""
+    return re.findall(r'\w+', fold_text(search_query))
+
+
+def _light_stem(token):
+    """
+    Stemming mínimo para SQLite (FTS5 no trae stemmer en español):
+    quita plurales para que "camionetas" encuentre "camioneta"
+    """
+    if len(token) > 4 and token.endswith('es') and token[-3] not in 'aeiou':
+        return token[:-2]
+    if len(token) > 3 and token.endswith('s'):
+        return token[:-1]
+    return token
+
+
+def get_search_backend():
+    """
+    Detecta qué índice de texto completo está instalado
+
+    Returns:
+        str or None: 'postgresql', 'sqlite' o None si hay que usar ILIKE
+    """
+    engine = db.engine
+    key = str(engine.url)
+    if key in _backend_cache:
+        return _backend_cache[key]
+
+    backend = None
+    try:
+        inspector = db.inspect(engine)
+        if engine.dialect.name == 'postgresql':
+            columns = inspector.get_columns('vehicle')
+            if any(col.get('name') == 'search_vector' for col in columns):
+                backend = 'postgresql'
+        elif engine.dialect.name == 'sqlite':
+            if 'vehicle_fts' in inspector.get_table_names():
+                backend = 'sqlite'
+    except Exception as e:
+        logging.warning(f"No se pudo detectar el índice de búsqueda: {e}")
+
+    if backend is None:
+        logging.info("Índice de texto completo no instalado, búsqueda con ILIKE")
+    _backend_cache[key] = backend
+    return backend
+
+
+def _search_matches(tokens, backend):
+    """
+    Subconsulta (vehicle_id, rank) con los vehículos que coinciden.
+    Mayor rank = más relevante en ambos motores.
+    """
+    if backend == 'postgresql':
+        # Cada término como prefijo ("toy" encuentra "toyota"); to_tsquery
+        # aplica el stemming en español al término
+        tsquery = db.func.to_tsquery(
+            db.literal_column("'spanish'::regconfig"),
+            ' & '.join(f'{token}:*' for token in tokens)
+        )
+        vector = db.literal_column('vehicle.search_vector')
+        return db.select(
+            Vehicle.id.label('vehicle_id'),
+            db.func.ts_rank_cd(vector, tsquery).label('rank')
+        ).where(vector.op('@@')(tsquery)).subquery('search_matches')
+
+    match_expression = ' '.join(f'"{_light_stem(token)}"*' for token in tokens)
+    fts_table = db.table('vehicle_fts')
+    return db.select(
+        db.literal_column('vehicle_fts.rowid').label('vehicle_id'),
+        (-db.func.bm25(db.literal_column('vehicle_fts'), *FTS5_WEIGHTS)).label('rank')
+    ).select_from(fts_table).where(
+        db.text('vehicle_fts MATCH :fts_query').bindparams(fts_query=match_expression)
+    ).subquery('search_matches')
+
+
+def _ilike_filter(query, search_query):
+    search_filter = f"%{search_query}%"
+    return query.filter(
+        db.or_(
+            Vehicle.title.ilike(search_filter),
+            Vehicle.brand.ilike(search_filter),
+            Vehicle.model.ilike(search_filter),
+            Vehicle.description.ilike(search_filter),
+            Vehicle.seller_keyword.ilike(search_filter)
+        )
+    )
+
+
+def apply_search(query, search_query):
+    """
+    Filtra una query de Vehicle por texto usando el índice de texto completo
+
+    Returns:
+        tuple: (query, rank) - rank es la columna de relevancia para ordenar
+               (descendente), o None si se usó el fallback ILIKE
+    """
+    tokens = tokenize_query(search_query)
+    backend = get_search_backend()
+    if backend is None or not tokens:
+        # Sin índice, o una búsqueda sólo de signos ('"', '-'): ILIKE como antes
+        return _ilike_filter(query, search_query), None
+
+    matches = _search_matches(tokens, backend)
+    query = query.join(matches, Vehicle.id == matches.c.vehicle_id)
+    return query, matches.c.rank
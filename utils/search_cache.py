@@ -0,0 +1,65 @@
+"""
+Cache de resultados del buscador AJAX (/api/search)
+Los mismos prefijos ("to", "toy", "hilux") llegan de muchos visitantes; el
+resultado se guarda por consulta normalizada (minúsculas, sin acentos ni
+espacios de más; tal cual si la búsqueda usa el fallback ILIKE) y orden, en un LRU acotado con vencimiento. La versión del
+catálogo va en la clave y además cada escritura de Vehicle vacía el cache
+del worker que la hizo, así nunca se sirve un resultado viejo.
+"""
+
+import os
+from utils.cache import LRUCache
+from utils.catalog_events import subscribe, get_catalog_version
+from utils.search import fold_text, get_search_backend, tokenize_query
+
+# Entradas y segundos de vida de cada resultado
+SEARCH_CACHE_SIZE = int(os.environ.get('SEARCH_CACHE_SIZE', 512))
+SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', 300))
+
+
+def normalize_query(search_query):
+    """
+    '  Toyota   HILUX ' y 'toyota hilux' comparten entrada con el índice de
+    texto completo; el fallback ILIKE (sin índice o sin palabras) distingue
+    acentos y espacios, así que ahí se usa la consulta sin cambios
+    """
+    if get_search_backend() is None or not tokenize_query(search_query):
+        return search_query
+    return ' '.join(fold_text(search_query).split())
+
+
+class SearchCache:
+    """Resultados de búsqueda por (versión del catálogo, consulta normalizada, orden)"""
+
+    def __init__(self, maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get_or_compute(self, search_query, sort, compute):
+        """
+        Resultado en cache o, si no está, el de compute() (que se guarda)
+
+        Args:
+            compute: función sin argumentos que ejecuta la búsqueda
+
+        Returns:
+            list: Resultados serializables a JSON
+        """
+        key = (get_catalog_version(), normalize_query(search_query), sort or '')
+        results = self._cache.get(key)
+        if results is None:
+            results = compute()
+            self._cache.set(key, results)
+        return results
+
+    def on_catalog_change(self, changes, previous_version, version):
+        self._cache.clear()
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+search_cache = SearchCache()
+subscribe(search_cache.on_catalog_change)
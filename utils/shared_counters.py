@@ -0,0 +1,247 @@
+"""
+Contadores y ventanas deslizantes compartidos entre workers
+Un archivo mapeado en memoria (mmap) que ven todos los workers de gunicorn de
+la máquina: cada clave ocupa un slot con un contador y un buffer circular de
+timestamps. Los slots se reparten en buckets y cada bucket se protege con uno
+de N locks (byte-range locks de fcntl sobre el archivo), así las decisiones
+anti-fraude y los límites de pedidos son los mismos en todos los workers sin
+ir a la base.
+
+La tabla es de tamaño fijo: si un bucket se llena se reutiliza el slot usado
+hace más tiempo, de modo que sólo se pierde historial viejo.
+"""
+
+import os
+import mmap
+import time
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows (desarrollo local): sólo locks entre hilos
+    fcntl = None
+
+# Archivo compartido (uno por máquina) y cantidad de buckets de la tabla
+SHARED_COUNTERS_FILE = os.environ.get(
+    'SHARED_COUNTERS_FILE',
+    os.path.join(tempfile.gettempdir(), 'marketplace_counters')
+)
+SHARED_COUNTERS_BUCKETS = int(os.environ.get('SHARED_COUNTERS_BUCKETS', 8192))
+
+# Slots por bucket, timestamps por slot y cantidad de locks
+BUCKET_SLOTS = 8
+RING_SIZE = 16
+STRIPES = 64
+
+MAGIC = b'MKTCNT01'
+# magic, buckets, slots por bucket, tamaño del buffer, ya precargado
+HEADER = struct.Struct('<8sIIII')
+HEADER_SIZE = 128
+# Byte del archivo que se bloquea mientras se precarga (los locks de bucket usan 0..STRIPES-1)
+WARM_LOCK_BYTE = STRIPES
+# clave (hash de 64 bits, 0 = libre), último uso, contador, próxima posición, cantidad
+SLOT = struct.Struct('<QdqII')
+RING = struct.Struct(f'<{RING_SIZE}d')
+SLOT_SIZE = SLOT.size + RING.size
+
+
+def _key_hash(key):
+    value = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little')
+    return value or 1
+
+
+class SharedCounters:
+    """Tabla de contadores/ventanas en un archivo mmap compartido por los workers"""
+
+    def __init__(self, path=SHARED_COUNTERS_FILE, buckets=SHARED_COUNTERS_BUCKETS):
+        self.path = path
+        self.buckets = buckets
+        self.size = HEADER_SIZE + buckets * BUCKET_SLOTS * SLOT_SIZE
+        self._fd = None
+        self._mm = None
+        self._pid = None
+        self._open_lock = threading.Lock()
+        self._warm_lock = threading.Lock()
+        self._thread_locks = [threading.Lock() for _ in range(STRIPES)]
+
+    def _open(self):
+        # Se abre de nuevo en cada proceso (después del fork de gunicorn)
+        if self._pid == os.getpid():
+            return
+        with self._open_lock:
+            if self._pid == os.getpid():
+                return
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            if fcntl:
+                fcntl.lockf(fd, fcntl.LOCK_EX)
+            try:
+                header = os.read(fd, HEADER.size)
+                expected = (MAGIC, self.buckets, BUCKET_SLOTS, RING_SIZE)
+                if (os.fstat(fd).st_size != self.size or len(header) != HEADER.size
+                        or HEADER.unpack(header)[:4] != expected):
+                    # Archivo nuevo o de otra configuración: se reinicia
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, self.size)
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    os.write(fd, HEADER.pack(*expected, 0))
+            finally:
+                if fcntl:
+                    fcntl.lockf(fd, fcntl.LOCK_UN)
+            self._fd = fd
+            self._mm = mmap.mmap(fd, self.size)
+            self._pid = os.getpid()
+
+    @contextmanager
+    def _locked(self, stripe):
+        with self._thread_locks[stripe]:
+            if fcntl:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+
+    def _find(self, key_hash, bucket, create, now):
+        """Offset del slot de la clave (con el lock del bucket tomado) o None"""
+        mm = self._mm
+        base = HEADER_SIZE + bucket * BUCKET_SLOTS * SLOT_SIZE
+        free = oldest = None
+        oldest_used = None
+        for i in range(BUCKET_SLOTS):
+            offset = base + i * SLOT_SIZE
+            slot_key, used = struct.unpack_from('<Qd', mm, offset)
+            if slot_key == key_hash:
+                return offset
+            if slot_key == 0:
+                if free is None:
+                    free = offset
+            elif oldest_used is None or used < oldest_used:
+                oldest, oldest_used = offset, used
+        if not create:
+            return None
+        offset = free if free is not None else oldest
+        SLOT.pack_into(mm, offset, key_hash, now, 0, 0, 0)
+        return offset
+
+    @contextmanager
+    def _slot(self, key, create=True, now=None):
+        self._open()
+        key_hash = _key_hash(key)
+        bucket = key_hash % self.buckets
+        with self._locked(bucket % STRIPES):
+            yield self._find(key_hash, bucket, create, now or time.time())
+
+    def _ring(self, offset):
+        """Timestamps guardados en el slot, del más viejo al más nuevo"""
+        _, _, _, head, count = SLOT.unpack_from(self._mm, offset)
+        ring = RING.unpack_from(self._mm, offset + SLOT.size)
+        return [ring[(head - count + i) % RING_SIZE] for i in range(count)]
+
+    def incr(self, key, amount=1):
+        """
+        Suma amount al contador de la clave
+
+        Returns:
+            int: Valor nuevo
+        """
+        now = time.time()
+        with self._slot(key, now=now) as offset:
+            slot_key, _, value, head, count = SLOT.unpack_from(self._mm, offset)
+            value += amount
+            SLOT.pack_into(self._mm, offset, slot_key, now, value, head, count)
+        return value
+
+    def get(self, key):
+        """Valor del contador de la clave (0 si no existe)"""
+        with self._slot(key, create=False) as offset:
+            return SLOT.unpack_from(self._mm, offset)[2] if offset is not None else 0
+
+    def append(self, key, timestamp=None):
+        """
+        Agrega un timestamp a la ventana de la clave
+
+        Returns:
+            list: Timestamps anteriores (hasta RING_SIZE, del más viejo al más nuevo),
+                  leídos en la misma operación
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._slot(key, now=timestamp) as offset:
+            previous = self._ring(offset)
+            slot_key, _, value, head, count = SLOT.unpack_from(self._mm, offset)
+            struct.pack_into('<d', self._mm, offset + SLOT.size + head * 8, timestamp)
+            SLOT.pack_into(self._mm, offset, slot_key, timestamp, value,
+                           (head + 1) % RING_SIZE, min(count + 1, RING_SIZE))
+        return previous
+
+    def recent(self, key):
+        """Timestamps de la ventana de la clave, del más viejo al más nuevo"""
+        with self._slot(key, create=False) as offset:
+            return self._ring(offset) if offset is not None else []
+
+    def count(self, key, window_seconds, now=None):
+        """Cantidad de timestamps de la clave dentro de los últimos window_seconds"""
+        since = (now or time.time()) - window_seconds
+        return sum(1 for timestamp in self.recent(key) if timestamp >= since)
+
+    def hit(self, key, limit, window_seconds, now=None):
+        """
+        Límite de tasa: registra un evento y dice si estaba dentro del límite
+
+        Returns:
+            bool: False si ya había limit eventos en la ventana
+        """
+        if limit > RING_SIZE:
+            raise ValueError(f"limit must be <= {RING_SIZE}")
+        now = now or time.time()
+        previous = self.append(key, now)
+        return sum(1 for timestamp in previous if timestamp >= now - window_seconds) < limit
+
+    def warm_once(self, loader):
+        """
+        Corre loader(self) una sola vez por archivo (el primer worker que llega
+        precarga el historial; los demás esperan a que termine)
+        """
+        self._open()
+        with self._warm_lock:
+            if fcntl:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, WARM_LOCK_BYTE)
+            try:
+                header = HEADER.unpack_from(self._mm, 0)
+                if header[4]:
+                    return
+                try:
+                    loader(self)
+                except Exception as e:
+                    logging.error(f"Error precargando {self.path}: {e}")
+                    return
+                HEADER.pack_into(self._mm, 0, *header[:4], 1)
+            finally:
+                if fcntl:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, WARM_LOCK_BYTE)
+
+    def clear(self):
+        """Vacía la tabla (incluida la marca de precarga)"""
+        self._open()
+        for stripe in range(STRIPES):
+            with self._locked(stripe):
+                for bucket in range(stripe, self.buckets, STRIPES):
+                    base = HEADER_SIZE + bucket * BUCKET_SLOTS * SLOT_SIZE
+                    self._mm[base:base + BUCKET_SLOTS * SLOT_SIZE] = bytes(BUCKET_SLOTS * SLOT_SIZE)
+        HEADER.pack_into(self._mm, 0, MAGIC, self.buckets, BUCKET_SLOTS, RING_SIZE, 0)
+
+    def stats(self):
+        self._open()
+        used = sum(
+            1 for offset in range(HEADER_SIZE, self.size, SLOT_SIZE)
+            if struct.unpack_from('<Q', self._mm, offset)[0]
+        )
+        return {'slots': self.buckets * BUCKET_SLOTS, 'used': used, 'file': self.path}
+
+
+shared_counters = SharedCounters()
@@ -0,0 +1,139 @@
+"""
+sitemap.xml del catálogo
+Lista la página principal y la ficha de cada vehículo activo para que los
+buscadores no tengan que recorrer el listado paginado. Se genera leyendo
+sólo (id, updated_at) con yield_per, sin cargar objetos Vehicle, y se
+escribe a disco: los workers sirven el archivo hasta que cambia la versión
+del catálogo. Pasadas las 50.000 URLs se divide en varios archivos y
+sitemap.xml pasa a ser un índice de sitemaps.
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+from itertools import islice
+from xml.sax.saxutils import escape
+from flask import url_for
+from models import db, Vehicle
+from utils.catalog_events import get_catalog_version
+
+# Directorio de los sitemaps generados (compartido por los workers)
+SITEMAP_DIR = os.environ.get(
+    'SITEMAP_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'marketplace_sitemap')
+)
+
+# Límite de URLs por archivo del protocolo sitemaps.org
+MAX_URLS = 50000
+
+# Filas que se traen de la base por vez
+FETCH_SIZE = 1000
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+
+def sitemap_urls(base_url):
+    """
+    URLs del sitemap
+
+    Returns:
+        generator: (url, fecha de última modificación o None)
+    """
+    yield base_url + url_for('index'), None
+    rows = db.session.query(Vehicle.id, Vehicle.updated_at).filter(
+        Vehicle.is_active == True
+    ).order_by(Vehicle.id).yield_per(FETCH_SIZE)
+    for vehicle_id, updated_at in rows:
+        yield base_url + url_for('vehicle_detail', id=vehicle_id), updated_at
+
+
+def _write_urlset(path, urls):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(XML_HEADER)
+        f.write(f'<urlset xmlns="{SITEMAP_NS}">\n')
+        for loc, lastmod in urls:
+            f.write(f'<url><loc>{escape(loc)}</loc>')
+            if lastmod is not None:
+                f.write(f'<lastmod>{lastmod.strftime("%Y-%m-%d")}</lastmod>')
+            f.write('</url>\n')
+        f.write('</urlset>\n')
+
+
+def _write_index(path, base_url, parts):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(XML_HEADER)
+        f.write(f'<sitemapindex xmlns="{SITEMAP_NS}">\n')
+        for part in range(1, parts + 1):
+            loc = base_url + url_for('sitemap_part', part=part)
+            f.write(f'<sitemap><loc>{escape(loc)}</loc></sitemap>\n')
+        f.write('</sitemapindex>\n')
+
+
+def _generate(directory, base_url):
+    """
+    Escribe sitemap.xml (y sitemap-N.xml si hace falta dividirlo)
+
+    Returns:
+        int: Cantidad de archivos de URLs
+    """
+    urls = sitemap_urls(base_url)
+    parts = 0
+    while True:
+        chunk = list(islice(urls, MAX_URLS))
+        if not chunk and parts:
+            break
+        parts += 1
+        _write_urlset(os.path.join(directory, f'sitemap-{parts}.xml'), chunk)
+        if len(chunk) < MAX_URLS:
+            break
+
+    if parts == 1:
+        os.replace(os.path.join(directory, 'sitemap-1.xml'), os.path.join(directory, 'sitemap.xml'))
+    else:
+        _write_index(os.path.join(directory, 'sitemap.xml'), base_url, parts)
+    return parts
+
+
+def _cleanup(version):
+    """Borra los sitemaps de versiones anteriores del catálogo"""
+    for name in os.listdir(SITEMAP_DIR):
+        path = os.path.join(SITEMAP_DIR, name)
+        if not name.startswith((f'{version}-', 'tmp')) and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def sitemap_path(base_url, name='sitemap.xml'):
+    """
+    Archivo del sitemap para la versión actual del catálogo, generándolo si
+    todavía no existe
+
+    Args:
+        base_url: Esquema y host de las URLs (p.ej. request.host_url sin la barra final)
+        name: 'sitemap.xml' o 'sitemap-N.xml'
+
+    Returns:
+        str or None: Ruta del archivo, o None si no existe esa parte
+    """
+    version = get_catalog_version()
+    host_key = hashlib.sha1(base_url.encode()).hexdigest()[:12]
+    directory = os.path.join(SITEMAP_DIR, f'{version}-{host_key}')
+
+    if not os.path.isdir(directory):
+        os.makedirs(SITEMAP_DIR, exist_ok=True)
+        # Se genera en un directorio temporal y se renombra: si otro worker
+        # lo generó al mismo tiempo queda el primero
+        staging = tempfile.mkdtemp(prefix='tmp', dir=SITEMAP_DIR)
+        try:
+            _generate(staging, base_url)
+            os.rename(staging, directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        _cleanup(version)
+
+    path = os.path.join(directory, name)
+    return path if os.path.isfile(path) else None
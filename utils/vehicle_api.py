@@ -0,0 +1,180 @@
+"""
+API JSON del catálogo (/api/vehicles)
+Mismos filtros y órdenes que index, paginado por cursor y con `fields=` para
+elegir qué campos devolver: sólo se leen las columnas de esos campos (no
+filas completas de Vehicle) y la respuesta se escribe a medida que llegan
+las filas, sin armar la lista entera en memoria.
+"""
+
+import base64
+import json
+from flask import url_for
+from models import Vehicle
+from utils.catalog import (catalog_order, catalog_uses_cursors, order_catalog, keyset_ranges,
+                           encode_cursor_values, decode_cursor)
+from cloudinary_storage import variant_url
+
+# Tamaño de página por defecto y máximo
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Filas que se traen de la base por vez mientras se escribe la respuesta
+FETCH_SIZE = 50
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def _main_image(images, main_image_index):
+    """Miniatura mediana de la imagen principal (misma elección que Vehicle.get_main_image)"""
+    image = Vehicle.pick_main_image(Vehicle.parse_images(images), main_image_index)
+    if not isinstance(image, str):
+        return None
+    if image.startswith('http'):
+        return variant_url(image, 'medium')
+    return url_for('static', filename=image)
+
+
+# Campo -> (columnas que necesita, función que arma el valor a partir de esas columnas)
+API_FIELDS = {
+    'id': ([Vehicle.id], lambda id_: id_),
+    'title': ([Vehicle.title], lambda value: value),
+    'brand': ([Vehicle.brand], lambda value: value),
+    'model': ([Vehicle.model], lambda value: value),
+    'year': ([Vehicle.year], lambda value: value),
+    'kilometers': ([Vehicle.kilometers], lambda value: value),
+    'fuel_type': ([Vehicle.fuel_type], lambda value: value),
+    'transmission': ([Vehicle.transmission], lambda value: value),
+    'price': ([Vehicle.price], lambda value: value),
+    'currency': ([Vehicle.currency], lambda value: value),
+    'price_ars': ([Vehicle.price_ars], lambda value: value),
+    'location': ([Vehicle.location], lambda value: value),
+    'sub_location': ([Vehicle.sub_location], lambda value: value),
+    'is_plus': ([Vehicle.is_plus], lambda value: bool(value)),
+    'created_at': ([Vehicle.created_at], _isoformat),
+    'updated_at': ([Vehicle.updated_at], _isoformat),
+    'image': ([Vehicle.images, Vehicle.main_image_index], _main_image),
+    'url': ([Vehicle.id], lambda id_: url_for('vehicle_detail', id=id_, _external=True)),
+}
+
+DEFAULT_FIELDS = ['id', 'title', 'brand', 'model', 'year', 'kilometers', 'price', 'currency', 'image', 'url']
+
+
+def parse_fields(value):
+    """
+    Lee el parámetro fields (lista separada por comas)
+
+    Returns:
+        tuple: (campos, desconocidos) - campos en el orden pedido, sin repetir
+    """
+    if not value:
+        return list(DEFAULT_FIELDS), []
+    fields = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in API_FIELDS]
+    return fields, unknown
+
+
+def encode_offset_cursor(offset):
+    """Cursor del orden por relevancia: la cantidad de filas ya devueltas"""
+    raw = json.dumps({'offset': offset}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_offset_cursor(token):
+    """
+    Decodifica un cursor generado por encode_offset_cursor
+
+    Returns:
+        int or None: Desplazamiento, o None si el cursor es inválido
+    """
+    try:
+        value = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        offset = value['offset']
+    except (ValueError, TypeError, KeyError):
+        return None
+    if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+        return None
+    return offset
+
+
+def decode_api_cursor(token, rank, sort):
+    """
+    Valida el parámetro cursor para el orden de la consulta
+
+    Con orden por relevancia (ver catalog_uses_cursors) el cursor es un
+    desplazamiento, como las páginas de index; si no, valores de orden.
+
+    Returns:
+        int, list or None: Desplazamiento, valores de orden o None si el
+                           cursor es inválido
+    """
+    if catalog_uses_cursors(rank, sort):
+        return decode_cursor(token, catalog_order(rank, sort))
+    return decode_offset_cursor(token)
+
+
+def _stream_ranges(ranges, limit):
+    """Filas de las queries de keyset_ranges, de a FETCH_SIZE, hasta limit"""
+    remaining = limit
+    for query in ranges:
+        for row in query.limit(remaining).yield_per(FETCH_SIZE):
+            yield row
+            remaining -= 1
+        if remaining <= 0:
+            return
+
+
+def stream_vehicles(query, rank, filters, fields, limit=DEFAULT_LIMIT, position=None):
+    """
+    Página de vehículos serializada en JSON de a pedazos
+
+    Args:
+        query: Query de Vehicle con los filtros ya aplicados (apply_catalog_filters)
+        rank: Relevancia de la búsqueda de texto o None
+        position: next_cursor de la página anterior ya decodificado con
+                  decode_api_cursor (None para la primera página)
+
+    Returns:
+        generator: Fragmentos de texto del documento
+                   {"vehicles": [...], "count": n, "next_cursor": "..." | null}
+    """
+    order = catalog_order(rank, filters.get('sort'))
+
+    # Columnas a leer: las de los campos pedidos más las del orden (para el cursor)
+    columns = []
+    for name in fields:
+        columns.extend(API_FIELDS[name][0])
+    columns.extend(column for column, _ in order)
+    columns = list({id(column): column for column in columns}.values())
+
+    query = query.with_entities(*columns)
+    keyset = catalog_uses_cursors(rank, filters.get('sort'))
+    if keyset and position is not None:
+        ranges = keyset_ranges(query, order, position)
+    else:
+        offset = position or 0
+        ranges = [order_catalog(query, order).offset(offset) if offset else order_catalog(query, order)]
+
+    yield '{"vehicles":['
+    count = 0
+    for row in _stream_ranges(ranges, limit + 1):
+        if count == limit:
+            # Fila extra: hay página siguiente
+            break
+        mapping = row._mapping
+        item = {}
+        for name in fields:
+            needed, build = API_FIELDS[name]
+            item[name] = build(*[mapping[column] for column in needed])
+        yield (',' if count else '') + json.dumps(item, ensure_ascii=False, separators=(',', ':'))
+        count += 1
+        last = mapping
+    else:
+        last = None
+
+    next_cursor = None
+    if last is not None:
+        next_cursor = (encode_cursor_values([last[column] for column, _ in order]) if keyset
+                       else encode_offset_cursor(offset + count))
+    yield '],' + json.dumps({'count': count, 'next_cursor': next_cursor}, separators=(',', ':'))[1:]
@@ -0,0 +1,300 @@
+"""
+Escritura diferida (write-behind) de registros de analytics
+Las vistas y los clicks de vehículos se encolan en memoria en lugar de hacer
+INSERT + commit dentro del request; un hilo de fondo los inserta en lote (un
+solo INSERT de varias filas) cuando se junta BATCH_SIZE o pasan
+FLUSH_SECONDS, y al terminar el worker se vacía la cola.
+
+Con <PREFIJO>_SPOOL_DIR cada fila encolada además se agrega a un archivo
+(uno por proceso, con el PID y un token al azar en el nombre: un worker nuevo
+puede recibir el PID de uno muerto) que se reescribe después de cada lote:
+si el worker muere antes de insertar, el próximo que arranca carga las filas
+que quedaron.
+"""
+
+import os
+import json
+import glob
+import uuid
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError, DataError
+from models import db, VehicleView, Click
+
+
+def _process_alive(pid):
+    """Si existe el proceso (en Windows no se puede consultar sin matarlo: se asume que sí)"""
+    if os.name == 'nt':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class WriteBehindBuffer:
+    """Cola de filas de una tabla que se insertan en lote desde un hilo de fondo"""
+
+    def __init__(self, model, config_prefix, batch_size=100, flush_seconds=2.0, max_pending=10000):
+        self.model = model
+        self.table = model.__table__
+        self.config_prefix = config_prefix
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.spool_dir = None
+        self.enabled = False
+        self._app = None
+        self._rows = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._spool = None
+        self._spool_pid = None
+
+    def init_app(self, app):
+        """
+        Lee la configuración (<PREFIJO>_WRITE_BEHIND, _BATCH_SIZE, _FLUSH_SECONDS,
+        _MAX_PENDING, _SPOOL_DIR), registra el vaciado de la cola al salir del
+        proceso y recupera las filas que dejaron workers anteriores
+        """
+        prefix = self.config_prefix
+        self._app = app
+        self.enabled = app.config.get(f'{prefix}_WRITE_BEHIND', True)
+        self.batch_size = app.config.get(f'{prefix}_BATCH_SIZE', self.batch_size)
+        self.flush_seconds = app.config.get(f'{prefix}_FLUSH_SECONDS', self.flush_seconds)
+        self.max_pending = app.config.get(f'{prefix}_MAX_PENDING', self.max_pending)
+        self.spool_dir = app.config.get(f'{prefix}_SPOOL_DIR') or None
+        atexit.register(self.drain)
+        if self.enabled and self.spool_dir:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self.recover()
+
+    def row_values(self, obj):
+        """
+        Valores de columna de un objeto sin guardar, con los defaults de
+        Python ya resueltos (el timestamp es el del momento de encolar)
+        """
+        values = {}
+        for attr in inspect(self.model).column_attrs:
+            column = attr.columns[0]
+            if column.primary_key:
+                continue
+            value = getattr(obj, attr.key)
+            if value is None and column.default is not None:
+                default = column.default
+                value = default.arg(None) if default.is_callable else default.arg
+            values[column.name] = value
+        return values
+
+    def _encode(self, row):
+        return json.dumps({
+            key: value.isoformat() if isinstance(value, datetime) else value
+            for key, value in row.items()
+        })
+
+    def _decode(self, line):
+        row = json.loads(line)
+        for column in self.table.columns:
+            if isinstance(column.type, db.DateTime) and row.get(column.name):
+                row[column.name] = datetime.fromisoformat(row[column.name])
+        return row
+
+    def _spool_path(self, pid, token):
+        return os.path.join(self.spool_dir, f'{self.table.name}-{pid}-{token}.jsonl')
+
+    def _spool_file(self):
+        # Un archivo por proceso (con el lock de la cola tomado)
+        if self._spool_pid != os.getpid():
+            self._spool_pid = os.getpid()
+            path = self._spool_path(self._spool_pid, uuid.uuid4().hex[:12])
+            self._spool = open(path, 'a', encoding='utf-8')
+        return self._spool
+
+    def _rewrite_spool(self):
+        """Deja en el archivo sólo las filas que siguen en la cola (con el lock tomado)"""
+        spool = self._spool_file()
+        spool.seek(0)
+        spool.truncate()
+        for row in self._rows:
+            spool.write(self._encode(row) + '\n')
+        spool.flush()
+
+    def recover(self):
+        """
+        Inserta las filas de los archivos de procesos que ya no existen
+
+        Returns:
+            int: Cantidad de filas recuperadas
+        """
+        recovered = 0
+        prefix = f'{self.table.name}-'
+        for path in glob.glob(os.path.join(self.spool_dir, f'{prefix}*.jsonl')):
+            # <tabla>-<pid>-<token>.jsonl (o <tabla>-<pid>.jsonl de versiones anteriores)
+            name = os.path.basename(path)[len(prefix):-len('.jsonl')]
+            try:
+                pid = int(name.split('-', 1)[0])
+            except ValueError:
+                continue
+            if self._spool is not None and path == self._spool.name:
+                continue
+            # Con el mismo PID que este proceso el archivo es de uno anterior ya muerto
+            if pid != os.getpid() and _process_alive(pid):
+                continue
+
+            # Se renombra antes de leerlo para que lo recupere un solo worker
+            claimed = f'{path}.{os.getpid()}.recover'
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            try:
+                with open(claimed, encoding='utf-8') as f:
+                    rows = [self._decode(line) for line in f if line.strip()]
+                if rows:
+                    with self._app.app_context():
+                        with db.engine.begin() as connection:
+                            connection.execute(self.table.insert(), rows)
+                os.remove(claimed)
+                recovered += len(rows)
+            except Exception as e:
+                logging.error(f"Error recuperando {claimed}: {e}")
+                os.rename(claimed, path)
+        if recovered:
+            logging.info(f"Recuperadas {recovered} filas de {self.table.name} sin insertar")
+        return recovered
+
+    def _ensure_thread(self):
+        # Después de un fork (workers de gunicorn) el hilo no existe en el hijo
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._run, name=f'write-behind-{self.table.name}', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            self.flush()
+
+    def add(self, obj):
+        """
+        Encola un registro (objeto del modelo sin agregar a la sesión)
+
+        Sin write-behind (configuración o fuera de la app) se inserta en el momento.
+        """
+        row = self.row_values(obj)
+        if not self.enabled or self._app is None:
+            db.session.execute(self.table.insert(), [row])
+            db.session.commit()
+            return
+
+        with self._lock:
+            self._rows.append(row)
+            pending = len(self._rows)
+            if self.spool_dir:
+                spool = self._spool_file()
+                spool.write(self._encode(row) + '\n')
+                spool.flush()
+        self._ensure_thread()
+
+        if pending >= self.max_pending:
+            # La base no da abasto: el request espera el lote en vez de crecer sin límite
+            self.flush()
+        elif pending >= self.batch_size:
+            self._wakeup.set()
+
+    def pending(self):
+        """Copia de las filas encoladas que todavía no se insertaron"""
+        with self._lock:
+            return list(self._rows)
+
+    def _insert(self, rows):
+        """
+        Inserta las filas en un solo INSERT; si alguna no es válida (p.ej. la
+        vista de un vehículo que se borró mientras estaba en la cola) se
+        insertan de a una y se descartan las inválidas
+
+        Returns:
+            list: Filas que no se insertaron por un error de la base (caída,
+                  timeout); se reintentan en el próximo lote
+        """
+        with self._app.app_context():
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(self.table.insert(), rows)
+                return []
+            except (IntegrityError, DataError):
+                pass
+            except Exception as e:
+                logging.error(f"Error insertando {len(rows)} filas en {self.table.name}: {e}")
+                return rows
+
+            for position, row in enumerate(rows):
+                try:
+                    with db.engine.begin() as connection:
+                        connection.execute(self.table.insert(), [row])
+                except (IntegrityError, DataError) as e:
+                    logging.error(f"Fila descartada de {self.table.name}: {e}")
+                except Exception as e:
+                    logging.error(f"Error insertando filas en {self.table.name}: {e}")
+                    return rows[position:]
+            return []
+
+    def flush(self):
+        """
+        Inserta las filas encoladas en un solo INSERT de varias filas
+
+        Returns:
+            int: Cantidad de filas procesadas (insertadas o descartadas por inválidas)
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._rows)
+                self._rows.clear()
+            if not batch:
+                return 0
+            failed = self._insert(batch)
+            if failed:
+                with self._lock:
+                    # Se reintenta en el próximo lote mientras entre en la cola
+                    room = self.max_pending - len(self._rows)
+                    if room > 0:
+                        self._rows.extendleft(reversed(failed[-room:]))
+                    if len(failed) > room:
+                        logging.error(f"Se descartaron {len(failed) - max(room, 0)} filas de {self.table.name}")
+                return len(batch) - len(failed)
+            if self.spool_dir:
+                with self._lock:
+                    self._rewrite_spool()
+            return len(batch)
+
+    def drain(self):
+        """Vacía la cola (al apagar el worker)"""
+        if self._app is None:
+            return
+        while self._rows:
+            if not self.flush():
+                break
+        if self._spool is not None and self._spool_pid == os.getpid() and not self._rows:
+            # Todo quedó insertado: el archivo ya no hace falta
+            self._spool.close()
+            os.remove(self._spool.name)
+            self._spool = self._spool_pid = None
+
+
+vehicle_view_buffer = WriteBehindBuffer(VehicleView, 'VIEW')
+click_buffer = WriteBehindBuffer(Click, 'CLICK')